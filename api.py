@@ -1,14 +1,14 @@
 import os
 
-from app import blueprint
-from app.main import create_app, db
+from app import create_api_app
+from app.main import db
 from app.main.util.api_error import APIError
+from app.main.util.error_catalog import error_catalog
+from app.main.util.search_utils import create_search_indexes, vacuum_database
 
 env_name = os.environ.get("ENV_NAME", "dev")
 
-app = create_app(env_name)
-app.register_blueprint(blueprint)
-app.app_context().push()
+app = create_api_app(env_name)
 
 
 @app.cli.command("setup_api_database")
@@ -17,6 +17,13 @@ def create_db():
     db.create_all()
     APIError.add_errors_to_database()
     db.session.commit()
+    create_search_indexes()
+    error_catalog.load()
+
+
+@app.cli.command("vacuum_database")
+def vacuum_db():
+    vacuum_database()
 
 
 if __name__ == "__main__":
@@ -1,36 +1,119 @@
-from flask import Blueprint
+from functools import partial
+
+from flask import Blueprint, Flask
 from flask_restx import Api
 
-from .main.controller.error_controller import _error_response, api as error_ns
-from .main.controller.user_controller import api as user_ns
+from .main import create_app
 from .main.util.api_error import APIError
+from .main.util.cache_utils import user_cache
+from .main.util.error_catalog import error_catalog
+from .main.util.profiler import request_profiler
+from .main.util.rate_limit import rate_limiter
+
+
+def create_blueprint() -> Blueprint:
+    """
+    Build the API blueprint.
+
+    The controllers, and the namespaces and models they declare, are only imported
+    when an application is created, not when the package is imported.
+
+    Returns:
+        Blueprint: The blueprint with the `/api/` routes.
+    """
+    from .main.controller.database_controller import api as database_ns
+    from .main.controller.error_controller import _error_response, api as error_ns
+    from .main.controller.profile_controller import api as profile_ns
+    from .main.controller.user_controller import api as user_ns
+
+    blueprint = Blueprint("api", __name__)
+
+    api = Api(blueprint,
+              title="API",
+              prefix='/api/',
+              version="X.Y.Z",
+              description="API",
+              security="apikey",
+              contact_email="joaobruno.rf@gmail.com",
+              )
+
+    api.add_namespace(error_ns, path="/error")
+    api.add_namespace(user_ns, path="/user")
+    api.add_namespace(database_ns, path="/database")
+    api.add_namespace(profile_ns, path="/profile")
+
+    @api.errorhandler(APIError)
+    @error_ns.marshal_with(_error_response)
+    def handle_default_exception(error):
+        """
+        Handles APIError and returns a formatted error response.
 
-blueprint = Blueprint("api", __name__)
+        Args:
+            error (APIError): The exception to be handled.
 
-api = Api(blueprint,
-          title="API",
-          prefix='/api/',
-          version="X.Y.Z",
-          description="API",
-          security="apikey",
-          contact_email="joaobruno.rf@gmail.com",
-          )
+        Returns:
+            tuple: A tuple containing the formatted error response object and the corresponding HTTP status code.
+        """
+        if isinstance(error, APIError):
+            return {"error": error.to_error()}, error.code, error.headers
 
-api.add_namespace(error_ns, path="/error")
-api.add_namespace(user_ns, path="/user")
+    return blueprint
 
 
-@api.errorhandler(APIError)
-@error_ns.marshal_with(_error_response)
-def handle_default_exception(error):
+def create_api_app(config_name: str) -> Flask:
     """
-    Handles APIError and returns a formatted error response.
+    Create the API application.
+
+    The application can be created once before a server forks its workers: the
+    engines are disposed after the fork, and each worker warms its own pools with
+    `warm_up` before taking traffic. Requests to the blueprint go through the
+    `rate_limiter` admission control, and any request can be profiled by the
+    `request_profiler`.
+
+    Args:
+        config_name (str): The environment name, a key of `config_by_name`.
+
+    Returns:
+        Flask: The application.
+    """
+    app = create_app(config_name)
+    app.register_blueprint(create_blueprint())
+    error_catalog.init_app(app)
+    rate_limiter.init_app(app)
+    user_cache.init_app(app)
+    request_profiler.init_app(app)
+    return app
+
+
+def create_asgi_app(config_name: str):
+    """
+    Create the asyncio (ASGI) application.
+
+    It serves the `user` and `error` routes of the API with the same models, errors
+    and configuration, querying the database with `AsyncSession`, so a worker keeps
+    serving other requests while one waits on the database. The Flask application
+    is created too: it holds the configuration, the error catalog and the request
+    helpers the endpoints share with the WSGI API.
 
     Args:
-        error (APIError): The exception to be handled.
+        config_name (str): The environment name, a key of `config_by_name`.
 
     Returns:
-        tuple: A tuple containing the formatted error response object and the corresponding HTTP status code.
+        Starlette: The application.
     """
-    if isinstance(error, APIError):
-        return {"error": error.to_error()}, error.code
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+
+    from .main.async_database import async_db
+    from .main.controller.async_error_controller import routes as error_routes
+    from .main.controller.async_user_controller import routes as user_routes
+    from .main.util.search_utils import detect_sqlite_fts
+
+    app = create_api_app(config_name)
+    async_db.init_app(app)
+    return Starlette(
+        routes=[Mount("/api/user", routes=user_routes), Mount("/api/error", routes=error_routes)],
+        # Loaded before serving: a first use while serving would read the database in the event loop.
+        on_startup=[error_catalog.load, partial(detect_sqlite_fts, app, async_db.engine)],
+        on_shutdown=[async_db.dispose],
+    )
@@ -3,24 +3,47 @@ from logging.config import dictConfig
 from flask import Flask
 from flask_mail import Mail
 from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
 from .config import config_by_name
+from .database import RoutingSQLAlchemy
 from .logger import get_logging_config
+from .util.mail_queue import MailQueue
+from .util.request_metrics import request_metrics
 from flask_cors import CORS
 
-dictConfig(get_logging_config())
-
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
 migrate = Migrate()
-app = Flask(__name__)
 mail = Mail()
+mail_queue = MailQueue(mail)
 cors = CORS()
 
 
 def create_app(config_name: str) -> Flask:
-    app.config.from_object(config_by_name[config_name])
+    """
+    Create a Flask application with the extensions configured for an environment.
+
+    Nothing is connected to the database here, so the application can be created
+    before a server forks its workers.
+
+    Args:
+        config_name (str): The environment name, a key of `config_by_name`.
+
+    Returns:
+        Flask: The new application.
+    """
+    config = config_by_name[config_name]
+    dictConfig(get_logging_config(
+        config.LOG_LEVEL,
+        log_file=config.LOG_FILE,
+        json_format=config.LOG_FORMAT == "json",
+        use_queue=config.LOG_QUEUE,
+    ))
+
+    app = Flask(__name__)
+    app.config.from_object(config)
     db.init_app(app)
     migrate.init_app(app, db)
     mail.init_app(app)
+    mail_queue.init_app(app)
     cors.init_app(app)
+    request_metrics.init_app(app)
     return app
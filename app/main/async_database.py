@@ -0,0 +1,81 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from .database import POOL_SIZE_OPTIONS, engine_stats
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_url(uri: str):
+    """
+    Get the URL of a database for its asyncio driver.
+
+    Args:
+        uri (str): The SQLAlchemy URI, such as `SQLALCHEMY_DATABASE_URI`.
+
+    Returns:
+        URL: The URL with the asyncpg (PostgreSQL) or aiosqlite (SQLite) driver.
+
+    Raises:
+        ValueError: If the database has no supported asyncio driver.
+    """
+    url = make_url(uri)
+    if (backend := url.get_backend_name()) not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver for {backend} databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """
+    The asyncio engine and sessions of the ASGI application.
+
+    The engine uses the `SQLALCHEMY_DATABASE_URI` and `SQLALCHEMY_ENGINE_OPTIONS` of
+    the Flask application, with the asyncio driver of the database.
+
+    Attributes:
+        app (Flask): The application whose configuration is used.
+        engine (AsyncEngine): The engine of the primary database.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.engine = None
+        self._sessions = None
+
+    def init_app(self, app):
+        """
+        Create the engine of an application. Nothing is connected until the first query.
+
+        Args:
+            app (Flask): The application.
+        """
+        url = get_async_url(app.config["SQLALCHEMY_DATABASE_URI"])
+        options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+        if url.get_backend_name() == "sqlite":
+            options = {key: value for key, value in options.items() if key not in POOL_SIZE_OPTIONS}
+
+        self.app = app
+        self.engine = create_async_engine(url, **options)
+        self._sessions = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        engine_stats.register(self.engine.sync_engine, "async")
+
+    def session(self) -> AsyncSession:
+        """
+        Open a session, to be used as an async context manager.
+
+        Returns:
+            AsyncSession: The new session.
+        """
+        return self._sessions()
+
+    async def dispose(self):
+        """Close the pooled connections."""
+        if self.engine is not None:
+            await self.engine.dispose()
+
+
+async_db = AsyncDatabase()
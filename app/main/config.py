@@ -3,18 +3,112 @@ from dotenv import load_dotenv
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+
+def get_engine_options(pool_size: int, max_overflow: int, pool_timeout: int = 30,
+                       pool_recycle: int = 1800, pool_pre_ping: bool = True) -> dict:
+    """
+    Get the SQLAlchemy engine options, letting environment variables override the defaults.
+
+    Args:
+        pool_size (int): Connections kept open per worker (`SQLALCHEMY_POOL_SIZE`).
+        max_overflow (int): Extra connections allowed under load (`SQLALCHEMY_MAX_OVERFLOW`).
+        pool_timeout (int, optional): Seconds to wait for a connection (`SQLALCHEMY_POOL_TIMEOUT`).
+        pool_recycle (int, optional): Seconds before a connection is replaced (`SQLALCHEMY_POOL_RECYCLE`).
+        pool_pre_ping (bool, optional): Whether connections are tested on checkout (`SQLALCHEMY_POOL_PRE_PING`).
+
+    Returns:
+        dict: The engine options.
+    """
+    return {
+        "pool_size": int(os.getenv("SQLALCHEMY_POOL_SIZE", pool_size)),
+        "max_overflow": int(os.getenv("SQLALCHEMY_MAX_OVERFLOW", max_overflow)),
+        "pool_timeout": int(os.getenv("SQLALCHEMY_POOL_TIMEOUT", pool_timeout)),
+        "pool_recycle": int(os.getenv("SQLALCHEMY_POOL_RECYCLE", pool_recycle)),
+        "pool_pre_ping": os.getenv("SQLALCHEMY_POOL_PRE_PING", str(pool_pre_ping)).lower() in ("1", "true", "yes"),
+    }
+
+
+def get_route_limits(name: str, default: str) -> dict:
+    """
+    Get per-route numbers from a comma separated list of `METHOD /route[?arg[>N]]=number` entries.
+
+    Args:
+        name (str): The environment variable overriding the default.
+        default (str): The default list, such as `GET /api/user/?search=5,GET /api/user/export=20`.
+
+    Returns:
+        dict: The numbers keyed by route rule.
+    """
+    limits = {}
+    for entry in os.getenv(name, default).split(","):
+        if entry.strip():
+            rule, _, number = entry.strip().rpartition("=")
+            limits[rule] = float(number)
+    return limits
+
+
 class Config:
     load_dotenv()
     SECRET_KEY = os.getenv("SECRET_KEY", "secret_key")
     DEBUG = False
     JWT_EXP = 8
     ACTIVATION_EXP_DAYS = 3
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.getenv("SQLALCHEMY_REPLICA_URIS", "").split(",") if uri]
+    ERROR_CATALOG_FLUSH_INTERVAL = float(os.getenv("ERROR_CATALOG_FLUSH_INTERVAL", 5))
+    PAGINATION_COUNT_CACHE_TTL = int(os.getenv("PAGINATION_COUNT_CACHE_TTL", 30))
+    USER_BULK_CHUNK_SIZE = int(os.getenv("USER_BULK_CHUNK_SIZE", 1000))
+    USER_EXPORT_BATCH_SIZE = int(os.getenv("USER_EXPORT_BATCH_SIZE", 1000))
+    USER_LOOKUP_MAX_IDS = int(os.getenv("USER_LOOKUP_MAX_IDS", 1000))
+    LOG_FILE = os.getenv("LOG_FILE")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+    LOG_QUEUE = os.getenv("LOG_QUEUE", "true").lower() in ("1", "true", "yes")
+    METRICS_DIR = os.getenv("METRICS_DIR")
+    N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+    MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", 1000))
+    MAIL_QUEUE_WORKERS = int(os.getenv("MAIL_QUEUE_WORKERS", 2))
+    MAIL_QUEUE_BATCH_SIZE = int(os.getenv("MAIL_QUEUE_BATCH_SIZE", 50))
+    MAIL_QUEUE_MAX_RETRIES = int(os.getenv("MAIL_QUEUE_MAX_RETRIES", 3))
+    MAIL_QUEUE_RETRY_BACKOFF = float(os.getenv("MAIL_QUEUE_RETRY_BACKOFF", 1))
+    MAIL_QUEUE_IDLE_TIMEOUT = float(os.getenv("MAIL_QUEUE_IDLE_TIMEOUT", 30))
+    WARMUP_PATHS = [
+        path for path in os.getenv("WARMUP_PATHS", "/api/user/?per_page=1&count=none,/api/error/?per_page=1").split(",")
+        if path
+    ]
+    FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "true").lower() in ("1", "true", "yes")
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))
+    USER_CACHE_CHANNEL = os.getenv("USER_CACHE_CHANNEL")
+    USER_CACHE_STATE_FILE = os.getenv("USER_CACHE_STATE_FILE")
+    USER_CACHE_POLL_INTERVAL = float(os.getenv("USER_CACHE_POLL_INTERVAL", 0.1))
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").lower() in ("1", "true", "yes")
+    RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", 20))
+    RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 40))
+    RATE_LIMIT_CLIENT_HEADER = os.getenv("RATE_LIMIT_CLIENT_HEADER")
+    RATE_LIMIT_STATE_FILE = os.getenv("RATE_LIMIT_STATE_FILE")
+    RATE_LIMIT_SLOT_TTL = float(os.getenv("RATE_LIMIT_SLOT_TTL", 60))
+    RATE_LIMIT_ROUTE_COSTS = get_route_limits(
+        "RATE_LIMIT_ROUTE_COSTS",
+        "GET /api/user/?search=5,GET /api/user/?page>100=5,GET /api/user/export=20,"
+        "POST /api/user/bulk=20,PATCH /api/user/bulk=20,DELETE /api/user/bulk=20",
+    )
+    RATE_LIMIT_CONCURRENCY = get_route_limits(
+        "RATE_LIMIT_CONCURRENCY",
+        "GET /api/user/export=2,POST /api/user/bulk=4,PATCH /api/user/bulk=4,DELETE /api/user/bulk=4",
+    )
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", 0))
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+    PROFILE_DIR = os.getenv("PROFILE_DIR")
+    PROFILE_MAX_COUNT = int(os.getenv("PROFILE_MAX_COUNT", 100))
 
 class DevelopmentConfig(Config):
     DEBUG = True
     LOG_LEVEL = "DEBUG"
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = get_engine_options(pool_size=5, max_overflow=5)
     ENV = "development"
     HOST = "localhost"
 
@@ -32,8 +126,11 @@ class DevelopmentConfig(Config):
 class StagingConfig(Config):
     DEBUG = True
     LOG_LEVEL = "INFO"
+    LOG_FILE = os.getenv("LOG_FILE", "api-{pid}.log")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = get_engine_options(pool_size=5, max_overflow=10)
     ENV = "staging"
     HOST = "0.0.0.0"
 
@@ -44,12 +141,18 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
     PRESERVE_CONTEXT_ON_EXCEPTION = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = get_engine_options(pool_size=1, max_overflow=0, pool_timeout=5)
     ENV = "testing"
 
 
 class ProductionConfig(Config):
     DEBUG = False
     LOG_LEVEL = "ERROR"
+    LOG_FILE = os.getenv("LOG_FILE", "api-{pid}.log")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = get_engine_options(pool_size=10, max_overflow=10)
     ENV = "production"
 
 
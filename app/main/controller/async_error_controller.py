@@ -0,0 +1,24 @@
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from ..async_database import async_db
+from ..dto.error_dto import ErrorsDTO
+from ..service.async_error_service import get_filtered_errors
+from ..util.asgi_utils import api_endpoint, conditional_json_response
+from ..util.etag_utils import ERROR_ETAG_KEYS, get_page_etag
+
+_error_paged = ErrorsDTO.error_paged
+
+
+@api_endpoint
+async def list_errors(request: Request) -> Response:
+    """Get a list of errors."""
+    async with async_db.session() as session:
+        errors = await get_filtered_errors(session)
+    return await conditional_json_response(get_page_etag(errors, *ERROR_ETAG_KEYS), errors, _error_paged, weak=True)
+
+
+routes = [
+    Route("/", list_errors, methods=["GET"]),
+]
@@ -0,0 +1,90 @@
+from flask import request as flask_request
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+from werkzeug.http import quote_etag
+
+from ..async_database import async_db
+from ..dto.user_dto import UserDTO
+from ..service.async_user_service import (delete_user, get_all_users, get_user, lookup_users, save_new_user,
+                                          update_user)
+from ..util.asgi_utils import api_endpoint, conditional_json_response, get_json_body, json_response
+from ..util.etag_utils import (get_fields_mask, get_if_match_versions, get_lookup_etag, get_page_etag,
+                               get_version_etag)
+from ..util.serialization_utils import serialize
+
+_user = UserDTO.user
+_user_paged = UserDTO.user_paged
+_user_post = UserDTO.user_post
+_user_put = UserDTO.user_put
+_user_lookup = UserDTO.user_lookup
+_user_lookup_response = UserDTO.user_lookup_response
+
+
+@api_endpoint
+async def list_users(request: Request) -> Response:
+    """List all registered users."""
+    if "ids" in flask_request.args:
+        async with async_db.session() as session:
+            users = await lookup_users(session, [id for id in flask_request.args["ids"].split(",") if id])
+        return await conditional_json_response(get_lookup_etag(users), users, _user_lookup_response)
+    async with async_db.session() as session:
+        users = await get_all_users(session)
+    return await conditional_json_response(get_page_etag(users, "id", "version"), users, _user_paged, weak=True)
+
+
+@api_endpoint
+async def create_user(request: Request) -> Response:
+    """Create a new User."""
+    data = await get_json_body(request)
+    _user_post.validate(data)
+    async with async_db.session() as session:
+        user = await save_new_user(session, data)
+    return json_response(serialize(user, _user, mask=get_fields_mask()), 201)
+
+
+@api_endpoint
+async def lookup(request: Request) -> Response:
+    """Get many users by id with a single query."""
+    data = await get_json_body(request)
+    _user_lookup.validate(data)
+    async with async_db.session() as session:
+        users = await lookup_users(session, data["ids"])
+    return json_response(serialize(users, _user_lookup_response, mask=get_fields_mask()))
+
+
+@api_endpoint
+async def find_user(request: Request) -> Response:
+    """Get a registered user by id"""
+    async with async_db.session() as session:
+        user = await get_user(session, request.path_params["id"])
+    return await conditional_json_response(get_version_etag(user["version"], get_fields_mask()), user, _user)
+
+
+@api_endpoint
+async def replace_user(request: Request) -> Response:
+    """Update user by id"""
+    data = await get_json_body(request)
+    _user_put.validate(data)
+    async with async_db.session() as session:
+        user = await update_user(session, data, request.path_params["id"], versions=get_if_match_versions())
+    mask = get_fields_mask()
+    return json_response(serialize(user, _user, mask=mask), 200, {"ETag": quote_etag(get_version_etag(user["version"], mask))})
+
+
+@api_endpoint
+async def remove_user(request: Request) -> Response:
+    """Delete user by id"""
+    async with async_db.session() as session:
+        await delete_user(session, request.path_params["id"], versions=get_if_match_versions())
+    return Response(status_code=204)
+
+
+routes = [
+    Route("/", list_users, methods=["GET"]),
+    Route("/", create_user, methods=["POST"]),
+    Route("/lookup", lookup, methods=["POST"]),
+    Route("/{id}", find_user, methods=["GET"]),
+    Route("/{id}", replace_user, methods=["PUT"]),
+    Route("/{id}", remove_user, methods=["DELETE"]),
+]
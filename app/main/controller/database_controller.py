@@ -0,0 +1,32 @@
+from flask_restx import Resource
+
+from ..database import engine_stats, get_pool_stats
+from ..dto.database_dto import DatabaseDTO
+from ..util.admin_utils import check_admin_request
+
+api = DatabaseDTO.api
+_engine_stats = DatabaseDTO.engine_stats
+_pool_stats = DatabaseDTO.pool_stats
+_admin_token_parser = DatabaseDTO.admin_token_parser
+
+
+@api.route("/")
+class DatabaseResource(Resource):
+    @api.expect(_admin_token_parser)
+    @api.doc(responses={403: "`ADMIN_FORBIDDEN`"})
+    @api.marshal_with(_engine_stats, code=200, description="Engines statistics")
+    def get(self):
+        """Get the statistics of the database engines of this worker."""
+        check_admin_request()
+        return {"queries": engine_stats.get_counts(), "statement_cache": engine_stats.get_cache_stats()}, 200
+
+
+@api.route("/pools")
+class DatabasePoolsResource(Resource):
+    @api.expect(_admin_token_parser)
+    @api.doc(responses={403: "`ADMIN_FORBIDDEN`"})
+    @api.marshal_list_with(_pool_stats, code=200, description="Connection pools statistics", skip_none=True)
+    def get(self):
+        """Get the connection pools statistics of this worker."""
+        check_admin_request()
+        return [get_pool_stats(name, engine) for name, engine in engine_stats.get_engines().items()], 200
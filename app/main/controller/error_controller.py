@@ -3,6 +3,7 @@ from flask_restx import Resource
 from ..dto.error_dto import ErrorsDTO
 from ..dto.pagination_dto import PaginationDTO
 from ..service.error_service import get_filtered_errors
+from ..util.etag_utils import ERROR_ETAG_KEYS, conditional_response, get_page_etag
 
 api = ErrorsDTO.api
 _error = ErrorsDTO.error
@@ -16,10 +17,13 @@ _pagination_parser = PaginationDTO.pagination_parser
 class ErrorResource(Resource):
     @api.doc(responses={
         200: "Success",
+        304: "Not Modified",
+        400: "`INVALID_CURSOR` `INVALID_COUNT_MODE` `INVALID_ORDERING_COLUMN`",
         404: "`PAGES_NOT_FOUND`"
     })
     @api.expect(_pagination_parser, _error_filters_parser, validate=True)
-    @api.marshal_list_with(_error_paged, code=200, description="List of errors")
+    @api.response(200, "List of errors", _error_paged)
     def get(self):
         """Get a list of errors."""
-        return get_filtered_errors(), 200
+        errors = get_filtered_errors()
+        return conditional_response(get_page_etag(errors, *ERROR_ETAG_KEYS), errors, _error_paged, weak=True)
@@ -0,0 +1,40 @@
+from flask import request, send_file
+from flask_restx import Resource
+
+from ..dto.profile_dto import ProfileDTO
+from ..util.profiler import PROFILE_FORMATS, PROFILE_HEADER, request_profiler
+
+api = ProfileDTO.api
+_profile = ProfileDTO.profile
+_profile_token_parser = ProfileDTO.profile_token_parser
+
+
+@api.route("/")
+class ProfileResource(Resource):
+    @api.expect(_profile_token_parser)
+    @api.doc(responses={403: "`PROFILE_FORBIDDEN`"})
+    @api.marshal_list_with(_profile, code=200, description="Stored profiles, newest first")
+    def get(self):
+        """List the stored request profiles of every worker."""
+        request_profiler.check_authorized(request.headers.get(PROFILE_HEADER))
+        return request_profiler.list_profiles(), 200
+
+
+@api.route("/<string:id>/<string:format>")
+@api.doc(params={"format": "`pstats` for `pstats.Stats`, or `collapsed` stacks for flame graph tools"})
+class ProfileFileResource(Resource):
+    @api.expect(_profile_token_parser)
+    @api.doc(responses={
+        200: "The profile file",
+        403: "`PROFILE_FORBIDDEN`",
+        404: "`PROFILE_NOT_FOUND`"
+    })
+    def get(self, id: str, format: str):
+        """Download a stored request profile."""
+        request_profiler.check_authorized(request.headers.get(PROFILE_HEADER))
+        return send_file(
+            request_profiler.get_profile_path(id, format),
+            mimetype=PROFILE_FORMATS[format],
+            as_attachment=True,
+            download_name=f"{id}.{format}",
+        )
@@ -4,8 +4,18 @@ from flask_restx import Resource
 from ..dto.user_dto import UserDTO
 from ..service.user_service import (delete_user, update_user,
                                     save_new_user, get_all_users,
-                                    find_user_by)
+                                    get_user, save_new_users,
+                                    export_users, update_users,
+                                    update_users_by_filter, delete_users,
+                                    delete_users_by_filter, lookup_users)
+from ..dto.database_dto import DatabaseDTO
 from ..dto.pagination_dto import PaginationDTO                                    
+from ..util.admin_utils import check_admin_request
+from ..util.bulk_utils import has_request_items, iter_request_items
+from ..util.cache_utils import user_cache
+from ..util.etag_utils import (conditional_response, get_fields_mask, get_if_match_versions,
+                               get_lookup_etag, get_page_etag, get_version_etag)
+from werkzeug.http import quote_etag
 
 api = UserDTO.api
 _user = UserDTO.user
@@ -14,19 +24,39 @@ _user_put = UserDTO.user_put
 _pagination_parser = PaginationDTO.pagination_parser
 _user_filters_parser = UserDTO.user_filters_parser
 _user_paged = UserDTO.user_paged
+_user_bulk_response = UserDTO.user_bulk_response
+_user_export_parser = UserDTO.user_export_parser
+_user_patch = UserDTO.user_patch
+_user_bulk_set = UserDTO.user_bulk_set
+_user_bulk_change_response = UserDTO.user_bulk_change_response
+_user_cache_stats = UserDTO.user_cache_stats
+_user_lookup = UserDTO.user_lookup
+_user_lookup_parser = UserDTO.user_lookup_parser
+_user_lookup_response = UserDTO.user_lookup_response
+_admin_token_parser = DatabaseDTO.admin_token_parser
+
+
+def _get_request_ids() -> list:
+    return [id for id in request.args["ids"].split(",") if id]
 
 
 @api.route("/")
 class UserResource(Resource):
     @api.doc(responses={
         200: "Success",
+        304: "Not Modified",
+        400: "`INVALID_CURSOR` `INVALID_COUNT_MODE` `INVALID_ORDERING_COLUMN`",
         404: "`USER_NOT_FOUND` `PAGES_NOT_FOUND`"
     })
-    @api.expect(_pagination_parser, _user_filters_parser, validate=True)
-    @api.marshal_list_with(_user_paged, code=200, description="List of registered users")
+    @api.expect(_pagination_parser, _user_filters_parser, _user_lookup_parser, validate=True)
+    @api.response(200, "List of registered users, or a `UserLookupResponse` when `ids` is sent", _user_paged)
     def get(self):
         """List all registered users."""
-        return get_all_users(), 200
+        if "ids" in request.args:
+            users = lookup_users(_get_request_ids())
+            return conditional_response(get_lookup_etag(users), users, _user_lookup_response)
+        users = get_all_users()
+        return conditional_response(get_page_etag(users, "id", "version"), users, _user_paged, weak=True)
     
     @api.expect(_user_post, validate=True)
     @api.doc(responses={
@@ -41,32 +71,129 @@ class UserResource(Resource):
         return save_new_user(data=data), 201
 
 
-@api.route("/<string:id>")
-class UserByIdResource(Resource):
+@api.route("/bulk")
+class UserBulkResource(Resource):
+    @api.expect([_user_post])
     @api.doc(responses={
-        404: "`USER_NOT_FOUND`",
-        406: "`INVALID_CPF`",
-        409: "`USER_ALREADY_EXISTS`"
+        200: "Per-item results: 201, `INVALID_DATA`, `INVALID_CPF` or `USER_ALREADY_EXISTS`",
+        400: "`INVALID_DATA`"
+    })
+    @api.marshal_with(_user_bulk_response, code=200, description="Per-item creation results")
+    def post(self):
+        """Create many users from a JSON array or an NDJSON stream."""
+        return {"items": save_new_users(iter_request_items())}, 200
+
+    @api.doc(
+        description="Send a JSON array or NDJSON stream of `UserPatch` items to update users by id, "
+                    "or a `UserBulkSet` object to update every user matching the filters.",
+        responses={
+            200: "Per-item results: 200, `INVALID_DATA`, `INVALID_CPF`, `USER_NOT_FOUND` or `USER_ALREADY_EXISTS`",
+            400: "`INVALID_DATA`"
+        },
+    )
+    @api.expect(_user_filters_parser)
+    @api.marshal_with(_user_bulk_change_response, code=200, skip_none=True, description="Updated users")
+    def patch(self):
+        """Update many users by id, or every user matching the filters."""
+        if has_request_items(allow_object=True):
+            items = update_users(iter_request_items())
+            return {"count": sum(item["code"] == 200 for item in items), "items": items}, 200
+        return {"count": update_users_by_filter(request.get_json(silent=True)), "items": None}, 200
+
+    @api.doc(
+        description="Send a JSON array or NDJSON stream of ids to delete users by id, "
+                    "or no body to delete every user matching the filters.",
+        responses={
+            200: "Per-item results: 204, `INVALID_UUID_FORMAT`, `INVALID_DATA` or `USER_NOT_FOUND`",
+            400: "`INVALID_DATA`"
+        },
+    )
+    @api.expect(_user_filters_parser)
+    @api.marshal_with(_user_bulk_change_response, code=200, skip_none=True, description="Deleted users")
+    def delete(self):
+        """Delete many users by id, or every user matching the filters."""
+        if has_request_items():
+            items = delete_users(iter_request_items())
+            return {"count": sum(item["code"] == 204 for item in items), "items": items}, 200
+        return {"count": delete_users_by_filter(), "items": None}, 200
+
+
+@api.route("/lookup")
+class UserLookupResource(Resource):
+    @api.expect(_user_lookup, validate=True)
+    @api.doc(responses={
+        200: "Users found and missing ids",
+        400: "`INVALID_UUID_FORMAT` `INVALID_DATA`"
     })
+    @api.marshal_with(_user_lookup_response, code=200, description="Users found and missing ids")
+    def post(self):
+        """Get many users by id with a single query."""
+        return lookup_users(request.json["ids"]), 200
+
+
+@api.route("/export")
+class UserExportResource(Resource):
+    @api.doc(responses={
+        200: "Streamed NDJSON or CSV export",
+        400: "`INVALID_EXPORT_FORMAT`"
+    })
+    @api.expect(_user_export_parser, _user_filters_parser)
+    def get(self):
+        """Export the registered users as NDJSON or CSV."""
+        return export_users(format=request.args.get("format", "ndjson"))
+
+
+@api.route("/cache")
+class UserCacheResource(Resource):
+    @api.expect(_admin_token_parser)
+    @api.doc(responses={403: "`ADMIN_FORBIDDEN`"})
+    @api.marshal_with(_user_cache_stats, code=200, description="User cache statistics")
+    def get(self):
+        """Get the statistics of the user cache of this worker."""
+        check_admin_request()
+        return user_cache.stats(), 200
+
+
+@api.route("/<string:id>")
+class UserByIdResource(Resource):
+    @api.doc(
+        params={"If-Match": {"in": "header", "description": "ETag of the user; the update fails if it changed"}},
+        responses={
+            400: "`INVALID_UUID_FORMAT`",
+            404: "`USER_NOT_FOUND`",
+            406: "`INVALID_CPF`",
+            409: "`USER_ALREADY_EXISTS`",
+            412: "`USER_VERSION_MISMATCH`"
+        },
+    )
     @api.expect(_user_put, validate=True)
     @api.marshal_with(_user)
     def put(self, id: str):
         """Update user by id"""
         data = request.json
-        return update_user(data, id=id), 200
+        user = update_user(data, id=id, versions=get_if_match_versions())
+        return user, 200, {"ETag": quote_etag(get_version_etag(user["version"], get_fields_mask()))}
     
     @api.doc("find user by id", responses={
+        304: "Not Modified",
         404: "`USER_NOT_FOUND`"
     })
-    @api.marshal_list_with(_user)
+    @api.response(200, "Success", _user)
     def get(self, id: str):
         """Get a registered user by id"""
-        return find_user_by(id=id), 200
+        user = get_user(id)
+        return conditional_response(get_version_etag(user["version"], get_fields_mask()), user, _user)
     
-    @api.doc("delete user by id", responses={
-        404: "`USER_NOT_FOUND`",
-        204: "User deleted"
-    })
+    @api.doc(
+        "delete user by id",
+        params={"If-Match": {"in": "header", "description": "ETag of the user; the delete fails if it changed"}},
+        responses={
+            400: "`INVALID_UUID_FORMAT`",
+            404: "`USER_NOT_FOUND`",
+            412: "`USER_VERSION_MISMATCH`",
+            204: "User deleted"
+        },
+    )
     def delete(self, id: str):
         """Delete user by id"""
-        return delete_user(id=id), 204
+        return delete_user(id=id, versions=get_if_match_versions()), 204
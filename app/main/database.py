@@ -0,0 +1,314 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from itertools import cycle
+
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+from .util.metrics import Histogram
+
+POOL_SIZE_OPTIONS = ("pool_size", "max_overflow", "pool_timeout")
+
+REPLICA_BIND_PREFIX = "replica_"
+
+_route = ContextVar("db_route", default=None)
+
+
+_CACHE_RESULTS = {
+    CACHE_HIT: "hits",
+    CACHE_MISS: "misses",
+}
+
+
+class EngineStats:
+    """Per-engine count of executed statements and of their compiled statement cache lookups."""
+
+    def __init__(self):
+        self._names = {}
+        self._counts = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get_engines(self) -> dict:
+        """
+        Get the registered engines.
+
+        Returns:
+            dict: The engines by name.
+        """
+        return {name: engine for engine, name in list(self._names.items())}
+
+    def register(self, engine: Engine, name: str):
+        """
+        Name an engine in the statistics.
+
+        Args:
+            engine (Engine): The engine.
+            name (str): `primary` or the bind key of the engine.
+        """
+        self._names[engine] = name
+
+    def increment(self, engine: Engine, context=None):
+        """
+        Count a statement executed by an engine.
+
+        Args:
+            engine (Engine): The engine that executed the statement.
+            context (ExecutionContext, optional): The execution context, telling whether
+                the compiled statement came from the cache. Defaults to None.
+        """
+        name = self._names.get(engine, "unknown")
+        result = _CACHE_RESULTS.get(getattr(context, "cache_hit", None), "uncached")
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+            cache = self._cache.setdefault(name, {"hits": 0, "misses": 0, "uncached": 0})
+            cache[result] += 1
+
+    def get_counts(self) -> dict:
+        """
+        Get the number of statements executed by each engine.
+
+        Returns:
+            dict: The statement counts by engine name.
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    def get_cache_stats(self) -> dict:
+        """
+        Get the compiled statement cache lookups of each engine.
+
+        Statements built with bound parameters are compiled once per shape and then
+        found in the cache; `uncached` counts statements that can't be cached, such as
+        raw SQL strings.
+
+        Returns:
+            dict: The hits, misses, uncached statements, hit ratio and cached entries by engine name.
+        """
+        engines = self.get_engines()
+        with self._lock:
+            stats = {name: dict(cache) for name, cache in self._cache.items()}
+        for name, cache in stats.items():
+            lookups = cache["hits"] + cache["misses"]
+            cache["hit_ratio"] = round(cache["hits"] / lookups, 4) if lookups else None
+            if (compiled_cache := getattr(engines.get(name), "_compiled_cache", None)) is not None:
+                cache["entries"] = len(compiled_cache)
+                cache["capacity"] = compiled_cache.capacity
+        return stats
+
+
+engine_stats = EngineStats()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    engine_stats.increment(conn.engine, context)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long checkouts wait and how long new connections take.
+
+    The connection times are recorded by pool events, see `instrument_pool`. The wait
+    of a checkout has no event: the `checkout` event fires once a connection is handed
+    out, so `_do_get`, where the pool waits on its queue and raises `TimeoutError`
+    after `pool_timeout`, is overridden to time it.
+
+    Attributes:
+        wait_time (Histogram): Time spent getting a connection from the pool.
+        connect_time (Histogram): Time spent opening new database connections.
+        timeouts (int): Checkouts that gave up after `pool_timeout`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = Histogram()
+        self.connect_time = Histogram()
+        self.timeouts = 0
+        self._timeouts_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            with self._timeouts_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            self.wait_time.observe(time.perf_counter() - start)
+
+
+_CONNECT_START_KEY = "connect_start"
+
+
+def instrument_pool(engine: Engine):
+    """
+    Record the time an engine with an `InstrumentedQueuePool` takes to open connections.
+
+    The dialect `do_connect` event marks the start on the connection record, and the
+    pool `connect` event, once the connection is set up, records the time on the
+    current pool of the engine, which `dispose` replaces.
+
+    Args:
+        engine (Engine): The engine.
+    """
+    @event.listens_for(engine, "do_connect")
+    def _start_connect(dialect, connection_record, cargs, cparams):
+        connection_record.info[_CONNECT_START_KEY] = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def _observe_connect(dbapi_connection, connection_record):
+        if (start := connection_record.info.pop(_CONNECT_START_KEY, None)) is not None:
+            engine.pool.connect_time.observe(time.perf_counter() - start)
+
+
+def get_pool_stats(name: str, engine: Engine) -> dict:
+    """
+    Get the current state and the timings of the connection pool of an engine.
+
+    Args:
+        name (str): The engine name.
+        engine (Engine): The engine.
+
+    Returns:
+        dict: The pool statistics; pools other than `InstrumentedQueuePool` only report their class.
+    """
+    pool = engine.pool
+    stats = {"name": name, "pool": type(pool).__name__}
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            timeouts=pool.timeouts,
+            wait_time=pool.wait_time.to_dict(),
+            connect_time=pool.connect_time.to_dict(),
+        )
+    return stats
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session that sends the reads of `read_only` code paths to the read replicas.
+
+    Flushes, and every statement issued after the session has written, go to the
+    primary, so a request always reads its own writes.
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        self.wrote = False
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replicas = get_state(self.app).replicas
+        if replicas is None or self.wrote or self._flushing or _route.get() != "replica":
+            return super().get_bind(mapper, clause)
+        return self.db.get_engine(self.app, bind=next(replicas))
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_session_written(session, flush_context):
+    session.wrote = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """
+    SQLAlchemy extension with read-replica routing.
+
+    Each URI of `SQLALCHEMY_REPLICA_URIS` is registered as a `replica_<n>` bind and
+    used round-robin by `RoutingSession` for `read_only` code paths.
+
+    The engines are disposed in the child process after a fork, so a server that
+    creates the application before forking (`gunicorn --preload`) never shares a
+    database connection between workers.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        os.register_at_fork(after_in_child=self.dispose_engines)
+
+    def dispose_engines(self):
+        """Drop the pooled connections inherited from the parent process, without closing them."""
+        for engine in engine_stats.get_engines().values():
+            engine.dispose(close=False)
+
+    def warm_up(self, app):
+        """
+        Open the connections of every pool up to its size before serving traffic.
+
+        Args:
+            app (Flask): The application whose engines are warmed up.
+        """
+        binds = [None, *(app.config.get("SQLALCHEMY_BINDS") or {})]
+        for bind in binds:
+            engine = self.get_engine(app, bind=bind)
+            size = engine.pool.size() if isinstance(engine.pool, QueuePool) else 1
+            connections = [engine.connect() for _ in range(size)]
+            for connection in connections:
+                connection.close()
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        replica_uris = app.config.get("SQLALCHEMY_REPLICA_URIS") or []
+        replica_binds = {f"{REPLICA_BIND_PREFIX}{index}": uri for index, uri in enumerate(replica_uris)}
+        app.config["SQLALCHEMY_BINDS"] = {**(app.config.get("SQLALCHEMY_BINDS") or {}), **replica_binds}
+
+        super().init_app(app)
+        get_state(app).replicas = cycle(replica_binds) if replica_binds else None
+
+    def create_engine(self, sa_url, engine_opts):
+        if sa_url.drivername.startswith("sqlite"):
+            engine_opts = {key: value for key, value in engine_opts.items() if key not in POOL_SIZE_OPTIONS}
+        else:
+            engine_opts = {"poolclass": InstrumentedQueuePool, **engine_opts}
+        engine = super().create_engine(sa_url, engine_opts)
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            instrument_pool(engine)
+        return engine
+
+    def get_engine(self, app=None, bind=None):
+        engine = super().get_engine(app, bind)
+        engine_stats.register(engine, bind or "primary")
+        return engine
+
+
+def _route_with(f, route: str):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if _route.get() is not None:
+            return f(*args, **kwargs)
+        token = _route.set(route)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            _route.reset(token)
+    return wrapper
+
+
+def read_only(f):
+    """
+    Send the queries of the decorated function to a read replica, when configured.
+
+    The routing of an enclosing `read_only` or `read_write` function takes precedence.
+    """
+    return _route_with(f, "replica")
+
+
+def read_write(f):
+    """
+    Keep the queries of the decorated function, including the `read_only` functions
+    it calls, on the primary.
+    """
+    return _route_with(f, "primary")
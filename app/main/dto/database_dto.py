@@ -0,0 +1,40 @@
+from flask_restx import Namespace, fields
+
+
+class DatabaseDTO:
+    api = Namespace("database", description="Database engines statistics")
+
+    admin_token_parser = api.parser()
+    admin_token_parser.add_argument("X-Admin-Token", location="headers", required=True, help="The ADMIN_TOKEN")
+
+    engine_stats = api.model(
+        "EngineStats",
+        {
+            "queries": fields.Raw(
+                required=True,
+                description="Statements executed by this worker, by engine (`primary`, `replica_<n>`)",
+                example={"primary": 120, "replica_0": 340},
+            ),
+            "statement_cache": fields.Raw(
+                required=True,
+                description="Compiled statement cache lookups of this worker, by engine",
+                example={"primary": {"hits": 110, "misses": 8, "uncached": 2, "hit_ratio": 0.9322,
+                                     "entries": 8, "capacity": 500}},
+            ),
+        },
+    )
+
+    pool_stats = api.model(
+        "PoolStats",
+        {
+            "name": fields.String(required=True, description="Engine name", example="primary"),
+            "pool": fields.String(required=True, description="Pool class", example="InstrumentedQueuePool"),
+            "size": fields.Integer(description="Configured pool size"),
+            "checked_out": fields.Integer(description="Connections in use"),
+            "checked_in": fields.Integer(description="Idle connections in the pool"),
+            "overflow": fields.Integer(description="Connections opened above the pool size"),
+            "timeouts": fields.Integer(description="Checkouts that timed out"),
+            "wait_time": fields.Raw(description="Histogram of checkout wait time, in seconds"),
+            "connect_time": fields.Raw(description="Histogram of connection opening time, in seconds"),
+        },
+    )
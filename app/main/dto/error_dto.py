@@ -7,9 +7,9 @@ class ErrorsDTO:
     api = Namespace("error", description="API erors operations")
 
     error_filters_parser = reqparse.RequestParser()
-    error_filters_parser.add_argument("code", type=inputs.regex(r"^[1-5][0-9]{2}$"), location="query")
-    error_filters_parser.add_argument("api_code", type=str, location="query")
-    error_filters_parser.add_argument("description", type=str, location="query")
+    error_filters_parser.add_argument("code", type=inputs.regex(r"^[1-5][0-9]{2}$"), location="args")
+    error_filters_parser.add_argument("api_code", type=str, location="args")
+    error_filters_parser.add_argument("description", type=str, location="args")
 
     error = api.model(
         "Error",
@@ -18,15 +18,29 @@ class PaginationDTO:
             "per_page": fields.Integer(required=True, description="Per Page"),
             "prev_num": fields.Integer(required=True, description="Prev Num"),
             "next_num": fields.Integer(required=True, description="Next Num"),
+            "next_cursor": fields.String(description="Cursor of the next page (cursor pagination only)"),
         },
     )
 
     pagination_parser = reqparse.RequestParser()
-    pagination_parser.add_argument("page", type=int, location="query")
-    pagination_parser.add_argument("per_page", type=int, location="query")
+    pagination_parser.add_argument("page", type=int, location="args")
+    pagination_parser.add_argument("per_page", type=int, location="args")
+    pagination_parser.add_argument(
+        "cursor",
+        type=str,
+        location="args",
+        help="Opt-in keyset pagination; send it empty for the first page, then the returned next_cursor",
+    )
+    pagination_parser.add_argument(
+        "count",
+        type=str,
+        location="args",
+        choices=("exact", "estimate", "none"),
+        help="How the total is computed: exact (cached briefly), estimate or none",
+    )
 
     page_parser = reqparse.RequestParser()
-    page_parser.add_argument("page", type=int, location="query")
+    page_parser.add_argument("page", type=int, location="args")
 
     per_page_parser = reqparse.RequestParser()
-    per_page_parser.add_argument("per_page", type=int, location="query")
+    per_page_parser.add_argument("per_page", type=int, location="args")
@@ -0,0 +1,32 @@
+from flask_restx import Namespace, fields
+
+
+class ProfileDTO:
+    api = Namespace("profile", description="Request profiles")
+
+    profile_token_parser = api.parser()
+    profile_token_parser.add_argument("X-Profile-Token", location="headers", help="The PROFILE_TOKEN")
+    profile_token_parser.add_argument("X-Admin-Token", location="headers", help="Or the ADMIN_TOKEN")
+
+    profile = api.model(
+        "Profile",
+        {
+            "id": fields.String(required=True, description="Profile id", example="5f0c6c2b9d3a4e1f8b7a6c5d4e3f2a1b"),
+            "created": fields.DateTime(required=True, description="When the profile was saved"),
+            "reason": fields.String(
+                required=True,
+                description="`requested` by the token header, `sampled`, or `slow` over PROFILE_SLOW_MS",
+                enum=["requested", "sampled", "slow"],
+            ),
+            "method": fields.String(required=True, example="GET"),
+            "path": fields.String(required=True, description="Path, without the query string", example="/api/user/"),
+            "status": fields.Integer(description="Response status code"),
+            "request_id": fields.String(description="X-Request-ID of the request"),
+            "duration_ms": fields.Float(required=True, description="Request duration, in milliseconds"),
+            "pid": fields.Integer(required=True, description="Worker process id"),
+            "formats": fields.List(
+                fields.String(enum=["pstats", "collapsed"]),
+                description="Stored formats: cProfile `pstats`, and sampled `collapsed` stacks for flame graphs",
+            ),
+        },
+    )
@@ -1,18 +1,48 @@
+import copy
+
 from flask_restx import Namespace, fields, inputs
 
+from .error_dto import ErrorsDTO
 from .pagination_dto import PaginationDTO
 
 
 id_pattern = r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
 
+def optional(field: fields.Raw) -> fields.Raw:
+    """
+    Copy a field, making it optional.
+
+    Args:
+        field (fields.Raw): The field to copy.
+
+    Returns:
+        fields.Raw: The optional copy.
+    """
+    field = copy.copy(field)
+    field.required = False
+    field.__dict__.pop("__schema__", None)
+    return field
+
+
 class UserDTO:
     api = Namespace("user", description="User related operations")
 
     user_filters_parser = api.parser()
-    user_filters_parser.add_argument("search", type=str, location="query")
-    user_filters_parser.add_argument("name", type=str, location="query")
-    user_filters_parser.add_argument("cpf",type=inputs.regex(r"(^\d{11}$)"), location="query",)
-    user_filters_parser.add_argument("age", type=str, location="query")
+    user_filters_parser.add_argument("search", type=str, location="args")
+    user_filters_parser.add_argument("name", type=str, location="args")
+    user_filters_parser.add_argument("cpf",type=inputs.regex(r"(^\d{11}$)"), location="args",)
+    user_filters_parser.add_argument("age", type=str, location="args")
+
+    user_lookup_parser = api.parser()
+    user_lookup_parser.add_argument(
+        "ids",
+        type=str,
+        location="args",
+        help="Comma separated user ids; lists these users, as `POST /lookup` does, instead of a page",
+    )
+
+    user_export_parser = api.parser()
+    user_export_parser.add_argument("format", type=str, choices=("ndjson", "csv"), default="ndjson", location="args")
 
     user_put = api.model(
         "UserPut",
@@ -67,3 +97,97 @@ class UserDTO:
             "items": fields.List(fields.Nested(user)),
         },
     )
+
+    user_lookup = api.model(
+        "UserLookup",
+        {
+            "ids": fields.List(
+                fields.String(example="828666de-a8b9-43c9-86c8-767449a0fcbe"),
+                required=True,
+                description="Ids of the users to get",
+            ),
+        },
+        strict=True,
+    )
+
+    user_lookup_response = api.model(
+        "UserLookupResponse",
+        {
+            "items": fields.List(fields.Nested(user), description="Users found, in request order"),
+            "missing": fields.List(fields.String, description="Ids of the users that don't exist"),
+        },
+    )
+
+    user_bulk_result = api.model(
+        "UserBulkResult",
+        {
+            "index": fields.Integer(required=True, description="Position of the item in the request"),
+            "code": fields.Integer(required=True, description="HTTP status code of the item"),
+            "user": fields.Nested(user, allow_null=True, skip_none=True),
+            "error": fields.Nested(ErrorsDTO.error, allow_null=True, skip_none=True),
+        },
+    )
+
+    user_bulk_response = api.model(
+        "UserBulkResponse",
+        {
+            "items": fields.List(fields.Nested(user_bulk_result, skip_none=True)),
+        },
+    )
+
+    user_patch = api.model(
+        "UserPatch",
+        {
+            "id": fields.String(
+                required=True,
+                description="Id of the user to update",
+                pattern=id_pattern,
+                example="828666de-a8b9-43c9-86c8-767449a0fcbe",
+            ),
+            **{key: optional(field) for key, field in user_put.items()},
+        },
+        strict=True,
+    )
+
+    user_bulk_set = api.model(
+        "UserBulkSet",
+        {"name": optional(user_put["name"]), "age": optional(user_put["age"])},
+        strict=True,
+    )
+
+    user_bulk_change_result = api.model(
+        "UserBulkChangeResult",
+        {
+            "index": fields.Integer(required=True, description="Position of the item in the request"),
+            "id": fields.String(description="Id of the user"),
+            "code": fields.Integer(required=True, description="HTTP status code of the item"),
+            "error": fields.Nested(ErrorsDTO.error, allow_null=True, skip_none=True),
+        },
+    )
+
+    user_bulk_change_response = api.model(
+        "UserBulkChangeResponse",
+        {
+            "count": fields.Integer(required=True, description="Users updated or deleted"),
+            "items": fields.List(
+                fields.Nested(user_bulk_change_result, skip_none=True),
+                description="Per-item results, when ids were sent",
+            ),
+        },
+    )
+
+    user_cache_stats = api.model(
+        "UserCacheStats",
+        {
+            "size": fields.Integer(required=True, description="Users cached by this worker"),
+            "maxsize": fields.Integer(required=True, description="Users the cache holds at most"),
+            "ttl": fields.Float(required=True, description="Seconds a user is served from the cache"),
+            "hits": fields.Integer(required=True, description="Lookups served from the cache"),
+            "misses": fields.Integer(required=True, description="Lookups that read the database"),
+            "hit_ratio": fields.Float(description="Hits per lookup"),
+            "evictions": fields.Integer(required=True, description="Users dropped to stay under maxsize"),
+            "expirations": fields.Integer(required=True, description="Users dropped after the ttl"),
+            "invalidations": fields.Integer(required=True, description="Users dropped because they changed"),
+            "channel": fields.String(description="Channel of the invalidations, `postgresql` or `sqlite`"),
+        },
+    )
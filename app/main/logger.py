@@ -1,12 +1,199 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
 import yaml
+from flask import g, has_request_context, request
 from .config import app_config
 
-def get_logging_config():
-    """Get the logging configuration dictionary."""
-    with open('logging_config.yaml', 'r') as config_file:
+LOGGING_CONFIG_PATH = os.getenv(
+    "LOGGING_CONFIG_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "logging_config.yaml"),
+)
+
+LOG_SINK = "api.log_sink"
+
+RECORD_EXTRAS = ("request_id", "method", "path", "elapsed_ms", "status", "duration_ms", "sql_count", "sql_ms")
+
+
+class RequestContextFilter(logging.Filter):
+    """Add the request id, method, path and elapsed time to the records logged during a request."""
+
+    def filter(self, record):
+        if has_request_context() and not hasattr(record, "request_id"):
+            record.request_id = g.get("request_id")
+            record.method = request.method
+            record.path = request.path
+            if start := g.get("request_start"):
+                record.elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        entry.update((key, getattr(record, key)) for key in RECORD_EXTRAS if getattr(record, key, None) is not None)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class ProcessRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler whose file name may contain `{pid}`.
+
+    The file is opened by the process that writes to it, so workers forked from a
+    preloaded master each write to (and rotate) their own file.
+    """
+
+    def __init__(self, filename: str, *args, **kwargs):
+        self.filename_template = filename
+        self._pid = os.getpid()
+        kwargs["delay"] = True
+        super().__init__(filename.format(pid=self._pid), *args, **kwargs)
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            # The stream inherited from the parent is left to the parent.
+            self.stream = None
+            self.baseFilename = os.path.abspath(self.filename_template.format(pid=self._pid))
+        super().emit(record)
+
+
+class _SinkListener(QueueListener):
+    def __init__(self, log_queue, sink: str):
+        super().__init__(log_queue)
+        self.sink = logging.getLogger(sink)
+
+    def handle(self, record):
+        self.sink.handle(record)
+
+
+class LogQueueHandler(QueueHandler):
+    """
+    Handler that hands the records over to a background thread.
+
+    The records are put in a bounded queue, and a listener thread passes them to the
+    handlers of the `sink` logger, so formatting and I/O never run on the request
+    thread. Records are dropped, and counted, when the queue is full. The listener is
+    started again in a process forked after it started.
+
+    Attributes:
+        dropped (int): Records lost because the queue was full.
+    """
+
+    def __init__(self, sink: str = LOG_SINK, maxsize: int = 10000):
+        self.sink = sink
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+        super().__init__(queue.Queue(maxsize))
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        super().emit(record)
+
+    def stop(self):
+        """Write the queued records and stop the listener thread."""
+        with self._lock:
+            if self.listener is not None and self._pid == os.getpid():
+                self.listener.stop()
+            self.listener = None
+            self._pid = None
+
+    def close(self):
+        self.stop()
+        super().close()
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A queue and thread inherited through a fork can't be used: start new ones.
+            self.queue = queue.Queue(self.maxsize)
+            self.listener = _SinkListener(self.queue, self.sink)
+            self.listener.start()
+            self._pid = os.getpid()
+
+
+def get_logging_config(log_level: str = None, log_file: str = None, json_format: bool = False,
+                       use_queue: bool = False):
+    """
+    Get the logging configuration dictionary.
+
+    The configuration is read from `logging_config.yaml` at the project root, or from
+    `LOGGING_CONFIG_PATH`, whatever the working directory.
+
+    Args:
+        log_level (str, optional): The root log level. Defaults to the level of `ENV_NAME`.
+        log_file (str, optional): The file of the `rotating_file` handler; `{pid}` is
+            replaced by the id of the writing process. Defaults to the YAML file name.
+        json_format (bool, optional): Whether every handler writes JSON lines. Defaults to False.
+        use_queue (bool, optional): Whether the root handlers run on a background thread,
+            behind a `LogQueueHandler`. Defaults to False.
+    """
+    with open(LOGGING_CONFIG_PATH, 'r') as config_file:
         logging_config = yaml.safe_load(config_file)
-    
-    log_level = app_config.LOG_LEVEL
-    logging_config['root']['level'] = log_level
+
+    logging_config['root']['level'] = log_level or app_config.LOG_LEVEL
+    # The application modules, and their loggers, are imported before logging is configured.
+    logging_config.setdefault('disable_existing_loggers', False)
+
+    handlers = logging_config['handlers']
+    if log_file and 'rotating_file' in handlers:
+        handlers['rotating_file']['filename'] = log_file
+
+    if json_format:
+        logging_config.setdefault('formatters', {})['json'] = {'()': JsonFormatter}
+        for handler in handlers.values():
+            handler['formatter'] = 'json'
+
+    logging_config.setdefault('filters', {})['request_context'] = {'()': RequestContextFilter}
+    root_handlers = logging_config['root']['handlers']
+    if use_queue:
+        logging_config.setdefault('loggers', {})[LOG_SINK] = {'handlers': root_handlers, 'propagate': False}
+        handlers['queue'] = {'()': LogQueueHandler, 'sink': LOG_SINK, 'filters': ['request_context']}
+        logging_config['root']['handlers'] = ['queue']
+    else:
+        for name in root_handlers:
+            handlers[name].setdefault('filters', []).append('request_context')
 
     return logging_config
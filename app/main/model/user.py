@@ -1,11 +1,12 @@
-from sqlalchemy.dialects.postgresql import UUID
 from .. import db
+from .types import GUID
 import uuid
 
 class User(db.Model):
     __tablename__ = "users"
 
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = db.Column(GUID(), primary_key=True, default=uuid.uuid4)
     name = db.Column(db.String(80), nullable=False)
-    cpf = db.Column(db.String(11), nullable=False)
+    cpf = db.Column(db.String(11), nullable=False, unique=True, index=True)
     age = db.Column(db.String(3), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
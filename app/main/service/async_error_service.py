@@ -0,0 +1,21 @@
+from ..dto.error_dto import ErrorsDTO
+from ..model import Error
+from ..util.async_pagination_utils import paginate
+from ..util.pagination_utils import get_error_filters
+from ..util.serialization_utils import get_model_columns
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_error_columns = get_model_columns(Error, ErrorsDTO.error)
+
+
+async def get_filtered_errors(session: AsyncSession):
+    """
+    Get a paginated list of filtered errors.
+
+    Args:
+        session (AsyncSession): The session.
+
+    Returns:
+        OffsetPagination: The page, holding rows of the serialized columns.
+    """
+    return await paginate(session, Error, filter=get_error_filters(), columns=_error_columns)
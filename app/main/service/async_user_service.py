@@ -0,0 +1,229 @@
+import asyncio
+import uuid
+
+from ..dto.user_dto import UserDTO
+from ..model import User
+from ..util.api_error import APIError
+from ..util.async_pagination_utils import paginate
+from ..util.cache_utils import user_cache
+from ..util.pagination_utils import get_user_filters, get_user_search_ranking
+from ..util.bulk_utils import chunked
+from ..util.serialization_utils import get_model_columns, serialize
+from .user_service import is_cpf_conflict, parse_user_id, parse_user_ids
+from flask import current_app
+from pycpfcnpj.cpfcnpj import validate
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_user_columns = get_model_columns(User, UserDTO.user, "version")
+
+
+def _get_user_id(id: str) -> uuid.UUID:
+    if (user_id := parse_user_id(id)) is None:
+        raise APIError("Invalid UUID format.", code=400, api_code="INVALID_UUID_FORMAT")
+    return user_id
+
+
+def _user_not_found(user_id: uuid.UUID) -> APIError:
+    return APIError(
+        "User doesn't exist.",
+        code=404,
+        api_code="USER_NOT_FOUND",
+        info=f"User not found by params {{'id': {user_id!r}}}",
+    )
+
+
+async def _invalidate(user_id: uuid.UUID):
+    # Publishing may wait on the database or the invalidation file.
+    await asyncio.to_thread(user_cache.invalidate, str(user_id))
+
+
+async def get_all_users(session: AsyncSession):
+    """
+    Get a paginated list of the users matching the request filters.
+
+    Args:
+        session (AsyncSession): The session.
+
+    Returns:
+        OffsetPagination: The page, holding rows of the serialized columns.
+    """
+    return await paginate(
+        session, User, filter=get_user_filters(), columns=_user_columns, default_ordering=get_user_search_ranking()
+    )
+
+
+async def get_user(session: AsyncSession, id: str) -> dict:
+    """
+    Get a serialized user, from the cache of the worker when it holds it.
+
+    Args:
+        session (AsyncSession): The session.
+        id (str): The id of the user.
+
+    Returns:
+        dict: The `User` representation of the user, plus its `version`.
+
+    Raises:
+        APIError: If the id is invalid or the user doesn't exist.
+    """
+    user_id = _get_user_id(id)
+
+    async def load():
+        if (row := (await session.execute(select(*_user_columns).where(User.id == user_id))).first()) is None:
+            raise _user_not_found(user_id)
+        return {**serialize(row, UserDTO.user), "version": row.version}
+
+    return await user_cache.get_or_load_async(str(user_id), load)
+
+
+async def lookup_users(session: AsyncSession, ids: list) -> dict:
+    """
+    Get many serialized users by id, as `user_service.lookup_users` does.
+
+    Args:
+        session (AsyncSession): The session.
+        ids (list): The ids sent by the client.
+
+    Returns:
+        dict: The `items` found, each a `User` representation plus its `version`, and
+        the `missing` ids, both in request order.
+
+    Raises:
+        APIError: If there are too many ids or any of them is not a UUID.
+    """
+    keys = [str(user_id) for user_id in parse_user_ids(ids)]
+    users, generation = user_cache.get_many(keys)
+    if missing := [key for key in keys if key not in users]:
+        loaded = {}
+        for chunk in chunked(map(uuid.UUID, missing), current_app.config.get("USER_BULK_CHUNK_SIZE", 1000)):
+            for row in await session.execute(select(*_user_columns).where(User.id.in_(chunk))):
+                loaded[str(row.id)] = {**serialize(row, UserDTO.user), "version": row.version}
+        user_cache.set_many(loaded, generation)
+        users.update(loaded)
+    return {
+        "items": [users[key] for key in keys if key in users],
+        "missing": [key for key in keys if key not in users],
+    }
+
+
+async def save_new_user(session: AsyncSession, data) -> dict:
+    """
+    Save a new user with a single `INSERT`.
+
+    Args:
+        session (AsyncSession): The session.
+        data: `UserPost` data.
+
+    Returns:
+        dict: The new user's columns.
+
+    Raises:
+        APIError: If the CPF is invalid or already used.
+    """
+    if not validate(data["cpf"]):
+        raise APIError("The CPF provided is not valid.", code=406, api_code="INVALID_CPF")
+
+    user = {**data, "id": uuid.uuid4(), "version": 1}
+    try:
+        async with session.begin():
+            await session.execute(User.__table__.insert().values(**user))
+    except IntegrityError as error:
+        if is_cpf_conflict(error):
+            raise APIError("User already exists.", code=409, api_code="USER_ALREADY_EXISTS")
+        raise
+    return user
+
+
+async def update_user(session: AsyncSession, data, id: str, versions: list = None) -> dict:
+    """
+    Update a user's information with a single conditional `UPDATE`, as `user_service.update_user` does.
+
+    Args:
+        session (AsyncSession): The session.
+        data: `UserPut` data.
+        id (str): The user to update.
+        versions (list, optional): The versions the client expects, from `If-Match`.
+            Defaults to None, which updates any version.
+
+    Returns:
+        dict: The updated user's columns.
+
+    Raises:
+        APIError: If the CPF is invalid, if the CPF is used by another user,
+        if the user doesn't exist or if its version is not one of `versions`.
+    """
+    if not validate(data["cpf"]):
+        raise APIError("The CPF provided is not valid.", code=406, api_code="INVALID_CPF")
+    user_id = _get_user_id(id)
+
+    table = User.__table__
+    statement = table.update().where(table.c.id == user_id).values(**data, version=table.c.version + 1)
+    if versions is not None:
+        statement = statement.where(table.c.version.in_(versions))
+
+    try:
+        async with session.begin():
+            if session.bind.dialect.full_returning:
+                row = (await session.execute(statement.returning(*table.c))).first()
+            elif (await session.execute(statement)).rowcount:
+                row = (await session.execute(table.select().where(table.c.id == user_id))).first()
+            else:
+                row = None
+            exists = row is not None or (
+                versions is not None and await session.scalar(select(table.c.id).where(table.c.id == user_id))
+            )
+    except IntegrityError as error:
+        if is_cpf_conflict(error):
+            raise APIError("User already exists.", code=409, api_code="USER_ALREADY_EXISTS")
+        raise
+
+    if row is not None:
+        await _invalidate(user_id)
+        return dict(row._mapping)
+    if exists:
+        raise APIError(
+            "User was changed by another request.",
+            code=412,
+            api_code="USER_VERSION_MISMATCH",
+            info="If-Match doesn't match the current version of the user",
+        )
+    raise _user_not_found(user_id)
+
+
+async def delete_user(session: AsyncSession, id: str, versions: list = None):
+    """
+    Delete a user with a single conditional `DELETE`.
+
+    Args:
+        session (AsyncSession): The session.
+        id (str): The id of the user to delete.
+        versions (list, optional): The versions the client expects, from `If-Match`.
+            Defaults to None, which deletes any version.
+
+    Raises:
+        APIError: If the id is invalid, if the user doesn't exist or if its version
+        is not one of `versions`.
+    """
+    user_id = _get_user_id(id)
+    table = User.__table__
+    statement = table.delete().where(table.c.id == user_id)
+    if versions is not None:
+        statement = statement.where(table.c.version.in_(versions))
+    async with session.begin():
+        deleted = (await session.execute(statement)).rowcount
+        exists = not deleted and versions is not None and await session.scalar(
+            select(table.c.id).where(table.c.id == user_id)
+        )
+    if deleted:
+        await _invalidate(user_id)
+        return
+    if exists:
+        raise APIError(
+            "User was changed by another request.",
+            code=412,
+            api_code="USER_VERSION_MISMATCH",
+            info="If-Match doesn't match the current version of the user",
+        )
+    raise _user_not_found(user_id)
@@ -1,13 +1,24 @@
+from ..database import read_only
+from ..dto.error_dto import ErrorsDTO
 from ..model import Error
 from ..util.pagination_utils import get_error_filters, paginate
+from ..util.serialization_utils import get_model_columns
+from flask import current_app
 
+_error_list_columns = get_model_columns(Error, ErrorsDTO.error)
 
+
+@read_only
 def get_filtered_errors():
     """
     Get a paginated list of filtered errors.
 
+    With `FAST_SERIALIZATION` the page holds rows of the serialized columns instead of
+    `Error` objects.
+
     Returns:
         Pagination: Paginated list of Error objects.
     """
     errors_filter = get_error_filters()
-    return paginate(table=Error, filter=errors_filter)
+    columns = _error_list_columns if current_app.config.get("FAST_SERIALIZATION") else None
+    return paginate(table=Error, filter=errors_filter, columns=columns)
@@ -1,11 +1,29 @@
 from .. import db
+from ..database import read_only, read_write
+from ..dto.user_dto import UserDTO, id_pattern
 from ..util.api_error import APIError
+from ..util.bulk_utils import chunked
+from ..util.cache_utils import user_cache
+from ..util.export_utils import stream_query
 from ..model import User
-from ..util.pagination_utils import paginate, get_user_filters
+from ..util.pagination_utils import paginate, get_user_filters, get_user_search_ranking
+from ..util.serialization_utils import get_model_columns, serialize
+from flask import current_app
+from jsonschema import Draft4Validator
 from pycpfcnpj.cpfcnpj import validate
+from sqlalchemy import case, or_
+from sqlalchemy.exc import IntegrityError
+import re
 import uuid
 
+_user_post_validator = Draft4Validator(UserDTO.user_post.__schema__)
+_user_patch_validator = Draft4Validator(UserDTO.user_patch.__schema__)
+_user_bulk_set_validator = Draft4Validator(UserDTO.user_bulk_set.__schema__)
+_user_list_columns = get_model_columns(User, UserDTO.user, "version")
+_id_pattern = re.compile(id_pattern)
 
+
+@read_only
 def find_user_by(**user_attr) -> User:
     """
     Find a user by specified attributes.
@@ -20,11 +38,9 @@ def find_user_by(**user_attr) -> User:
         APIError: If the user is not found.
     """
     if 'id' in user_attr:
-        id_str = user_attr['id']
-        if len(id_str) != 36:
+        if (user_id := parse_user_id(user_attr['id'])) is None:
             raise APIError("Invalid UUID format.", code=400, api_code="INVALID_UUID_FORMAT")
-        user_attr['id'] = uuid.UUID(id_str)
-
+        user_attr['id'] = user_id
 
     if user := User.query.filter_by(**user_attr).first():
         return user
@@ -36,10 +52,105 @@ def find_user_by(**user_attr) -> User:
     )
 
 
+def get_user(id: str) -> dict:
+    """
+    Get a serialized user, from the cache of the worker when it holds it.
+
+    Args:
+        id (str): The id of the user.
+
+    Returns:
+        dict: The `User` representation of the user, plus its `version`.
+
+    Raises:
+        APIError: If the id is invalid or the user doesn't exist.
+    """
+    if (user_id := parse_user_id(id)) is None:
+        raise APIError("Invalid UUID format.", code=400, api_code="INVALID_UUID_FORMAT")
+
+    # Filled from the primary: a replica may still hold the row an invalidation dropped.
+    @read_write
+    def load():
+        user = find_user_by(id=str(user_id))
+        return {**serialize(user, UserDTO.user), "version": user.version}
+
+    return user_cache.get_or_load(str(user_id), load)
+
+
+def lookup_users(ids: list) -> dict:
+    """
+    Get many serialized users by id, loading the ones missing from the cache of the
+    worker with a single `SELECT ... WHERE id IN (...)`.
+
+    Args:
+        ids (list): The ids sent by the client.
+
+    Returns:
+        dict: The `items` found, each a `User` representation plus its `version`, and
+        the `missing` ids, both in request order.
+
+    Raises:
+        APIError: If there are too many ids or any of them is not a UUID.
+    """
+    keys = [str(user_id) for user_id in parse_user_ids(ids)]
+    users, generation = user_cache.get_many(keys)
+    if missing := [key for key in keys if key not in users]:
+        loaded = _load_users(missing)
+        user_cache.set_many(loaded, generation)
+        users.update(loaded)
+    return {
+        "items": [users[key] for key in keys if key in users],
+        "missing": [key for key in keys if key not in users],
+    }
+
+
+@read_write
+def _load_users(keys: list) -> dict:
+    users = {}
+    for chunk in chunked(map(uuid.UUID, keys), current_app.config.get("USER_BULK_CHUNK_SIZE", 1000)):
+        for row in db.session.query(*_user_list_columns).filter(User.id.in_(chunk)):
+            users[str(row.id)] = {**serialize(row, UserDTO.user), "version": row.version}
+    return users
+
+
+def is_cpf_conflict(error: IntegrityError) -> bool:
+    """
+    Check whether an IntegrityError was raised by the unique index on `users.cpf`.
+
+    Args:
+        error (IntegrityError): The error raised by the database.
+
+    Returns:
+        bool: Whether the error is a duplicated CPF.
+    """
+    return "cpf" in str(error.orig)
+
+
+def commit_user_changes():
+    """
+    Commit the session, mapping a duplicated CPF to `USER_ALREADY_EXISTS`.
+
+    Raises:
+        APIError: If the CPF is already used by another user.
+    """
+    try:
+        db.session.commit()
+    except IntegrityError as error:
+        db.session.rollback()
+        if is_cpf_conflict(error):
+            raise APIError("User already exists.", code=409, api_code="USER_ALREADY_EXISTS")
+        raise
+
+
+@read_write
 def save_new_user(data: dict, skip_commit: bool = False) -> User:
     """
     Save a new user.
 
+    The unique index on `users.cpf` detects duplicates, so creating a user is a
+    single `INSERT`. When the commit is skipped nothing is written yet, so the
+    CPF is checked with a query instead.
+
     Args:
         data (dict): User data.
         skip_commit (bool): Whether to skip committing to the database.
@@ -53,58 +164,475 @@ def save_new_user(data: dict, skip_commit: bool = False) -> User:
     if not validate(data["cpf"]):
         raise APIError("The CPF provided is not valid.", code=406, api_code="INVALID_CPF")
 
-    if User.query.filter_by(cpf=data["cpf"]).first():
-        raise APIError("User already exists.", code=409, api_code="USER_ALREADY_EXISTS")
-
     user = User(**data)
-    if not skip_commit:
-        db.session.add(user)
-        db.session.commit()
+    if skip_commit:
+        if User.query.filter_by(cpf=data["cpf"]).first():
+            raise APIError("User already exists.", code=409, api_code="USER_ALREADY_EXISTS")
+        return user
 
+    db.session.add(user)
+    commit_user_changes()
     return user
 
 
-def update_user(data: dict, id: str) -> User:
+@read_write
+def save_new_users(items, skip_commit: bool = False) -> list[dict]:
     """
-    Update a user's information.
+    Save many new users, validating and inserting them in chunks.
+
+    Each chunk is checked against the database with a single `cpf IN (...)` query
+    and inserted with a single executemany `INSERT`.
+
+    Args:
+        items: Iterable of user data, e.g. from `iter_request_items`.
+        skip_commit (bool): Whether to skip committing each chunk to the database.
+
+    Returns:
+        list[dict]: One result per item, in input order, with the item `index`, the
+        HTTP `code` and either the created `user` or the `error`.
+    """
+    chunk_size = current_app.config.get("USER_BULK_CHUNK_SIZE", 1000)
+    results = []
+    index = 0
+    for chunk in chunked(items, chunk_size):
+        results.extend(_save_users_chunk(chunk, index, skip_commit))
+        index += len(chunk)
+    return results
+
+
+def _save_users_chunk(chunk: list, offset: int, skip_commit: bool) -> list[dict]:
+    try:
+        return _insert_users_chunk(chunk, offset, skip_commit)
+    except IntegrityError as error:
+        if not is_cpf_conflict(error):
+            raise
+        # A concurrent request inserted one of the CPFs after the IN (...) check:
+        # check again, now that the conflicting rows are visible.
+        return _insert_users_chunk(chunk, offset, skip_commit)
+
+
+def _insert_users_chunk(chunk: list, offset: int, skip_commit: bool) -> list[dict]:
+    results = [None] * len(chunk)
+    candidates = {}
+
+    for position, data in enumerate(chunk):
+        if not _user_post_validator.is_valid(data):
+            error = APIError("Invalid Data.", code=400, api_code="INVALID_DATA", info="Item doesn't match UserPost")
+        elif not validate(data["cpf"]):
+            error = APIError("The CPF provided is not valid.", code=406, api_code="INVALID_CPF")
+        elif data["cpf"] in candidates:
+            error = APIError("User already exists.", code=409, api_code="USER_ALREADY_EXISTS")
+        else:
+            candidates[data["cpf"]] = position
+            continue
+        results[position] = {"index": offset + position, "code": error.code, "error": error.to_error()}
+
+    if candidates:
+        existing = db.session.query(User.cpf).filter(User.cpf.in_(candidates)).all()
+        for cpf, in existing:
+            error = APIError("User already exists.", code=409, api_code="USER_ALREADY_EXISTS")
+            position = candidates.pop(cpf)
+            results[position] = {"index": offset + position, "code": error.code, "error": error.to_error()}
+
+    rows = [dict(chunk[position], id=uuid.uuid4()) for position in candidates.values()]
+    if rows:
+        with db.session.begin_nested():
+            db.session.execute(User.__table__.insert(), rows)
+        if not skip_commit:
+            db.session.commit()
+
+    for position, row in zip(candidates.values(), rows):
+        results[position] = {"index": offset + position, "code": 201, "user": row}
+    return results
+
+
+@read_write
+def update_user(data: dict, id: str, versions: list = None) -> dict:
+    """
+    Update a user's information with a single conditional `UPDATE`.
+
+    The statement only matches the user when its version is one of `versions`, and
+    increments the version. Databases supporting `RETURNING` send the updated row
+    back with the statement itself, others with one query in the same transaction.
 
     Args:
         data (dict): Updated user data.
         id (str): The user to update.
+        versions (list, optional): The versions the client expects, from `If-Match`.
+            Defaults to None, which updates any version.
 
     Returns:
-        User: The updated user.
+        dict: The updated user's columns.
+
+    Raises:
+        APIError: If the CPF is invalid or already used by another user, if the user
+        doesn't exist or if its version is not one of `versions`.
     """
     if not validate(data["cpf"]):
         raise APIError("The CPF provided is not valid.", code=406, api_code="INVALID_CPF")
-    
-    user = find_user_by(id=id)
-    
-    for attribute, new_value in data.items():
-        setattr(user, attribute, new_value)
-    db.session.commit()
-    return user
+    if (user_id := parse_user_id(id)) is None:
+        raise APIError("Invalid UUID format.", code=400, api_code="INVALID_UUID_FORMAT")
+
+    table = User.__table__
+    statement = table.update().where(table.c.id == user_id).values(**data, version=table.c.version + 1)
+    if versions is not None:
+        statement = statement.where(table.c.version.in_(versions))
+
+    try:
+        if db.session.get_bind().dialect.full_returning:
+            row = db.session.execute(statement.returning(*table.c)).first()
+        elif db.session.execute(statement).rowcount:
+            row = db.session.execute(table.select().where(table.c.id == user_id)).first()
+        else:
+            row = None
+        db.session.commit()
+    except IntegrityError as error:
+        db.session.rollback()
+        if is_cpf_conflict(error):
+            raise APIError("User already exists.", code=409, api_code="USER_ALREADY_EXISTS")
+        raise
 
+    if row is not None:
+        user_cache.invalidate(str(user_id))
+        return dict(row._mapping)
+    if versions is not None and db.session.query(User.id).filter(User.id == user_id).first():
+        raise APIError(
+            "User was changed by another request.",
+            code=412,
+            api_code="USER_VERSION_MISMATCH",
+            info="If-Match doesn't match the current version of the user",
+        )
+    raise APIError(
+        "User doesn't exist.",
+        code=404,
+        api_code="USER_NOT_FOUND",
+        info=f"User not found by params {{'id': {user_id!r}}}",
+    )
 
-def delete_user(id: str):
+
+@read_write
+def delete_user(id: str, versions: list = None):
     """
-    Delete a user from the database.
+    Delete a user with a single conditional `DELETE`.
 
     Args:
         id (str): The id of user to delete.
+        versions (list, optional): The versions the client expects, from `If-Match`.
+            Defaults to None, which deletes any version.
+
+    Raises:
+        APIError: If the id is invalid, if the user doesn't exist or if its version
+        is not one of `versions`.
     """
-    user = find_user_by(id=id)
+    if (user_id := parse_user_id(id)) is None:
+        raise APIError("Invalid UUID format.", code=400, api_code="INVALID_UUID_FORMAT")
 
-    db.session.delete(user)
+    table = User.__table__
+    statement = table.delete().where(table.c.id == user_id)
+    if versions is not None:
+        statement = statement.where(table.c.version.in_(versions))
+    deleted = db.session.execute(statement).rowcount
     db.session.commit()
 
+    if deleted:
+        user_cache.invalidate(str(user_id))
+        return
+    if versions is not None and db.session.query(User.id).filter(User.id == user_id).first():
+        raise APIError(
+            "User was changed by another request.",
+            code=412,
+            api_code="USER_VERSION_MISMATCH",
+            info="If-Match doesn't match the current version of the user",
+        )
+    raise APIError(
+        "User doesn't exist.",
+        code=404,
+        api_code="USER_NOT_FOUND",
+        info=f"User not found by params {{'id': {user_id!r}}}",
+    )
+
+
+def _item_error(index: int, error: APIError, id=None) -> dict:
+    result = {"index": index, "code": error.code, "error": error.to_error()}
+    if id is not None:
+        result["id"] = str(id)
+    return result
 
+
+def parse_user_id(value):
+    """
+    Parse a user id written in the canonical `8-4-4-4-12` hexadecimal form.
+
+    Args:
+        value: The id sent by the client.
+
+    Returns:
+        uuid.UUID | None: The id, or None if `value` is not a canonical UUID string.
+    """
+    if isinstance(value, str) and _id_pattern.fullmatch(value):
+        return uuid.UUID(value)
+    return None
+
+
+def parse_user_ids(values: list) -> list:
+    """
+    Parse a list of user ids, rejecting the list with every invalid id at once.
+
+    Args:
+        values (list): The ids sent by the client.
+
+    Returns:
+        list[uuid.UUID]: The distinct ids, in request order.
+
+    Raises:
+        APIError: If there are more than `USER_LOOKUP_MAX_IDS` ids, or if any of them is not a UUID.
+    """
+    max_ids = current_app.config.get("USER_LOOKUP_MAX_IDS", 1000)
+    if len(values) > max_ids:
+        raise APIError("Invalid Data.", code=400, api_code="INVALID_DATA", info=f"Send at most {max_ids} ids")
+    user_ids = [parse_user_id(value) for value in values]
+    if invalid := [value for value, user_id in zip(values, user_ids) if user_id is None]:
+        raise APIError(
+            "Invalid UUID format.",
+            code=400,
+            api_code="INVALID_UUID_FORMAT",
+            info=f"Invalid ids: {', '.join(map(str, invalid))}",
+        )
+    return list(dict.fromkeys(user_ids))
+
+
+def _get_filters_or_raise() -> list:
+    if users_filter := get_user_filters():
+        return users_filter
+    raise APIError(
+        "Invalid Data.",
+        code=400,
+        api_code="INVALID_DATA",
+        info="Send a list of ids or at least one filter",
+    )
+
+
+@read_write
+def update_users(items) -> list[dict]:
+    """
+    Update many users, each chunk with a single `UPDATE ... WHERE id IN (...)`.
+
+    The users and the CPFs used by other users are read with one query per chunk,
+    and the per-user values are set with `CASE` expressions.
+
+    Args:
+        items: Iterable of `UserPatch` data, e.g. from `iter_request_items`.
+
+    Returns:
+        list[dict]: One result per item, in input order, with the item `index`, the
+        user `id` and the HTTP `code`, plus the `error` of the failed items.
+    """
+    chunk_size = current_app.config.get("USER_BULK_CHUNK_SIZE", 1000)
+    results = []
+    index = 0
+    for chunk in chunked(items, chunk_size):
+        try:
+            results.extend(_update_users_chunk(chunk, index))
+        except IntegrityError as error:
+            if not is_cpf_conflict(error):
+                raise
+            # A concurrent request took one of the CPFs after the check: check again.
+            results.extend(_update_users_chunk(chunk, index))
+        index += len(chunk)
+    return results
+
+
+def _update_users_chunk(chunk: list, offset: int) -> list[dict]:
+    results = [None] * len(chunk)
+    candidates = {}
+    cpfs = {}
+
+    for position, data in enumerate(chunk):
+        id = None
+        if not _user_patch_validator.is_valid(data):
+            error = APIError("Invalid Data.", code=400, api_code="INVALID_DATA", info="Item doesn't match UserPatch")
+        elif len(data) == 1:
+            error = APIError("Invalid Data.", code=400, api_code="INVALID_DATA", info="No field to update")
+        elif (id := uuid.UUID(data["id"])) in candidates:
+            error = APIError("Invalid Data.", code=400, api_code="INVALID_DATA", info="Duplicated id")
+        elif "cpf" in data and not validate(data["cpf"]):
+            error = APIError("The CPF provided is not valid.", code=406, api_code="INVALID_CPF")
+        elif data.get("cpf") in cpfs:
+            error = APIError("User already exists.", code=409, api_code="USER_ALREADY_EXISTS")
+        else:
+            candidates[id] = position
+            if "cpf" in data:
+                cpfs[data["cpf"]] = id
+            continue
+        results[position] = _item_error(offset + position, error, id)
+
+    if candidates:
+        found = set()
+        rows = db.session.query(User.id, User.cpf).filter(or_(User.id.in_(candidates), User.cpf.in_(cpfs)))
+        for id, cpf in rows:
+            if id in candidates:
+                found.add(id)
+            if cpf in cpfs and cpfs[cpf] != id:
+                position = candidates.pop(cpfs.pop(cpf))
+                error = APIError("User already exists.", code=409, api_code="USER_ALREADY_EXISTS")
+                results[position] = _item_error(offset + position, error, chunk[position]["id"])
+        for id in set(candidates) - found:
+            position = candidates.pop(id)
+            error = APIError("User doesn't exist.", code=404, api_code="USER_NOT_FOUND")
+            results[position] = _item_error(offset + position, error, id)
+
+    if candidates:
+        table = User.__table__
+        values = {}
+        for column in ("name", "cpf", "age"):
+            whens = [
+                (table.c.id == id, chunk[position][column])
+                for id, position in candidates.items() if column in chunk[position]
+            ]
+            if whens:
+                values[column] = case(*whens, else_=table.c[column])
+        values["version"] = table.c.version + 1
+        with db.session.begin_nested():
+            db.session.execute(table.update().where(table.c.id.in_(candidates)).values(**values))
+        db.session.commit()
+        user_cache.invalidate(*map(str, candidates))
+
+    for id, position in candidates.items():
+        results[position] = {"index": offset + position, "id": str(id), "code": 200}
+    return results
+
+
+@read_write
+def update_users_by_filter(data: dict) -> int:
+    """
+    Update the users matching the request filters with a single `UPDATE`.
+
+    Args:
+        data (dict): `UserBulkSet` data, the values set on every matching user.
+
+    Returns:
+        int: The number of updated users.
+
+    Raises:
+        APIError: If the data is invalid or the request has no filter.
+    """
+    if not _user_bulk_set_validator.is_valid(data) or not data:
+        raise APIError("Invalid Data.", code=400, api_code="INVALID_DATA", info="Body doesn't match UserBulkSet")
+
+    table = User.__table__
+    statement = table.update().where(*_get_filters_or_raise()).values(**data, version=table.c.version + 1)
+    result = db.session.execute(statement)
+    db.session.commit()
+    if result.rowcount:
+        user_cache.invalidate_all()
+    return result.rowcount
+
+
+@read_write
+def delete_users(ids) -> list[dict]:
+    """
+    Delete many users, each chunk with a single `DELETE ... WHERE id IN (...)`.
+
+    Databases supporting `RETURNING` report the deleted ids with the statement itself,
+    others with one query before it.
+
+    Args:
+        ids: Iterable of user ids, e.g. from `iter_request_items`.
+
+    Returns:
+        list[dict]: One result per id, in input order, with the item `index`, the
+        user `id` and the HTTP `code`, plus the `error` of the failed items.
+    """
+    chunk_size = current_app.config.get("USER_BULK_CHUNK_SIZE", 1000)
+    table = User.__table__
+    returning = db.session.get_bind().dialect.full_returning
+    results = []
+    index = 0
+
+    for chunk in chunked(ids, chunk_size):
+        candidates = {}
+        for position, value in enumerate(chunk):
+            if (id := parse_user_id(value)) is None:
+                error = APIError("Invalid UUID format.", code=400, api_code="INVALID_UUID_FORMAT")
+            elif id in candidates:
+                error = APIError("Invalid Data.", code=400, api_code="INVALID_DATA", info="Duplicated id")
+            else:
+                candidates[id] = index + position
+                continue
+            results.append(_item_error(index + position, error, id))
+
+        if candidates:
+            statement = table.delete().where(table.c.id.in_(candidates))
+            if returning:
+                deleted = {id for id, in db.session.execute(statement.returning(table.c.id))}
+            else:
+                deleted = {id for id, in db.session.query(User.id).filter(User.id.in_(candidates))}
+                db.session.execute(statement)
+            db.session.commit()
+            user_cache.invalidate(*map(str, deleted))
+
+            for id, item_index in candidates.items():
+                if id in deleted:
+                    results.append({"index": item_index, "id": str(id), "code": 204})
+                else:
+                    error = APIError("User doesn't exist.", code=404, api_code="USER_NOT_FOUND")
+                    results.append(_item_error(item_index, error, id))
+        index += len(chunk)
+
+    return sorted(results, key=lambda result: result["index"])
+
+
+@read_write
+def delete_users_by_filter() -> int:
+    """
+    Delete the users matching the request filters with a single `DELETE`.
+
+    Returns:
+        int: The number of deleted users.
+
+    Raises:
+        APIError: If the request has no filter.
+    """
+    result = db.session.execute(User.__table__.delete().where(*_get_filters_or_raise()))
+    db.session.commit()
+    if result.rowcount:
+        user_cache.invalidate_all()
+    return result.rowcount
+
+
+@read_only
 def get_all_users():
     """
     Get a paginated list of all users.
 
+    With `FAST_SERIALIZATION` the page holds rows of the serialized columns instead of
+    `User` objects.
+
     Returns:
         Pagination: Paginated list of Users objects.
     """
     users_filter = get_user_filters()
-    return paginate(User, filter=users_filter)
+    columns = _user_list_columns if current_app.config.get("FAST_SERIALIZATION") else None
+    return paginate(User, filter=users_filter, default_ordering=get_user_search_ranking(), columns=columns)
+
+
+def export_users(format: str):
+    """
+    Export all users matching the request filters.
+
+    Args:
+        format (str): Either `ndjson` or `csv`.
+
+    Returns:
+        Response: The streamed export.
+    """
+    users_filter = get_user_filters()
+    columns = ["id", "name", "cpf", "age"]
+    query = db.session.query(*[getattr(User, column) for column in columns]).filter(*users_filter)
+    return stream_query(
+        query,
+        columns,
+        format,
+        filename="users",
+        batch_size=current_app.config.get("USER_EXPORT_BATCH_SIZE", 1000),
+    )
@@ -0,0 +1,45 @@
+import hmac
+
+from .api_error import APIError
+
+from flask import current_app, request
+
+ADMIN_HEADER = "X-Admin-Token"
+
+
+def get_admin_token() -> str:
+    """
+    Get the operator token sent with the request.
+
+    Returns:
+        str: The `X-Admin-Token` header, else the `Authorization: Bearer` credentials
+            sent by scrapers, or None.
+    """
+    if token := request.headers.get(ADMIN_HEADER):
+        return token
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, credentials = authorization.partition(" ")
+    return credentials.strip() if scheme.lower() == "bearer" else None
+
+
+def is_admin_request() -> bool:
+    """
+    Check the token of the request against `ADMIN_TOKEN`.
+
+    Returns:
+        bool: Whether `ADMIN_TOKEN` is set and the request sent it.
+    """
+    expected, token = current_app.config.get("ADMIN_TOKEN"), get_admin_token()
+    return bool(expected and token) and hmac.compare_digest(token.encode(), expected.encode())
+
+
+def check_admin_request():
+    """
+    Reject a request to the operational endpoints without the `ADMIN_TOKEN`.
+
+    Raises:
+        APIError: If the token is missing or wrong.
+    """
+    if not is_admin_request():
+        raise APIError("Operational endpoints require a valid token.", code=403, api_code="ADMIN_FORBIDDEN",
+                       info=f"Send the ADMIN_TOKEN in the {ADMIN_HEADER} header")
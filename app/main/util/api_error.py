@@ -1,5 +1,6 @@
 from .. import db
 from ..model import Error
+from .error_catalog import error_catalog
 from werkzeug.exceptions import HTTPException
 
 
@@ -12,9 +13,10 @@ class APIError(HTTPException):
         info (dict): Additional information about the error (default: None).
         code (int): HTTP status code for the error (default: None).
         api_code (str): API-specific error code (default: None).
+        headers (dict): Headers added to the error response (default: None).
     """
 
-    def __init__(self, message="Generic error", info=None, code=None, api_code=None):
+    def __init__(self, message="Generic error", info=None, code=None, api_code=None, headers=None):
         """
         Initialize the APIError instance.
 
@@ -23,40 +25,50 @@ class APIError(HTTPException):
             info (dict, optional): Additional information about the error (default: None).
             code (int, optional): HTTP status code for the error (default: None).
             api_code (str, optional): API-specific error code (default: None).
+            headers (dict, optional): Headers added to the error response, such as
+                `Retry-After` (default: None).
         """
         self.code = code
         self.description = message
         self.info = info
         self.api_code = (api_code or message).upper().replace(' ', '_').replace('.', '')
+        self.headers = headers or {}
 
         super().__init__()
 
-    def to_error(self) -> Error:
+    def to_error(self) -> dict:
         """
-        Convert the APIError to an Error model instance.
+        Convert the APIError to its serializable error representation.
 
-        If an Error instance with the same api_code already exists in the database, update its description.
-        Otherwise, create a new Error instance and add it to the database.
+        The HTTP status and name come from the in-process error catalog, so no database
+        I/O happens on the error path. Unknown api_codes are added to the catalog and
+        written to the database in the background.
 
         Returns:
-            Error: The converted Error model instance.
+            dict: The error fields expected by the `Error` response model.
         """
-        if error := Error.query.filter_by(api_code=self.api_code).first():
-            error.description = self.description
-        else:
-            error = Error(
-                code=self.code,
+        if not (entry := error_catalog.get(self.api_code)):
+            entry = error_catalog.register(
                 api_code=self.api_code,
+                code=self.code,
                 name=self.name,
                 description=self.description,
             )
-            db.session.add(error)
-            db.session.commit()
 
+        error = {**entry, "description": self.description}
         if self.info:
-            error.info = self.info
+            error["info"] = self.info
 
         return error
+
+    def get_headers(self, environ=None, scope=None) -> list:
+        """
+        Get the headers of the response werkzeug builds when no API error handler runs.
+
+        Returns:
+            list: The default headers followed by `headers`.
+        """
+        return [*super().get_headers(environ, scope), *self.headers.items()]
     
     @classmethod
     def add_errors_to_database(cls):
@@ -77,11 +89,31 @@ API_ERROR_CODES = {
         "name": "Bad Request",
         "description": "Invalid Data.",
     },
+    "INVALID_EXPORT_FORMAT": {
+        "code": 400,
+        "name": "Bad Request",
+        "description": "Invalid export format",
+    },
     "INVALID_UUID_FORMAT": {
         "code": 400,
         "name": "Bad Request",
         "description": "Invalid UUID format.",
     },
+    "INVALID_CURSOR": {
+        "code": 400,
+        "name": "Bad Request",
+        "description": "Invalid pagination cursor",
+    },
+    "INVALID_COUNT_MODE": {
+        "code": 400,
+        "name": "Bad Request",
+        "description": "Invalid count mode",
+    },
+    "INVALID_ORDERING_COLUMN": {
+        "code": 400,
+        "name": "Bad Request",
+        "description": "Invalid column to order",
+    },
     "PAGES_NOT_FOUND": {
         "code": 404,
         "name": "Not Found",
@@ -97,6 +129,36 @@ API_ERROR_CODES = {
         "name": "Not Found",
         "description": "Page doesn't exist.",
     },
+    "PROFILE_NOT_FOUND": {
+        "code": 404,
+        "name": "Not Found",
+        "description": "Profile doesn't exist.",
+    },
+    "PROFILE_FORBIDDEN": {
+        "code": 403,
+        "name": "Forbidden",
+        "description": "Profiling requires a valid token.",
+    },
+    "ADMIN_FORBIDDEN": {
+        "code": 403,
+        "name": "Forbidden",
+        "description": "Operational endpoints require a valid token.",
+    },
+    "USER_VERSION_MISMATCH": {
+        "code": 412,
+        "name": "Precondition Failed",
+        "description": "User was changed by another request.",
+    },
+    "RATE_LIMITED": {
+        "code": 429,
+        "name": "Too Many Requests",
+        "description": "Too many requests",
+    },
+    "SERVER_OVERLOADED": {
+        "code": 503,
+        "name": "Service Unavailable",
+        "description": "Server overloaded",
+    },
     "USER_ALREADY_EXISTS": {
         "code": 409,
         "name": "Conflict",
@@ -0,0 +1,151 @@
+import io
+import json
+import logging
+from functools import wraps
+
+from flask import request
+from starlette.requests import Request
+from starlette.responses import Response
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import quote_etag
+
+from ..async_database import async_db
+from ..dto.error_dto import ErrorsDTO
+from .api_error import APIError
+from .etag_utils import get_fields_mask
+from .serialization_utils import serialize
+
+logger = logging.getLogger(__name__)
+
+
+def get_environ(scope: dict) -> dict:
+    """
+    Build the WSGI environ of an ASGI HTTP request, without its body.
+
+    Args:
+        scope (dict): The ASGI connection scope.
+
+    Returns:
+        dict: The environ.
+    """
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        key = name.decode("latin-1").upper().replace("-", "_")
+        if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = f"HTTP_{key}"
+        environ[key] = f"{environ[key]},{value.decode('latin-1')}" if key in environ else value.decode("latin-1")
+    return environ
+
+
+def json_response(data, status: int = 200, headers: dict = None) -> Response:
+    """
+    Build a JSON response.
+
+    Args:
+        data: The serialized data.
+        status (int, optional): The status code. Defaults to 200.
+        headers (dict, optional): The response headers. Defaults to None.
+
+    Returns:
+        Response: The response.
+    """
+    return Response(json.dumps(data) + "\n", status, headers, media_type="application/json")
+
+
+def error_response(error: APIError) -> Response:
+    """
+    Build the response of an APIError, with the body the WSGI API sends for it.
+
+    Args:
+        error (APIError): The error.
+
+    Returns:
+        Response: The response.
+    """
+    if error.code >= 500:
+        logger.error("Exception on %s [%s]", request.path, request.method, exc_info=error)
+    body = {**serialize({"error": error.to_error()}, ErrorsDTO.error_response), "message": str(error)}
+    return json_response(body, error.code, error.headers)
+
+
+async def conditional_json_response(etag: str, data, model, status: int = 200, weak: bool = False) -> Response:
+    """
+    Answer a GET with `304 Not Modified` when the client already has the representation.
+
+    The asyncio counterpart of `etag_utils.conditional_response`.
+
+    Args:
+        etag (str): The unquoted entity tag of the current representation.
+        data: The object to serialize, or a coroutine function returning it.
+        model: The flask_restx model used to serialize `data`.
+        status (int, optional): The status code of a full response. Defaults to 200.
+        weak (bool, optional): Whether the entity tag is weak. Defaults to False.
+
+    Returns:
+        Response: The 304 response, or the serialized data.
+    """
+    headers = {"ETag": quote_etag(etag, weak)}
+    if request.if_none_match.contains_weak(etag):
+        return Response(status_code=304, headers=headers)
+
+    if callable(data):
+        data = await data()
+    return json_response(serialize(data, model, mask=get_fields_mask()), status, headers)
+
+
+async def get_json_body(starlette_request: Request):
+    """
+    Read the JSON body of a request.
+
+    Args:
+        starlette_request (Request): The request.
+
+    Returns:
+        The decoded body.
+
+    Raises:
+        APIError: If the body isn't JSON.
+    """
+    try:
+        return json.loads(await starlette_request.body())
+    except ValueError:
+        raise APIError("Invalid Data.", code=400, api_code="INVALID_DATA", info="Body must be JSON")
+
+
+def api_endpoint(f):
+    """
+    Run an async endpoint the way the WSGI API runs its resources.
+
+    The endpoint runs in a Flask request context built from the ASGI scope, so the
+    helpers reading the request arguments and headers, the configuration and the
+    serializers are shared with the WSGI API. An `APIError`, or an `HTTPException`
+    such as a failed payload validation, is answered with the same body and status.
+    """
+    @wraps(f)
+    async def endpoint(starlette_request: Request) -> Response:
+        with async_db.app.request_context(get_environ(starlette_request.scope)):
+            try:
+                return await f(starlette_request)
+            except APIError as error:
+                return error_response(error)
+            except HTTPException as error:
+                return json_response(getattr(error, "data", None) or {"message": error.description}, error.code)
+
+    return endpoint
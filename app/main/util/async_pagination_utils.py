@@ -0,0 +1,104 @@
+import json
+
+from flask import current_app, request
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+
+from .api_error import APIError
+from .count_utils import count_cache, get_count_key
+from .pagination_utils import OffsetPagination, get_count_mode, get_ordering_parameters, get_paginate_parameters
+
+
+async def get_exact_count(session: AsyncSession, table, filter: list) -> int:
+    """
+    Count the rows of a table matching filters, reusing a recent result for the same filters.
+
+    Args:
+        session (AsyncSession): The session.
+        table: The mapped class.
+        filter (list): The filters.
+
+    Returns:
+        int: The number of rows.
+    """
+    statement = select(func.count()).select_from(table).where(*filter)
+    ttl = current_app.config.get("PAGINATION_COUNT_CACHE_TTL", 0)
+    if ttl <= 0:
+        return await session.scalar(statement)
+
+    key = get_count_key([table], filter)
+    if (total := count_cache.get(key, ttl)) is None:
+        total = await session.scalar(statement)
+        count_cache.set(key, total)
+    return total
+
+
+async def get_total(session: AsyncSession, table, filter: list, mode: str):
+    """
+    Get the total rows according to the requested count mode, as `count_utils.get_total` does.
+
+    Args:
+        session (AsyncSession): The session.
+        table: The mapped class.
+        filter (list): The filters.
+        mode (str): One of `exact`, `estimate` or `none`.
+
+    Returns:
+        int: The total, or None when counting was skipped.
+    """
+    if mode == "none":
+        return None
+    dialect = session.bind.dialect
+    if mode == "exact" or dialect.name != "postgresql":
+        return await get_exact_count(session, table, filter)
+
+    statement = select(table).where(*filter).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    plan = await session.scalar(text(f"EXPLAIN (FORMAT JSON) {statement}"))
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def paginate(session: AsyncSession, table, filter: list, columns: list, default_ordering: list = []):
+    """
+    Paginate the rows of a table with LIMIT/OFFSET, as `pagination_utils.paginate` does.
+
+    Cursor pagination is only served by the WSGI API.
+
+    Args:
+        session (AsyncSession): The session.
+        table: The main table to paginate.
+        filter (list): The filters to apply.
+        columns (list): The columns selected; the items are rows of these columns.
+        default_ordering (list, optional): The ordering used when the request has no `sort`. Defaults to [].
+
+    Returns:
+        OffsetPagination: The paginated results.
+
+    Raises:
+        APIError: If the request asks for cursor pagination or no page is generated.
+    """
+    if "cursor" in request.args:
+        raise APIError(
+            "Invalid pagination cursor",
+            code=400,
+            api_code="INVALID_CURSOR",
+            info="Cursor pagination is not served by the asyncio API",
+        )
+
+    paginate_kwargs = get_paginate_parameters()
+    count_mode = get_count_mode("exact")
+    statement = select(*columns).where(*filter)
+    if clauses := get_ordering_parameters([], [table]) or default_ordering:
+        statement = statement.order_by(*clauses)
+
+    page = paginate_kwargs["page"]
+    per_page = max(1, min(paginate_kwargs["per_page"], paginate_kwargs["max_per_page"]))
+    rows = (await session.execute(statement.limit(per_page + 1).offset((page - 1) * per_page))).all() if page > 0 else []
+    if items := rows[:per_page]:
+        total = await get_total(session, table, filter, count_mode)
+        pagination = OffsetPagination(None, page, per_page, total, items, has_next=len(rows) > per_page)
+        pagination.limit = paginate_kwargs["max_per_page"]
+        return pagination
+    raise APIError("No page generated", code=404, api_code="PAGES_NOT_FOUND")
@@ -0,0 +1,94 @@
+import json
+from itertools import islice
+
+from .api_error import APIError
+
+from flask import request
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+
+
+def iter_request_items():
+    """
+    Iterate over the items of a bulk request body.
+
+    A JSON array body is parsed at once, while an NDJSON body is read line by line
+    from the request stream so arbitrarily large uploads use constant memory.
+    NDJSON lines that are not valid JSON are yielded as raw strings, so they can be
+    reported per item instead of failing the whole request.
+
+    Yields:
+        The decoded items, in body order.
+
+    Raises:
+        APIError: If a JSON body is not an array.
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        for line in request.stream:
+            if line := line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield line.decode(errors="replace")
+        return
+
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        raise APIError(
+            "Invalid Data.",
+            code=400,
+            api_code="INVALID_DATA",
+            info="Bulk body must be a JSON array or NDJSON",
+        )
+    yield from items
+
+
+def has_request_items(allow_object: bool = False) -> bool:
+    """
+    Check whether the request body is a list of items, as a JSON array or NDJSON.
+
+    A body that can't be read as items fails the request rather than being taken for
+    a missing one, so a malformed list never turns a bulk request into a filter one.
+
+    Args:
+        allow_object (bool, optional): Whether a JSON object body is accepted, and
+            reported as no items. Defaults to False.
+
+    Returns:
+        bool: Whether `iter_request_items` can read the body; False when there is no body.
+
+    Raises:
+        APIError: If the body is neither a JSON array, NDJSON, nor an allowed JSON object.
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        return True
+    if not request.get_data(cache=True):
+        return False
+
+    body = request.get_json(silent=True) if request.is_json else None
+    if isinstance(body, list):
+        return True
+    if allow_object and isinstance(body, dict):
+        return False
+    raise APIError(
+        "Invalid Data.",
+        code=400,
+        api_code="INVALID_DATA",
+        info="Bulk body must be a JSON array or NDJSON" + (", or a JSON object" if allow_object else ""),
+    )
+
+
+def chunked(iterable, size: int):
+    """
+    Split an iterable into lists of at most `size` items.
+
+    Args:
+        iterable: The items to split.
+        size (int): The maximum size of a chunk.
+
+    Yields:
+        list: The next chunk.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
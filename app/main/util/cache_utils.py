@@ -0,0 +1,445 @@
+import logging
+import os
+import select
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+ALL_KEYS = "*"
+
+_MISSING = object()
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invalidation (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, key TEXT NOT NULL, created REAL NOT NULL
+);
+"""
+
+# NOTIFY payloads are limited to 8000 bytes.
+_NOTIFY_KEYS = 100
+
+
+class LRUCache:
+    """
+    Bounded in-process cache whose entries expire after `ttl` seconds.
+
+    Every invalidation increments `generation`, so a value loaded before an
+    invalidation can be refused when it is stored after it.
+
+    Attributes:
+        maxsize (int): Entries kept; the least recently used are evicted beyond.
+        ttl (float): Seconds an entry is served after it was stored.
+        generation (int): Number of invalidations so far.
+        hits (int): Lookups that found a live entry.
+        misses (int): Lookups that found no entry or an expired one.
+        evictions (int): Entries dropped to stay under `maxsize`.
+        expirations (int): Entries dropped because they expired.
+        invalidations (int): Entries dropped because they changed.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Get a live entry, marking it as the most recently used.
+
+        Args:
+            key: The entry key.
+            default (optional): Returned when there is no live entry. Defaults to None.
+
+        Returns:
+            The cached value, or `default`.
+        """
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                self.misses += 1
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation: int = None) -> bool:
+        """
+        Store an entry.
+
+        Args:
+            key: The entry key.
+            value: The value.
+            generation (int, optional): The `generation` read before loading the value;
+                the value is not stored if anything was invalidated since. Defaults to None.
+
+        Returns:
+            bool: Whether the value was stored.
+        """
+        with self._lock:
+            if self.maxsize <= 0 or generation is not None and generation != self.generation:
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, key):
+        """
+        Drop an entry, or every entry when `key` is `ALL_KEYS`.
+
+        Args:
+            key: The entry key.
+        """
+        with self._lock:
+            self.generation += 1
+            if key == ALL_KEYS:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry, without counting them as invalidated."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Get the size and counters of the cache.
+
+        Returns:
+            dict: The size, bounds, counters and hit ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class SQLiteInvalidationChannel:
+    """
+    Invalidations shared by the processes of a host through a SQLite file.
+
+    Published keys are appended to a table that a thread of each process polls every
+    `poll_interval` seconds. Rows are deleted after `retention` seconds.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, channel: str, path: str, poll_interval: float = 0.1, retention: float = 60.0):
+        self.channel = channel
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._local = threading.local()
+        self._last_prune = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.executescript(_SQLITE_SCHEMA)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return self._local.connection
+
+    def publish(self, keys: list):
+        """
+        Send invalidated keys to every process.
+
+        Args:
+            keys (list): The keys.
+        """
+        connection = self._connect()
+        now = time.time()
+        connection.executemany(
+            "INSERT INTO invalidation (channel, key, created) VALUES (?, ?, ?)",
+            [(self.channel, key, now) for key in keys],
+        )
+        if now - self._last_prune >= self.retention:
+            self._last_prune = now
+            connection.execute("DELETE FROM invalidation WHERE created < ?", (now - self.retention,))
+
+    def listen(self, callback):
+        """
+        Start the thread passing the keys published from now on to `callback`.
+
+        Args:
+            callback (callable): Called with each invalidated key.
+        """
+        # Read where the channel stands before returning, so nothing published after it is missed.
+        (last,) = self._connect().execute("SELECT COALESCE(MAX(seq), 0) FROM invalidation").fetchone()
+        threading.Thread(
+            target=self._poll, args=(callback, last), name=f"cache-invalidation-{self.channel}", daemon=True
+        ).start()
+
+    def _poll(self, callback, last: int):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                rows = self._connect().execute(
+                    "SELECT seq, key FROM invalidation WHERE seq > ? AND channel = ? ORDER BY seq",
+                    (last, self.channel),
+                ).fetchall()
+            except sqlite3.Error as error:
+                logger.warning("Cache invalidations of %s not read: %s", self.channel, error)
+                continue
+            for last, key in rows:
+                callback(key)
+
+
+class PostgresInvalidationChannel:
+    """
+    Invalidations shared by every process connected to the database, with `LISTEN/NOTIFY`.
+
+    Each process keeps one connection out of its pool listening on the channel. When
+    that connection is lost, the whole cache is invalidated once it is back, as the
+    notifications sent meanwhile are lost.
+    """
+
+    name = "postgresql"
+
+    def __init__(self, channel: str, app, reconnect_delay: float = 1.0):
+        self.channel = channel
+        self.app = app
+        self.reconnect_delay = reconnect_delay
+        self._engine = None
+
+    def _get_engine(self):
+        # Pushing an app context here would remove the session of the request on teardown.
+        if self._engine is None:
+            self._engine = db.get_engine(self.app)
+        return self._engine
+
+    def publish(self, keys: list):
+        """
+        Send invalidated keys to every process.
+
+        Args:
+            keys (list): The keys.
+        """
+        with self._get_engine().begin() as connection:
+            for start in range(0, len(keys), _NOTIFY_KEYS):
+                connection.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": self.channel, "payload": ",".join(keys[start:start + _NOTIFY_KEYS])},
+                )
+
+    def listen(self, callback):
+        """
+        Start the thread passing the notified keys to `callback`.
+
+        Args:
+            callback (callable): Called with each invalidated key.
+        """
+        threading.Thread(
+            target=self._listen, args=(callback,), name=f"cache-invalidation-{self.channel}", daemon=True
+        ).start()
+
+    def _listen(self, callback):
+        while True:
+            connection = None
+            try:
+                connection = self._get_engine().raw_connection()
+                connection.detach()
+                listener = connection.dbapi_connection
+                listener.autocommit = True
+                listener.cursor().execute(f'LISTEN "{self.channel}"')
+                # Anything may have changed before the connection listened.
+                callback(ALL_KEYS)
+                while True:
+                    if select.select([listener], [], [], 5.0)[0]:
+                        listener.poll()
+                        while listener.notifies:
+                            for key in listener.notifies.pop(0).payload.split(","):
+                                callback(key)
+            except Exception as error:
+                logger.warning("Cache invalidations of %s not received, reconnecting: %s", self.channel, error)
+                if connection is not None:
+                    connection.invalidate()
+                time.sleep(self.reconnect_delay)
+
+
+class SharedCache:
+    """
+    Per-process cache of serialized objects, invalidated in every process of a deployment.
+
+    Each worker keeps its own `LRUCache`. `invalidate` drops the keys locally and
+    publishes them on a channel listened to by every worker: PostgreSQL `LISTEN/NOTIFY`
+    when the database is PostgreSQL, a SQLite file shared by the workers of the host
+    otherwise. A worker may serve an entry changed by another one until it receives
+    the invalidation, and never longer than the TTL.
+    """
+
+    def __init__(self, name: str, config_prefix: str):
+        self.name = name
+        self.config_prefix = config_prefix
+        self.cache = LRUCache(maxsize=0)
+        self.channel = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Configure the cache from the `<config_prefix>_*` settings of the application.
+
+        Args:
+            app (Flask): The application.
+        """
+        config = {key.removeprefix(f"{self.config_prefix}_"): value for key, value in app.config.items()
+                  if key.startswith(f"{self.config_prefix}_")}
+        self.cache = LRUCache(maxsize=config.get("SIZE", 10000), ttl=config.get("TTL", 30.0))
+        channel = config.get("CHANNEL") or (
+            "postgresql" if app.config["SQLALCHEMY_DATABASE_URI"].startswith("postgresql") else "sqlite"
+        )
+        if channel == "postgresql":
+            self.channel = PostgresInvalidationChannel(f"{self.name}_cache", app)
+        else:
+            self.channel = SQLiteInvalidationChannel(
+                self.name,
+                config.get("STATE_FILE") or os.path.join(tempfile.gettempdir(), "api-cache-invalidation.db"),
+                poll_interval=config.get("POLL_INTERVAL", 0.1),
+            )
+        self._pid = None
+
+    def _start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Entries and threads inherited through a fork are not kept.
+            self.cache.clear()
+            if self.cache.maxsize > 0:
+                self.channel.listen(self.cache.invalidate)
+            self._pid = os.getpid()
+
+    def get_or_load(self, key: str, loader):
+        """
+        Get a cached value, loading and caching it on a miss.
+
+        Args:
+            key (str): The cache key.
+            loader (callable): Returns the value; the exceptions it raises are not cached.
+
+        Returns:
+            The value.
+        """
+        self._start()
+        if (value := self.cache.get(key, _MISSING)) is not _MISSING:
+            return value
+        generation = self.cache.generation
+        value = loader()
+        self.cache.set(key, value, generation)
+        return value
+
+    async def get_or_load_async(self, key: str, loader):
+        """
+        Get a cached value, awaiting `loader()` and caching its result on a miss.
+
+        Args:
+            key (str): The cache key.
+            loader (callable): Returns an awaitable of the value; the exceptions it raises are not cached.
+
+        Returns:
+            The value.
+        """
+        self._start()
+        if (value := self.cache.get(key, _MISSING)) is not _MISSING:
+            return value
+        generation = self.cache.generation
+        value = await loader()
+        self.cache.set(key, value, generation)
+        return value
+
+    def get_many(self, keys) -> tuple[dict, int]:
+        """
+        Get the cached values of many keys.
+
+        Args:
+            keys: The cache keys.
+
+        Returns:
+            tuple[dict, int]: The cached values by key, and the generation to pass to
+            `set_many` with the values loaded for the other keys.
+        """
+        self._start()
+        generation = self.cache.generation
+        values = {}
+        for key in keys:
+            if (value := self.cache.get(key, _MISSING)) is not _MISSING:
+                values[key] = value
+        return values, generation
+
+    def set_many(self, values: dict, generation: int):
+        """
+        Cache values loaded after `get_many`.
+
+        Args:
+            values (dict): The values by key.
+            generation (int): The generation returned by `get_many`; nothing is cached
+                if anything was invalidated since.
+        """
+        for key, value in values.items():
+            self.cache.set(key, value, generation)
+
+    def invalidate(self, *keys: str):
+        """
+        Drop keys from the cache of every worker, once their change is committed.
+
+        Args:
+            *keys (str): The changed keys, or `ALL_KEYS`.
+        """
+        if not keys or self.cache.maxsize <= 0:
+            return
+        self._start()
+        for key in keys:
+            self.cache.invalidate(key)
+        try:
+            self.channel.publish(list(keys))
+        except Exception as error:
+            logger.error("Cache invalidation of %d %s keys not published: %s", len(keys), self.name, error)
+
+    def invalidate_all(self):
+        """Drop every entry from the cache of every worker."""
+        self.invalidate(ALL_KEYS)
+
+    def stats(self) -> dict:
+        """
+        Get the size and counters of the cache of this worker.
+
+        Returns:
+            dict: The `LRUCache` statistics and the invalidation channel.
+        """
+        return {**self.cache.stats(), "channel": self.channel.name if self.channel else None}
+
+
+user_cache = SharedCache("users", "USER_CACHE")
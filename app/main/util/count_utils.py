@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from .. import db
+
+from flask import current_app
+from sqlalchemy.sql import text
+
+COUNT_MODES = ("exact", "estimate", "none")
+
+
+class CountCache:
+    """
+    Bounded in-process cache of exact row counts with a time to live.
+
+    Attributes:
+        max_size (int): Maximum number of cached counts.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, ttl: float):
+        """
+        Get a cached count if it is younger than `ttl` seconds.
+
+        Args:
+            key (tuple): The cache key.
+            ttl (float): The time to live in seconds.
+
+        Returns:
+            int: The cached count, or None when missing or expired.
+        """
+        with self._lock:
+            if entry := self._entries.get(key):
+                stored_at, total = entry
+                if time.monotonic() - stored_at < ttl:
+                    self._entries.move_to_end(key)
+                    return total
+                del self._entries[key]
+        return None
+
+    def set(self, key: tuple, total: int):
+        """
+        Store a count, evicting the least recently used entry when full.
+
+        Args:
+            key (tuple): The cache key.
+            total (int): The count to store.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached count."""
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = CountCache()
+
+
+def get_count_key(tables: list, filter: list) -> tuple:
+    """
+    Build the cache key for a count, independent of the order the filters were given in.
+
+    Args:
+        tables (list): The paginated table followed by the joined tables.
+        filter (list): The filters applied to the query.
+
+    Returns:
+        tuple: The cache key.
+    """
+    clauses = sorted(
+        str(clause.compile(compile_kwargs={"literal_binds": True})) for clause in filter
+    )
+    return tuple(table.__tablename__ for table in tables), tuple(clauses)
+
+
+def get_exact_count(query, tables: list, filter: list) -> int:
+    """
+    Count the rows of a query, reusing a recent result for the same table and filters.
+
+    Args:
+        query: The filtered query.
+        tables (list): The paginated table followed by the joined tables.
+        filter (list): The filters applied to the query.
+
+    Returns:
+        int: The number of rows.
+    """
+    ttl = current_app.config.get("PAGINATION_COUNT_CACHE_TTL", 0)
+    if ttl <= 0:
+        return query.order_by(None).count()
+
+    key = get_count_key(tables, filter)
+    if (total := count_cache.get(key, ttl)) is None:
+        total = query.order_by(None).count()
+        count_cache.set(key, total)
+    return total
+
+
+def get_estimated_count(query, tables: list, filter: list) -> int:
+    """
+    Estimate the rows of a query from the PostgreSQL planner statistics.
+
+    Other dialects have no cheap estimate, so they fall back to the cached exact count.
+
+    Args:
+        query: The filtered query.
+        tables (list): The paginated table followed by the joined tables.
+        filter (list): The filters applied to the query.
+
+    Returns:
+        int: The estimated number of rows.
+    """
+    dialect = db.session.get_bind().dialect
+    if dialect.name != "postgresql":
+        return get_exact_count(query, tables, filter)
+
+    statement = query.order_by(None).statement.compile(
+        dialect=dialect,
+        compile_kwargs={"literal_binds": True},
+    )
+    plan = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {statement}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def get_total(query, tables: list, filter: list, mode: str):
+    """
+    Get the total rows of a query according to the requested count mode.
+
+    Args:
+        query: The filtered query.
+        tables (list): The paginated table followed by the joined tables.
+        filter (list): The filters applied to the query.
+        mode (str): One of `exact`, `estimate` or `none`.
+
+    Returns:
+        int: The total, or None when counting was skipped.
+    """
+    if mode == "exact":
+        return get_exact_count(query, tables, filter)
+    if mode == "estimate":
+        return get_estimated_count(query, tables, filter)
+    return None
@@ -0,0 +1,157 @@
+import atexit
+import logging
+import threading
+import time
+
+from .. import db
+from ..model import Error
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorCatalog:
+    """
+    In-process, read-only view of the API error codes.
+
+    The catalog is built from `API_ERROR_CODES` and the `error` table when a worker
+    starts, or on first use otherwise, so error responses are then serialized without
+    any database I/O. Codes raised at runtime that
+    are not in the catalog are kept in memory and written to the database in batches
+    by a background thread.
+
+    Attributes:
+        flush_interval (float): Seconds between two batched writes of new codes.
+    """
+
+    def __init__(self, flush_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        self._entries = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self._app = None
+        self._loaded = False
+        self._exit_flush_registered = False
+
+    def init_app(self, app):
+        """
+        Remember the application for the first load and the background flushes.
+
+        Nothing is read from the database here, so the application can be created
+        before its tables exist.
+
+        Args:
+            app (Flask): The application whose database holds the `error` table.
+        """
+        self._app = app
+        self._loaded = False
+        self.flush_interval = app.config.get("ERROR_CATALOG_FLUSH_INTERVAL", self.flush_interval)
+        if not self._exit_flush_registered:
+            atexit.register(self.flush)
+            self._exit_flush_registered = True
+
+    def load(self):
+        """
+        Rebuild the catalog from `API_ERROR_CODES` and the `error` table.
+
+        The database is optional: when it can't be read the static codes are used alone.
+        No application context is needed, so it can run in the middle of a request.
+        """
+        from .api_error import API_ERROR_CODES
+
+        entries = {
+            api_code: dict(api_code=api_code, **api_error)
+            for api_code, api_error in API_ERROR_CODES.items()
+        }
+        # A connection of its own, outside the session of the request being served.
+        engine = db.get_engine(self._app) if self._app is not None else db.engine
+        try:
+            with engine.connect() as connection:
+                for error in connection.execute(select(Error.api_code, Error.code, Error.name, Error.description)):
+                    entries[error.api_code] = dict(error._mapping)
+        except SQLAlchemyError as error:
+            logger.warning("Error catalog built without the error table: %s", error.__class__.__name__)
+
+        with self._lock:
+            self._entries = entries
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded and self._app is not None:
+            self.load()
+
+    def get(self, api_code: str) -> dict:
+        """
+        Get the catalog entry of an API error code.
+
+        Args:
+            api_code (str): The API error code.
+
+        Returns:
+            dict: The entry, or None when the code is unknown.
+        """
+        self._ensure_loaded()
+        return self._entries.get(api_code)
+
+    def register(self, api_code: str, code: int, name: str, description: str) -> dict:
+        """
+        Add an unknown API error code to the catalog and queue it for the database.
+
+        Args:
+            api_code (str): The API error code.
+            code (int): The HTTP status code.
+            name (str): The HTTP status name.
+            description (str): The error description.
+
+        Returns:
+            dict: The catalog entry.
+        """
+        self._ensure_loaded()
+        entry = dict(api_code=api_code, code=code, name=name, description=description)
+        with self._lock:
+            if existing := self._entries.get(api_code):
+                return existing
+            self._entries = {**self._entries, api_code: entry}
+            self._pending[api_code] = entry
+            self._start_worker()
+        return entry
+
+    def flush(self):
+        """Write the queued error codes to the database in a single transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self._app is None:
+            return
+
+        with self._app.app_context():
+            try:
+                existing = {
+                    api_code for api_code, in db.session.query(Error.api_code).filter(Error.api_code.in_(pending))
+                }
+                db.session.add_all(Error(**entry) for api_code, entry in pending.items() if api_code not in existing)
+                db.session.commit()
+            except SQLAlchemyError:
+                logger.exception("Unable to register %d error codes", len(pending))
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+    def _start_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="error-catalog", daemon=True)
+            self._worker.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.flush()
+            time.sleep(self.flush_interval)
+
+
+error_catalog = ErrorCatalog()
@@ -0,0 +1,132 @@
+import hashlib
+
+from .serialization_utils import serialize
+
+from flask import Response, current_app, request
+from werkzeug.http import quote_etag
+
+ERROR_ETAG_KEYS = ("api_code", "code", "name", "description")
+
+
+def get_fields_mask() -> str:
+    """
+    Get the fields mask requested with the `X-Fields` header, as `marshal_with` does.
+
+    Returns:
+        str: The mask, or None when the whole model is requested.
+    """
+    return request.headers.get(current_app.config.get("RESTX_MASK_HEADER", "X-Fields"))
+
+
+def make_etag(*parts) -> str:
+    """
+    Build an entity tag from the values that identify a representation.
+
+    Args:
+        *parts: The values the representation depends on.
+
+    Returns:
+        str: The unquoted entity tag.
+    """
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def get_version_etag(version: int, mask: str = None) -> str:
+    """
+    Build the entity tag of a versioned resource, from which `If-Match` can read the version back.
+
+    Args:
+        version (int): The version of the resource.
+        mask (str, optional): The fields mask of the representation. Defaults to None.
+
+    Returns:
+        str: The unquoted entity tag, `v<version>` followed by a digest of the mask.
+    """
+    etag = f"v{version}"
+    return f"{etag}-{hashlib.sha1(mask.encode()).hexdigest()[:12]}" if mask else etag
+
+
+def get_if_match_versions() -> list:
+    """
+    Get the versions accepted by the `If-Match` header of the request.
+
+    Weak entity tags never match, as `If-Match` uses the strong comparison.
+
+    Returns:
+        list: The versions, or None when the header is missing or is `*`.
+    """
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    versions = []
+    for etag in if_match.as_set():
+        version = etag.removeprefix("v").split("-")[0]
+        if etag.startswith("v") and version.isdigit():
+            versions.append(int(version))
+    return versions
+
+
+def get_page_etag(page, *item_keys) -> str:
+    """
+    Build the entity tag of a page of results without serializing it.
+
+    Args:
+        page: The `OffsetPagination` or `CursorPage` of results.
+        *item_keys: The attributes that identify a version of each item.
+
+    Returns:
+        str: The unquoted entity tag.
+    """
+    return make_etag(
+        get_fields_mask(),
+        page.total,
+        page.pages,
+        page.per_page,
+        getattr(page, "page", None),
+        page.has_next,
+        getattr(page, "next_cursor", None),
+        [tuple(getattr(item, key) for key in item_keys) for item in page.items],
+    )
+
+
+def get_lookup_etag(users: dict) -> str:
+    """
+    Build the entity tag of a lookup of users by id without serializing it.
+
+    Args:
+        users (dict): The `items` and `missing` ids returned by `lookup_users`.
+
+    Returns:
+        str: The unquoted entity tag.
+    """
+    return make_etag(
+        get_fields_mask(),
+        [(user["id"], user["version"]) for user in users["items"]],
+        users["missing"],
+    )
+
+
+def conditional_response(etag: str, data, model, code: int = 200, weak: bool = False):
+    """
+    Answer a GET with `304 Not Modified` when the client already has the representation.
+
+    The entity tag must be computed before calling this function, so a matching
+    `If-None-Match` skips the serialization entirely.
+
+    Args:
+        etag (str): The unquoted entity tag of the current representation.
+        data: The object to serialize, or a callable returning it.
+        model: The flask_restx model used to serialize `data`.
+        code (int, optional): The status code of a full response. Defaults to 200.
+        weak (bool, optional): Whether the entity tag is weak. Defaults to False.
+
+    Returns:
+        Response | tuple: The 304 response, or the serialized data, status and headers.
+    """
+    headers = {"ETag": quote_etag(etag, weak)}
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+
+    if callable(data):
+        data = data()
+    return serialize(data, model, mask=get_fields_mask()), code, headers
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+
+from .api_error import APIError
+
+from flask import Response, stream_with_context
+
+EXPORT_MIMETYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _encode_ndjson(columns: list, rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _encode_csv(columns: list, rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def stream_query(query, columns: list, format: str, filename: str, batch_size: int = 1000) -> Response:
+    """
+    Stream the rows of a query as NDJSON or CSV.
+
+    Rows are fetched from a server-side cursor `batch_size` at a time and encoded per
+    batch, so memory use doesn't depend on the number of rows.
+
+    Args:
+        query: The query to export; it must select exactly `columns`.
+        columns (list): The names of the exported columns.
+        format (str): Either `ndjson` or `csv`.
+        filename (str): The download name, without extension.
+        batch_size (int, optional): Rows fetched and encoded at a time. Defaults to 1000.
+
+    Returns:
+        Response: The streamed response.
+
+    Raises:
+        APIError: If the format is not supported.
+    """
+    if format not in EXPORT_MIMETYPES:
+        raise APIError(
+            "Invalid export format",
+            code=400,
+            api_code="INVALID_EXPORT_FORMAT",
+            info=f"Format must be one of {', '.join(EXPORT_MIMETYPES)}",
+        )
+    encode = _encode_csv if format == "csv" else _encode_ndjson
+
+    def generate():
+        if format == "csv":
+            yield _encode_csv(columns, [columns])
+        batch = []
+        for row in query.yield_per(batch_size):
+            batch.append(tuple(row))
+            if len(batch) == batch_size:
+                yield encode(columns, batch)
+                batch.clear()
+        if batch:
+            yield encode(columns, batch)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_MIMETYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}.{format}"},
+    )
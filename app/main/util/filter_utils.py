@@ -0,0 +1,74 @@
+from flask import request
+from flask_restx.reqparse import RequestParser
+from sqlalchemy import or_
+from werkzeug.exceptions import BadRequest
+
+from .api_error import APIError
+from .search_utils import escape_like
+
+
+def contains(*columns):
+    """
+    Build a case-insensitive substring filter on one or more columns.
+
+    The value is escaped and bound as a parameter, so every value shares the same
+    statement; the dialect picks the case-insensitive operator (`ILIKE` on PostgreSQL).
+
+    Args:
+        *columns: The columns searched; a row matches when any of them contains the value.
+
+    Returns:
+        callable: The function building the clause from a value.
+    """
+    def build(value):
+        pattern = f"%{escape_like(str(value))}%"
+        return or_(*(column.ilike(pattern, escape="\\") for column in columns))
+
+    return build
+
+
+def equals(column, type=None):
+    """
+    Build an equality filter, which the indexes of the column can serve.
+
+    Args:
+        column: The column compared.
+        type (callable, optional): Converts the parsed value to the column type. Defaults to None.
+
+    Returns:
+        callable: The function building the clause from a value.
+    """
+    def build(value):
+        return column == (type(value) if type else value)
+
+    return build
+
+
+def compile_filters(parser: RequestParser, filters: dict) -> list:
+    """
+    Build the filter clauses of the request query arguments.
+
+    The arguments are parsed and validated by the DTO parser that documents them, then
+    each one with a value is turned into a bound-parameter clause, so queries with the
+    same arguments reuse the same compiled statement whatever the values.
+
+    Args:
+        parser (RequestParser): The DTO parser of the filter arguments.
+        filters (dict): The clause builder (`contains`, `equals`) of each argument.
+
+    Returns:
+        list: The filter clauses.
+
+    Raises:
+        APIError: If an argument is invalid for the parser.
+    """
+    try:
+        args = parser.parse_args(req=request)
+    except BadRequest as error:
+        raise APIError(
+            "Invalid Data.",
+            code=400,
+            api_code="INVALID_DATA",
+            info=(getattr(error, "data", None) or {}).get("errors"),
+        )
+    return [build(args[name]) for name, build in filters.items() if args.get(name) not in (None, "")]
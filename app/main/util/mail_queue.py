@@ -0,0 +1,195 @@
+import atexit
+import logging
+import queue
+import smtplib
+import threading
+import time
+
+from flask_mail import Message
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MailQueue:
+    """
+    Background delivery of outbound email.
+
+    `send` only puts the message in a bounded in-process queue, so the request never
+    waits on SMTP. A pool of worker threads takes the messages in batches and sends
+    them over one persistent SMTP connection per worker, which is closed after being
+    idle for `idle_timeout` seconds. A failed message is retried with exponential
+    backoff on a new connection, and dropped after `max_retries` attempts.
+
+    Attributes:
+        workers (int): Number of worker threads.
+        batch_size (int): Messages a worker sends before waiting on the queue again.
+        max_retries (int): Delivery attempts of a message after the first one.
+        retry_backoff (float): Seconds before the first retry, doubled on each new attempt.
+        idle_timeout (float): Seconds a connection stays open without messages.
+        sent (int): Messages delivered by this process.
+        failed (int): Messages dropped after exhausting their retries.
+        rejected (int): Messages refused because the queue was full.
+    """
+
+    def __init__(self, mail, maxsize: int = 1000, workers: int = 2, batch_size: int = 50,
+                 max_retries: int = 3, retry_backoff: float = 1.0, idle_timeout: float = 30.0):
+        self.mail = mail
+        self.maxsize = maxsize
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        self.sent = self.failed = self.rejected = 0
+        self._queue = queue.Queue(maxsize)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._app = None
+
+    def init_app(self, app):
+        """
+        Configure the queue from the `MAIL_QUEUE_*` settings of the application.
+
+        Args:
+            app (Flask): The application whose Flask-Mail settings are used to send.
+        """
+        self._app = app
+        self.maxsize = app.config.get("MAIL_QUEUE_SIZE", self.maxsize)
+        self.workers = app.config.get("MAIL_QUEUE_WORKERS", self.workers)
+        self.batch_size = app.config.get("MAIL_QUEUE_BATCH_SIZE", self.batch_size)
+        self.max_retries = app.config.get("MAIL_QUEUE_MAX_RETRIES", self.max_retries)
+        self.retry_backoff = app.config.get("MAIL_QUEUE_RETRY_BACKOFF", self.retry_backoff)
+        self.idle_timeout = app.config.get("MAIL_QUEUE_IDLE_TIMEOUT", self.idle_timeout)
+        self._queue = queue.Queue(self.maxsize)
+        atexit.register(self.stop)
+
+    def send(self, message: Message) -> bool:
+        """
+        Queue a message for delivery without waiting for it to be sent.
+
+        The message must be built in the request or application context, as
+        `Message` reads the default sender from the application.
+
+        Args:
+            message (Message): The message to send.
+
+        Returns:
+            bool: Whether the message was queued; False when the queue is full.
+
+        Raises:
+            ValueError: If the message has no recipient or no sender.
+        """
+        if not message.send_to:
+            raise ValueError("The message has no recipients")
+        if not message.sender:
+            raise ValueError("The message has no sender, and MAIL_DEFAULT_SENDER is not set")
+
+        self._start_workers()
+        try:
+            self._queue.put_nowait((message, 0))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            logger.warning("Mail queue full, message to %s not sent", ", ".join(message.send_to))
+            return False
+        return True
+
+    def join(self):
+        """Block until every queued message was sent or dropped."""
+        self._queue.join()
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Deliver the queued messages and stop the workers.
+
+        Args:
+            timeout (float, optional): Seconds to wait for each worker. Defaults to 10.
+        """
+        with self._lock:
+            threads, self._threads = [thread for thread in self._threads if thread.is_alive()], []
+        for _ in threads:
+            self._queue.put((_STOP, 0))
+        for thread in threads:
+            thread.join(timeout)
+
+    def _start_workers(self):
+        with self._lock:
+            # Threads don't survive a fork: workers are started in the process that sends.
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for index in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f"mail-queue-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        with self._app.app_context():
+            connection = None
+            try:
+                while True:
+                    batch = self._next_batch(block_timeout=self.idle_timeout if connection else None)
+                    if not batch:
+                        connection = self._close(connection)
+                        continue
+                    stop = any(message is _STOP for message, _ in batch)
+                    for message, attempt in batch:
+                        try:
+                            if message is not _STOP:
+                                connection = self._deliver(connection, message, attempt)
+                        finally:
+                            self._queue.task_done()
+                    if stop:
+                        return
+            finally:
+                self._close(connection)
+
+    def _next_batch(self, block_timeout: float = None) -> list:
+        try:
+            batch = [self._queue.get(timeout=block_timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size and batch[-1][0] is not _STOP:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, connection, message: Message, attempt: int):
+        while True:
+            try:
+                connection = connection or self.mail.connect().__enter__()
+                connection.send(message)
+                with self._lock:
+                    self.sent += 1
+                return connection
+            except (smtplib.SMTPException, OSError) as error:
+                connection = self._close(connection)
+                if attempt >= self.max_retries:
+                    with self._lock:
+                        self.failed += 1
+                    logger.error(
+                        "Mail to %s dropped after %d attempts: %s", ", ".join(message.send_to), attempt + 1, error
+                    )
+                    return connection
+                delay = self.retry_backoff * 2 ** attempt
+                logger.warning("Mail to %s failed, retrying in %.1fs: %s", ", ".join(message.send_to), delay, error)
+                time.sleep(delay)
+                attempt += 1
+            except Exception:
+                # A message Flask-Mail refuses to send is dropped, without stopping the worker.
+                connection = self._close(connection)
+                with self._lock:
+                    self.failed += 1
+                logger.exception("Mail to %s dropped", ", ".join(message.send_to))
+                return connection
+
+    @staticmethod
+    def _close(connection):
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+        return None
@@ -0,0 +1,64 @@
+import threading
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """
+    Thread-safe histogram of durations in seconds, with cumulative buckets.
+
+    Attributes:
+        buckets (tuple): The upper bounds of the buckets, in seconds.
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """
+        Record a duration.
+
+        Args:
+            value (float): The duration in seconds.
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def to_dict(self) -> dict:
+        """
+        Get the histogram as cumulative bucket counts, sum and count.
+
+        Returns:
+            dict: The `buckets` keyed by upper bound (`+Inf` last), the `sum` and the `count`.
+        """
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+
+        buckets, cumulative = {}, 0
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"buckets": buckets, "sum": total, "count": cumulative}
+
+
+def merge_histograms(first: dict, second: dict) -> dict:
+    """
+    Add two histograms given as `Histogram.to_dict` output.
+
+    Args:
+        first (dict): A histogram.
+        second (dict): A histogram with the same buckets.
+
+    Returns:
+        dict: The summed histogram.
+    """
+    buckets = dict(first["buckets"])
+    for bound, count in second["buckets"].items():
+        buckets[bound] = buckets.get(bound, 0) + count
+    return {"buckets": buckets, "sum": first["sum"] + second["sum"], "count": first["count"] + second["count"]}
@@ -1,8 +1,77 @@
+import base64
+import binascii
+import json
+import math
+
 from .. import db
+from ..dto.error_dto import ErrorsDTO
+from ..dto.user_dto import UserDTO
+from ..model import Error, User
 from .api_error import APIError
+from .count_utils import COUNT_MODES, get_total
+from .filter_utils import compile_filters, contains, equals
+from .search_utils import get_user_search
+
+from flask import request
+from flask_sqlalchemy import Pagination
+from sqlalchemy import and_, inspect, literal, or_, tuple_
+
+ERROR_FILTERS = {
+    "code": equals(Error.code, int),
+    "api_code": contains(Error.api_code),
+    "description": contains(Error.description),
+}
+
+USER_FILTERS = {
+    "name": contains(User.name),
+    "cpf": equals(User.cpf),
+    "age": contains(User.age),
+}
+
+USER_SEARCH_FILTER = contains(User.name, User.age)
+
+
+class OffsetPagination(Pagination):
+    """
+    Offset pagination whose next page is detected by fetching one extra row,
+    so it stays navigable when the total is estimated or not counted at all.
+    """
+
+    def __init__(self, query, page: int, per_page: int, total, items: list, has_next: bool):
+        super().__init__(query, page, per_page, total, items)
+        self._has_next = has_next
+
+    @property
+    def pages(self):
+        if self.total is None:
+            return None
+        return max(self.page if self.items else 0, math.ceil(self.total / self.per_page))
+
+    @property
+    def has_next(self) -> bool:
+        return self._has_next
+
+
+class CursorPage:
+    """
+    A page of results fetched with keyset (cursor) pagination.
+
+    Attributes:
+        items (list): The rows of the page.
+        per_page (int): The number of rows requested per page.
+        limit (int): The maximum number of rows allowed per page.
+        next_cursor (str): Opaque token to fetch the next page, or None on the last page.
+        total (int): The total rows, or None when counting was skipped.
+    """
 
-from flask import request, current_app
-from sqlalchemy.sql import text
+    def __init__(self, items: list, per_page: int, limit: int, next_cursor: str = None, total: int = None):
+        self.items = items
+        self.per_page = per_page
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+        self.total = total
+        self.pages = None if total is None else math.ceil(total / per_page)
 
 
 def get_paginate_parameters() -> dict[str, int]:
@@ -19,16 +88,40 @@ def get_paginate_parameters() -> dict[str, int]:
     }
 
 
-def get_ordering_parameters(ordenable_columns: list, tables: list) -> list:
+def get_count_mode(default: str) -> str:
     """
-    Get the ordering parameters from the request arguments.
+    Get how the total of a paginated response must be computed from the request arguments.
+
+    Args:
+        default (str): The mode used when the request doesn't choose one.
+
+    Returns:
+        str: One of `exact`, `estimate` or `none`.
+
+    Raises:
+        APIError: If an unknown count mode is requested.
+    """
+    mode = request.args.get("count", default)
+    if mode not in COUNT_MODES:
+        raise APIError(
+            "Invalid count mode",
+            code=400,
+            api_code="INVALID_COUNT_MODE",
+            info=f"Count must be one of {', '.join(COUNT_MODES)}",
+        )
+    return mode
+
+
+def get_sort_data(ordenable_columns: list, tables: list) -> dict:
+    """
+    Get the requested sort columns and their directions from the request arguments.
 
     Args:
         ordenable_columns (list): The columns that can be ordered.
         tables (list): The tables to consider when ordering.
 
     Returns:
-        list: The ordering parameters.
+        dict: The sort columns mapped to 'asc' or 'desc', in request order.
 
     Raises:
         APIError: If an invalid column is provided for ordering.
@@ -48,37 +141,205 @@ def get_ordering_parameters(ordenable_columns: list, tables: list) -> list:
                     api_code="INVALID_ORDERING_COLUMN",
                     info=f"Unable to order by '{col_name}'",
                 )
+    return sort_data
+
+
+def get_ordering_parameters(ordenable_columns: list, tables: list) -> list:
+    """
+    Get the ordering parameters from the request arguments.
+
+    Args:
+        ordenable_columns (list): The columns that can be ordered.
+        tables (list): The tables to consider when ordering.
+
+    Returns:
+        list: The ordering parameters.
+
+    Raises:
+        APIError: If an invalid column is provided for ordering.
+    """
+    sort_data = get_sort_data(ordenable_columns, tables)
     return [getattr(column, order)() for column, order in sort_data.items()]
 
 
-def paginate(table, *joinable_tables, filter: list, ordenable_columns: list = []):
+def encode_cursor(sort: str, values: list) -> str:
+    """
+    Encode the last sort key of a page into an opaque cursor token.
+
+    Args:
+        sort (str): The raw `sort` argument the page was ordered by.
+        values (list): The sort key values of the last row, primary key last.
+
+    Returns:
+        str: The URL-safe cursor token.
+    """
+    payload = json.dumps({"s": sort, "k": [str(value) for value in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, keys: list) -> list:
+    """
+    Decode a cursor token back into typed sort key values.
+
+    Args:
+        cursor (str): The cursor token sent by the client.
+        sort (str): The raw `sort` argument of the current request.
+        keys (list): The (column, order) pairs the query is ordered by.
+
+    Returns:
+        list: The sort key values, converted to the columns' Python types.
+
+    Raises:
+        APIError: If the cursor is malformed or was issued for a different ordering.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload["k"]
+        if payload["s"] != sort or len(values) != len(keys):
+            raise ValueError("cursor does not match the requested ordering")
+        return [column.type.python_type(value) for (column, _), value in zip(keys, values)]
+    except (binascii.Error, KeyError, TypeError, ValueError) as error:
+        raise APIError(
+            "Invalid pagination cursor",
+            code=400,
+            api_code="INVALID_CURSOR",
+            info=str(error),
+        )
+
+
+def get_keyset_filter(keys: list, values: list):
+    """
+    Build the predicate selecting the rows that come after a cursor.
+
+    When every key is sorted in the same direction a row-value comparison is used,
+    so the database can answer the page with a single index range scan.
+
+    Args:
+        keys (list): The (column, order) pairs the query is ordered by.
+        values (list): The sort key values of the last row of the previous page.
+
+    Returns:
+        The SQLAlchemy boolean clause.
+    """
+    orders = {order for _, order in keys}
+    if len(orders) == 1:
+        columns = tuple_(*[column for column, _ in keys])
+        bound = tuple_(*[literal(value, column.type) for (column, _), value in zip(keys, values)])
+        return columns > bound if orders == {"asc"} else columns < bound
+
+    clauses = []
+    for index, (column, order) in enumerate(keys):
+        previous_equal = [key == value for (key, _), value in zip(keys[:index], values[:index])]
+        after = column > values[index] if order == "asc" else column < values[index]
+        clauses.append(and_(*previous_equal, after))
+    return or_(*clauses)
+
+
+def paginate_by_cursor(query, table, ordenable_columns: list, joinable_tables: tuple, filter: list) -> CursorPage:
+    """
+    Paginate a query with keyset pagination instead of LIMIT/OFFSET.
+
+    The primary key of `table` is appended to the requested ordering as a tie-breaker,
+    so each page is fetched with one range scan. No COUNT(*) is issued unless the
+    request asks for one with the `count` argument.
+
+    Args:
+        query: The filtered query to paginate.
+        table: The main table being paginated.
+        ordenable_columns (list): The columns that can be ordered.
+        joinable_tables (tuple): The additional tables joined in the query.
+        filter (list): The filters applied to the query.
+
+    Returns:
+        CursorPage: The requested page.
+
+    Raises:
+        APIError: If the cursor is invalid or a sort column is not on the main table.
+    """
+    paginate_kwargs = get_paginate_parameters()
+    per_page = max(1, min(paginate_kwargs["per_page"], paginate_kwargs["max_per_page"]))
+    count_mode = get_count_mode("none")
+    sort = request.args.get("sort", "")
+    cursor = request.args.get("cursor", "")
+
+    keys = list(get_sort_data(ordenable_columns, [table] + list(joinable_tables)).items())
+    for column, _ in keys:
+        if column.class_ is not table:
+            raise APIError(
+                "Invalid column to order",
+                code=400,
+                api_code="INVALID_ORDERING_COLUMN",
+                info=f"Cursor pagination can't order by '{column.key}'",
+            )
+    primary_keys = [getattr(table, key.key) for key in inspect(table).primary_key]
+    sort_keys = {column.key for column, _ in keys}
+    keys += [(column, "asc") for column in primary_keys if column.key not in sort_keys]
+
+    total = get_total(query, [table] + list(joinable_tables), filter, count_mode)
+    if cursor:
+        query = query.filter(get_keyset_filter(keys, decode_cursor(cursor, sort, keys)))
+
+    rows = query.order_by(*[getattr(column, order)() for column, order in keys]).limit(per_page + 1).all()
+    items = rows[:per_page]
+    if not items:
+        raise APIError("No page generated", code=404, api_code="PAGES_NOT_FOUND")
+
+    next_cursor = None
+    if len(rows) > per_page:
+        next_cursor = encode_cursor(sort, [getattr(items[-1], column.key) for column, _ in keys])
+    return CursorPage(items, per_page, paginate_kwargs["max_per_page"], next_cursor, total)
+
+
+def paginate(table, *joinable_tables, filter: list, ordenable_columns: list = [], default_ordering: list = [],
+             columns: list = None):
     """
     Paginate the results based on the provided parameters.
 
+    When the request carries a `cursor` argument (empty for the first page), keyset
+    pagination is used instead of LIMIT/OFFSET. The `count` argument chooses whether
+    the total is exact (cached for a short time), estimated or skipped.
+
     Args:
         table: The main table to paginate.
         joinable_tables: The additional tables to join.
         filter (list): The filters to apply.
         ordenable_columns (list, optional): The columns that can be ordered. Defaults to [].
+        default_ordering (list, optional): The ordering used when the request has no `sort`,
+            such as a search ranking. Ignored by cursor pagination. Defaults to [].
+        columns (list, optional): Select only these columns, so the items are plain rows
+            instead of `table` objects. Defaults to None.
 
     Returns:
-        Pagination: The paginated results.
+        OffsetPagination | CursorPage: The paginated results.
 
     Raises:
         APIError: If no page is generated.
     """
-    paginate_kwargs = get_paginate_parameters()
-
-    query = db.session.query(table)
+    if columns:
+        # The rows must also carry the keys cursor pagination orders by.
+        keys = [key.key for key in inspect(table).primary_key] + list(ordenable_columns)
+        selected = {column.key for column in columns}
+        columns = list(columns) + [getattr(table, key) for key in dict.fromkeys(keys) if key not in selected]
+    query = db.session.query(*columns) if columns else db.session.query(table)
     for sub_table in joinable_tables:
         query = query.join(sub_table)
 
     filtered = query.filter(*filter)
-    if clauses := get_ordering_parameters(ordenable_columns, [table] + list(joinable_tables)):
+    if "cursor" in request.args:
+        return paginate_by_cursor(filtered, table, ordenable_columns, joinable_tables, filter)
+
+    paginate_kwargs = get_paginate_parameters()
+    count_mode = get_count_mode("exact")
+    if clauses := get_ordering_parameters(ordenable_columns, [table] + list(joinable_tables)) or default_ordering:
         filtered = filtered.order_by(*clauses)
 
-    pagination = filtered.paginate(**paginate_kwargs)
-    if pagination.items:
+    page = paginate_kwargs["page"]
+    per_page = max(1, min(paginate_kwargs["per_page"], paginate_kwargs["max_per_page"]))
+    rows = filtered.limit(per_page + 1).offset((page - 1) * per_page).all() if page > 0 else []
+    if items := rows[:per_page]:
+        total = get_total(filtered, [table] + list(joinable_tables), filter, count_mode)
+        pagination = OffsetPagination(filtered, page, per_page, total, items, has_next=len(rows) > per_page)
         pagination.limit = paginate_kwargs["max_per_page"]
         return pagination
     raise APIError("No page generated", code=404, api_code="PAGES_NOT_FOUND")
@@ -90,49 +351,42 @@ def get_error_filters() -> list:
 
     Returns:
         list: The error filters.
-    """
-    error_filter = []
-    operator = "ILIKE"
-    case = ""
-    args_list = [
-        "code",
-        "api_code",
-        "description",
-    ]
 
-    if "sqlite" in current_app.config["SQLALCHEMY_DATABASE_URI"]:
-        operator = "LIKE"
-        case = "COLLATE NOCASE"
-
-    for arg in args_list:
-        if value := request.args.get(arg, default=None, type=str):
-            error_filter.append(text(f"{arg} {operator} '%{value}%' {case}"))
-
-    return error_filter
+    Raises:
+        APIError: If a filter argument is invalid.
+    """
+    return compile_filters(ErrorsDTO.error_filters_parser, ERROR_FILTERS)
 
 
 def get_user_filters() -> list:
     """
     Get the filters for querying users.
 
+    The `search` argument takes precedence over the column filters. Without an indexed
+    search backend for the value, it matches the name or the age.
+
     Returns:
         list: The user filters.
+
+    Raises:
+        APIError: If a filter argument is invalid.
     """
-    user_filter = []
-    operator = "ILIKE"
-    case = ""
-    args_list = ["name", "cpf", "age"]
+    if value := request.args.get("search", default=None, type=str):
+        if search := get_user_search(value):
+            return [search[0]]
+        return [USER_SEARCH_FILTER(value)]
 
-    if "sqlite" in current_app.config["SQLALCHEMY_DATABASE_URI"]:
-        operator = "LIKE"
-        case = "COLLATE NOCASE"
+    return compile_filters(UserDTO.user_filters_parser, USER_FILTERS)
 
-    if value := request.args.get("search", default=None, type=str):
-        user_filter.append(text(f"(name {operator} '%{value}%' {case} OR age {operator} '%{value}%' {case})"))
-        return user_filter
 
-    for arg in args_list:
-        if value := request.args.get(arg, default=None, type=str):
-            user_filter.append(text(f"{arg} {operator} '%{value}%' {case}"))
+def get_user_search_ranking() -> list:
+    """
+    Get the ranking of the users matched by the `search` argument.
 
-    return user_filter
\ No newline at end of file
+    Returns:
+        list: The ranking clauses, empty when there is no search or no ranked backend.
+    """
+    if value := request.args.get("search", default=None, type=str):
+        if search := get_user_search(value):
+            return search[1]
+    return []
@@ -0,0 +1,340 @@
+import cProfile
+import glob
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from werkzeug.wsgi import ClosingIterator
+
+from .admin_utils import ADMIN_HEADER, is_admin_request
+from .api_error import APIError
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile-Token"
+SKIP_PROFILE_ENVIRON_KEY = "api.skip_profile"
+PROFILE_FORMATS = {"pstats": "application/octet-stream", "collapsed": "text/plain"}
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+@lru_cache(maxsize=4096)
+def _get_module_path(filename: str) -> str:
+    # The shortest path of the file relative to an import root, such as `flask/app.py`.
+    roots = [root for root in sys.path if root and filename.startswith(root.rstrip(os.sep) + os.sep)]
+    return os.path.relpath(filename, max(roots, key=len)) if roots else filename
+
+
+def collapse_stack(frame) -> str:
+    """
+    Write a stack in the collapsed format of flame graph tools, from the outermost frame.
+
+    Args:
+        frame: The innermost frame.
+
+    Returns:
+        str: The `module/path.py:function` of each frame, separated by `;`.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        name = f"{_get_module_path(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+        names.append(name.replace(";", ":"))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    Sampling profiler of the threads serving requests.
+
+    A background thread records the stack of each watched thread every `interval`
+    seconds, so a request is profiled without being slowed down, and the samples are
+    only kept when it turns out to be slow.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._stacks = {}
+        self._pid = None
+        self._lock = threading.Lock()
+        self._samples_lock = threading.Lock()
+
+    def _start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Threads are not inherited through a fork.
+            self._stacks = {}
+            threading.Thread(target=self._run, name="stack-sampler", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._stacks:
+                continue
+            frames = sys._current_frames()
+            with self._samples_lock:
+                for ident, stacks in self._stacks.items():
+                    if (frame := frames.get(ident)) is not None:
+                        stacks[collapse_stack(frame)] += 1
+
+    def watch(self) -> Counter:
+        """
+        Start sampling the current thread.
+
+        Returns:
+            Counter: The samples of each collapsed stack, filled until `unwatch`.
+        """
+        self._start()
+        stacks = Counter()
+        with self._samples_lock:
+            self._stacks[threading.get_ident()] = stacks
+        return stacks
+
+    def unwatch(self):
+        """Stop sampling the current thread."""
+        with self._samples_lock:
+            self._stacks.pop(threading.get_ident(), None)
+
+
+class RequestProfiler:
+    """
+    On-demand and slow-request profiling of the API.
+
+    A request is profiled with `cProfile` when it carries the `X-Profile-Token` header
+    with the `PROFILE_TOKEN` secret, or when it is drawn in the `PROFILE_SAMPLE_RATE`
+    fraction of the traffic; its response carries the `X-Profile-ID` of the profile.
+    When `PROFILE_SLOW_MS` is set every request is also watched by a `StackSampler`, and
+    the samples of the slower requests are kept as flame graph-ready collapsed stacks.
+
+    Profiles are written to `PROFILE_DIR`, shared by the workers, which keeps the
+    `PROFILE_MAX_COUNT` latest ones, and are served by the `/api/profile` endpoints.
+    """
+
+    def __init__(self):
+        self.token = None
+        self.sample_rate = 0.0
+        self.slow_ms = 0.0
+        self.directory = None
+        self.max_count = 100
+        self.sampler = StackSampler()
+
+    def init_app(self, app):
+        """
+        Wrap the WSGI application of an application with the profiling middleware.
+
+        Args:
+            app (Flask): The application.
+        """
+        self.token = app.config.get("PROFILE_TOKEN")
+        self.sample_rate = app.config.get("PROFILE_SAMPLE_RATE", self.sample_rate)
+        self.slow_ms = app.config.get("PROFILE_SLOW_MS", self.slow_ms)
+        self.max_count = app.config.get("PROFILE_MAX_COUNT", self.max_count)
+        self.sampler.interval = app.config.get("PROFILE_SAMPLE_INTERVAL", self.sampler.interval)
+        self.directory = app.config.get("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "api-profiles")
+        # Only the API user may read the profiles: their stacks show the code paths of requests.
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        app.wsgi_app = self.wrap(app.wsgi_app)
+
+    def is_authorized(self, token: str) -> bool:
+        """
+        Check a token against `PROFILE_TOKEN`.
+
+        Args:
+            token (str): The token sent by the client.
+
+        Returns:
+            bool: Whether profiling is enabled and the token is the right one.
+        """
+        return bool(self.token and token) and hmac.compare_digest(token.encode(), self.token.encode())
+
+    def check_authorized(self, token: str):
+        """
+        Reject a request to the profiles without the `PROFILE_TOKEN` or the `ADMIN_TOKEN`.
+
+        Args:
+            token (str): The profile token sent by the client.
+
+        Raises:
+            APIError: If neither token is right.
+        """
+        if not self.is_authorized(token) and not is_admin_request():
+            raise APIError("Profiling requires a valid token.", code=403, api_code="PROFILE_FORBIDDEN",
+                           info=f"Send the PROFILE_TOKEN in the {PROFILE_HEADER} header, "
+                                f"or the ADMIN_TOKEN in the {ADMIN_HEADER} header")
+
+    def wrap(self, wsgi_app):
+        """
+        Profile the requests of a WSGI application, from routing to the end of the response.
+
+        The profile ends when the server closes the response, so the body of a streamed
+        response, generated while the server iterates it, is profiled too.
+
+        Args:
+            wsgi_app: The WSGI application.
+
+        Returns:
+            The profiled WSGI application.
+        """
+        def profiled_app(environ, start_response):
+            if self.is_authorized(environ.get("HTTP_X_PROFILE_TOKEN")):
+                reason = "requested"
+            elif self.sample_rate and random.random() < self.sample_rate:
+                reason = "sampled"
+            else:
+                reason = None
+            if not reason and (not self.slow_ms or environ.get(SKIP_PROFILE_ENVIRON_KEY)):
+                return wsgi_app(environ, start_response)
+
+            profile_id = uuid.uuid4().hex
+            response = {}
+
+            def profiled_start_response(status, headers, exc_info=None):
+                response["status"] = int(status.split(" ", 1)[0])
+                response["request_id"] = next((value for name, value in headers if name == "X-Request-ID"), None)
+                if reason:
+                    headers = [*headers, ("X-Profile-ID", profile_id)]
+                return start_response(status, headers, exc_info)
+
+            profile = cProfile.Profile() if reason else None
+            if profile is not None:
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Python 3.12+ profiles one thread of a process at a time.
+                    profile = None
+            stacks = self.sampler.watch() if self.slow_ms else None
+            start = time.perf_counter()
+
+            def finish():
+                nonlocal reason
+                duration_ms = (time.perf_counter() - start) * 1000
+                if profile is not None:
+                    profile.disable()
+                if stacks is not None:
+                    self.sampler.unwatch()
+                if not reason and duration_ms >= self.slow_ms and stacks:
+                    reason = "slow"
+                    logger.warning("Slow request profiled as %s: %.0fms", profile_id, duration_ms)
+                if reason:
+                    self.save(profile_id, reason, environ, response, duration_ms, profile, stacks)
+
+            try:
+                app_iter = wsgi_app(environ, profiled_start_response)
+            except BaseException:
+                finish()
+                raise
+            return ClosingIterator(app_iter, finish)
+
+        return profiled_app
+
+    def save(self, profile_id: str, reason: str, environ: dict, response: dict, duration_ms: float,
+             profile: cProfile.Profile = None, stacks: Counter = None):
+        """
+        Write a profile and its metadata to `PROFILE_DIR`, then drop the oldest profiles.
+
+        Args:
+            profile_id (str): The profile id.
+            reason (str): Why the request was profiled: `requested`, `sampled` or `slow`.
+            environ (dict): The WSGI environ of the request.
+            response (dict): The `status` and `request_id` of the response.
+            duration_ms (float): The request duration, in milliseconds.
+            profile (cProfile.Profile, optional): The deterministic profile. Defaults to None.
+            stacks (Counter, optional): The sampled collapsed stacks. Defaults to None.
+        """
+        metadata = {
+            "id": profile_id,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "reason": reason,
+            "method": environ.get("REQUEST_METHOD"),
+            # The query string is left out: it can hold personal data, such as CPFs.
+            "path": environ.get("PATH_INFO", ""),
+            "status": response.get("status"),
+            "request_id": response.get("request_id"),
+            "duration_ms": round(duration_ms, 3),
+            "pid": os.getpid(),
+            "formats": [],
+        }
+        try:
+            if profile is not None:
+                self._write(profile_id, "pstats", profile.dump_stats)
+                metadata["formats"].append("pstats")
+            if stacks:
+                self._write(profile_id, "collapsed", "".join(f"{stack} {count}\n" for stack, count in stacks.items()))
+                metadata["formats"].append("collapsed")
+            # The metadata is written last: a profile is listed once its files are complete.
+            self._write(profile_id, "json", json.dumps(metadata))
+            self._prune()
+        except OSError:
+            logger.exception("Failed to save the profile %s", profile_id)
+
+    def _write(self, profile_id: str, extension: str, content):
+        path = os.path.join(self.directory, f"{profile_id}.{extension}")
+        if callable(content):
+            content(f"{path}.tmp")
+        else:
+            with open(f"{path}.tmp", "w") as profile_file:
+                profile_file.write(content)
+        os.replace(f"{path}.tmp", path)
+
+    def _prune(self):
+        profiles = sorted(glob.glob(os.path.join(self.directory, "*.json")), key=os.path.getmtime)
+        for path in profiles[:max(len(profiles) - self.max_count, 0)]:
+            for stale in glob.glob(f"{path.removesuffix('.json')}.*"):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+
+    def list_profiles(self) -> list[dict]:
+        """
+        Get the metadata of the stored profiles of every worker.
+
+        Returns:
+            list[dict]: The metadata, newest first.
+        """
+        profiles = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as metadata_file:
+                    profiles.append(json.load(metadata_file))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda profile: profile["created"], reverse=True)
+
+    def get_profile_path(self, profile_id: str, format: str) -> str:
+        """
+        Get the file of a stored profile.
+
+        Args:
+            profile_id (str): The profile id.
+            format (str): `pstats` or `collapsed`.
+
+        Returns:
+            str: The path of the file.
+
+        Raises:
+            APIError: If there is no such profile in this format.
+        """
+        path = os.path.join(self.directory, f"{profile_id}.{format}")
+        if format not in PROFILE_FORMATS or not _PROFILE_ID.match(profile_id) or not os.path.exists(path):
+            raise APIError("Profile doesn't exist.", code=404, api_code="PROFILE_NOT_FOUND",
+                           info=f"No {format} profile {profile_id}")
+        return path
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,263 @@
+import logging
+import math
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from flask import g, request
+
+from .admin_utils import is_admin_request
+from .api_error import APIError
+
+logger = logging.getLogger(__name__)
+
+SKIP_ENVIRON_KEY = "api.skip_rate_limit"
+
+_RULE = re.compile(r"^(?P<method>[A-Z]+) (?P<route>[^?]+)(?:\?(?P<arg>\w+)(?:>(?P<above>\d+))?)?$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bucket (client TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS slot (id INTEGER PRIMARY KEY, route TEXT NOT NULL, started REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS slot_route ON slot (route, started);
+"""
+
+
+class _Rule:
+    def __init__(self, rule: str, value: float):
+        if not (match := _RULE.match(rule)):
+            raise ValueError(f"Invalid route rule: {rule!r}")
+        self.key = f"{match['method']} {match['route']}"
+        self.arg = match["arg"]
+        self.above = int(match["above"]) if match["above"] else None
+        self.name = rule
+        self.value = value
+
+    def matches(self, args) -> bool:
+        if self.arg is None:
+            return True
+        if self.arg not in args:
+            return False
+        if self.above is None:
+            return True
+        try:
+            return int(args[self.arg]) > self.above
+        except ValueError:
+            return False
+
+
+class SharedState:
+    """
+    Token buckets and concurrency slots kept in a SQLite file shared by the workers of a host.
+
+    Every decision is one short `BEGIN IMMEDIATE` transaction, so the workers see the
+    same counters whatever process they run in. The file only holds transient state:
+    it is written without fsync, and slots held by a killed worker expire after
+    `slot_ttl` seconds.
+    """
+
+    def __init__(self, path: str, slot_ttl: float = 60.0, busy_timeout: float = 0.1):
+        self.path = path
+        self.slot_ttl = slot_ttl
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._last_cleanup = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections can't be shared with a forked process nor, safely, between threads.
+        if getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.executescript(_SCHEMA)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return self._local.connection
+
+    def admit(self, client: str, cost: float, rate: float, burst: float, slots: list[tuple[str, int]]):
+        """
+        Take `cost` tokens from the bucket of a client and a slot of each limited route.
+
+        Nothing is taken unless everything is available.
+
+        Args:
+            client (str): The client identifier.
+            cost (float): Tokens the request costs.
+            rate (float): Tokens added to a bucket per second.
+            burst (float): Capacity of a bucket.
+            slots (list): `(route, limit)` pairs of the concurrency limits the request is subject to.
+
+        Returns:
+            tuple: `(slot_ids, None, None)` when admitted, else `(None, reason, retry_after)`
+                with reason `"rate"` or `"concurrency"` and retry_after in seconds.
+        """
+        connection = self._connect()
+        now = time.time()
+        cost = min(cost, burst)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated FROM bucket WHERE client = ?", (client,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            if tokens < cost:
+                return None, "rate", (cost - tokens) / rate
+
+            for route, limit in slots:
+                (count,) = connection.execute(
+                    "SELECT COUNT(*) FROM slot WHERE route = ? AND started > ?", (route, now - self.slot_ttl)
+                ).fetchone()
+                if count >= limit:
+                    return None, "concurrency", 1.0
+
+            slot_ids = [
+                connection.execute("INSERT INTO slot (route, started) VALUES (?, ?)", (route, now)).lastrowid
+                for route, _ in slots
+            ]
+            connection.execute(
+                "INSERT INTO bucket (client, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (client) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (client, tokens - cost, now),
+            )
+            connection.execute("COMMIT")
+            return slot_ids, None, None
+        finally:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            self._cleanup(connection, now, burst / rate)
+
+    def release(self, slot_ids: list[int]):
+        """
+        Give back the concurrency slots of a finished request.
+
+        Args:
+            slot_ids (list): The ids returned by `admit`.
+        """
+        self._connect().execute(
+            f"DELETE FROM slot WHERE id IN ({', '.join('?' * len(slot_ids))})", slot_ids
+        )
+
+    def _cleanup(self, connection: sqlite3.Connection, now: float, refill_time: float):
+        if now - self._last_cleanup < self.slot_ttl:
+            return
+        self._last_cleanup = now
+        # Full buckets are the same as missing ones.
+        connection.execute("DELETE FROM bucket WHERE updated < ?", (now - refill_time,))
+        connection.execute("DELETE FROM slot WHERE started < ?", (now - self.slot_ttl,))
+
+
+class RateLimiter:
+    """
+    Admission control of the API requests, shared by the workers of a host.
+
+    Each client has a token bucket refilled with `RATE_LIMIT_RATE` tokens per second up
+    to `RATE_LIMIT_BURST`; a request takes the cost of its route, 1 by default, and is
+    answered `429` when the bucket is short. Routes with a `RATE_LIMIT_CONCURRENCY`
+    limit take a slot for the duration of the request, and are answered `503` when
+    every slot is taken. Both responses carry a `Retry-After` header.
+
+    Route rules are `METHOD /route` with the URL rule of the endpoint, optionally
+    followed by `?arg`, matching requests with that query argument, or `?arg>N`,
+    matching requests where it is an integer greater than N. The cost of a request is
+    the highest of the rules it matches. Operators sending the `ADMIN_TOKEN` are not limited.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.rate = 20.0
+        self.burst = 40.0
+        self.client_header = None
+        self.costs = []
+        self.concurrency = []
+        self.state = None
+
+    def init_app(self, app):
+        """
+        Configure the limiter from the `RATE_LIMIT_*` settings and register its request hooks.
+
+        Args:
+            app (Flask): The application.
+        """
+        self.enabled = app.config.get("RATE_LIMIT_ENABLED", False)
+        self.rate = app.config.get("RATE_LIMIT_RATE", self.rate)
+        self.burst = app.config.get("RATE_LIMIT_BURST", self.burst)
+        self.client_header = app.config.get("RATE_LIMIT_CLIENT_HEADER")
+        self.costs = [_Rule(rule, cost) for rule, cost in app.config.get("RATE_LIMIT_ROUTE_COSTS", {}).items()]
+        self.concurrency = [
+            _Rule(rule, limit) for rule, limit in app.config.get("RATE_LIMIT_CONCURRENCY", {}).items()
+        ]
+        self.state = SharedState(
+            app.config.get("RATE_LIMIT_STATE_FILE") or os.path.join(tempfile.gettempdir(), "api-rate-limit.db"),
+            slot_ttl=app.config.get("RATE_LIMIT_SLOT_TTL", 60.0),
+        )
+        if self.enabled and not self.client_header:
+            logger.error(
+                "RATE_LIMIT_CLIENT_HEADER is not set: clients are identified by their peer address, "
+                "so behind a proxy they all share one bucket"
+            )
+        if self.enabled:
+            app.before_request(self._admit)
+            app.teardown_request(self._release)
+
+    def get_client(self) -> str:
+        """
+        Get the identifier of the requesting client.
+
+        Returns:
+            str: The first address of `RATE_LIMIT_CLIENT_HEADER` when set and sent, else the peer address.
+        """
+        if self.client_header and (forwarded := request.headers.get(self.client_header)):
+            return forwarded.split(",")[0].strip()
+        return request.remote_addr or "unknown"
+
+    def get_route(self) -> str:
+        """
+        Get the `METHOD /route` key of the request.
+
+        Returns:
+            str: The method and URL rule, with repeated slashes collapsed.
+        """
+        return f"{request.method} {re.sub('/+', '/', request.url_rule.rule)}"
+
+    def _admit(self):
+        if request.blueprint != "api" or request.url_rule is None or request.environ.get(SKIP_ENVIRON_KEY):
+            return
+        if is_admin_request():
+            return
+
+        route = self.get_route()
+        cost = max((rule.value for rule in self.costs if rule.key == route and rule.matches(request.args)), default=1)
+        slots = [
+            (rule.name, int(rule.value)) for rule in self.concurrency if rule.key == route and rule.matches(request.args)
+        ]
+        try:
+            slot_ids, reason, retry_after = self.state.admit(self.get_client(), cost, self.rate, self.burst, slots)
+        except sqlite3.Error as error:
+            # The limiter must not take the API down with it.
+            logger.warning("Rate limit state unavailable, request admitted: %s", error)
+            return
+
+        if reason == "rate":
+            raise APIError(
+                "Too many requests",
+                code=429,
+                api_code="RATE_LIMITED",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+        if reason == "concurrency":
+            raise APIError(
+                "Server overloaded",
+                code=503,
+                api_code="SERVER_OVERLOADED",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+        g.rate_limit_slots = slot_ids
+
+    def _release(self, exception=None):
+        if slot_ids := g.pop("rate_limit_slots", None):
+            try:
+                self.state.release(slot_ids)
+            except sqlite3.Error as error:
+                logger.warning("Rate limit slots not released, they expire in %.0fs: %s", self.state.slot_ttl, error)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,250 @@
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+
+from .metrics import Histogram, merge_histograms
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("api.access")
+
+
+class RequestMetrics:
+    """
+    Per-request latency and SQL instrumentation.
+
+    For every request the number of SQL statements and the time spent in the database
+    are measured with cursor execution events, sent back in a `Server-Timing` header
+    and aggregated per route, method and status code. `GET /metrics` serves the
+    aggregates in the Prometheus text format to requests with the `ADMIN_TOKEN`. When `METRICS_DIR` is set, each worker
+    writes its aggregates there so any worker can serve the totals of the running ones.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self.directory = None
+        self.flush_interval = 1.0
+        self.n_plus_one_threshold = 0
+
+    def init_app(self, app):
+        """
+        Register the request hooks and the `/metrics` endpoint.
+
+        Args:
+            app (Flask): The application.
+        """
+        self.directory = app.config.get("METRICS_DIR")
+        self.flush_interval = app.config.get("METRICS_FLUSH_INTERVAL", self.flush_interval)
+        self.n_plus_one_threshold = app.config.get("N_PLUS_ONE_THRESHOLD", self.n_plus_one_threshold)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule("/metrics", "metrics", self.metrics_view)
+
+    def _start_request(self):
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        g.request_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+        g.sql_statements = Counter()
+
+    def _finish_request(self, response):
+        if "request_start" not in g:
+            return response
+
+        duration = time.perf_counter() - g.request_start
+        response.headers["Server-Timing"] = (
+            f'db;dur={g.sql_time * 1000:.2f};desc="{g.sql_count} queries", app;dur={duration * 1000:.2f}'
+        )
+        response.headers["X-Request-ID"] = g.request_id
+        route = re.sub("/+", "/", request.url_rule.rule) if request.url_rule else "unmatched"
+        self.observe(route, request.method, response.status_code, duration, g.sql_count, g.sql_time)
+        self._log_repeated_statements(route)
+        access_logger.info(
+            "%s %s %d", request.method, request.full_path.rstrip("?"), response.status_code,
+            extra={
+                "status": response.status_code,
+                "duration_ms": round(duration * 1000, 3),
+                "sql_count": g.sql_count,
+                "sql_ms": round(g.sql_time * 1000, 3),
+            },
+        )
+        return response
+
+    def _log_repeated_statements(self, route: str):
+        if not self.n_plus_one_threshold:
+            return
+        for statement, count in g.sql_statements.items():
+            if count >= self.n_plus_one_threshold:
+                logger.warning(
+                    "Possible N+1 on %s %s: statement executed %d times: %s",
+                    request.method, route, count, " ".join(statement.split())[:200],
+                )
+
+    def observe(self, route: str, method: str, status: int, duration: float, sql_count: int, sql_time: float):
+        """
+        Record a finished request.
+
+        Args:
+            route (str): The URL rule of the request.
+            method (str): The HTTP method.
+            status (int): The response status code.
+            duration (float): The request latency, in seconds.
+            sql_count (int): The SQL statements executed.
+            sql_time (float): The time spent executing them, in seconds.
+        """
+        key = (route, method, str(status))
+        with self._lock:
+            if not (series := self._series.get(key)):
+                series = self._series[key] = {"latency": Histogram(), "sql_statements": 0, "db_seconds": 0.0}
+            series["sql_statements"] += sql_count
+            series["db_seconds"] += sql_time
+        series["latency"].observe(duration)
+
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def reset(self):
+        """Forget the aggregates of this worker."""
+        with self._lock:
+            self._series = {}
+
+    def snapshot(self) -> dict:
+        """
+        Get the aggregates of this worker.
+
+        Returns:
+            dict: The series keyed by `route method status`.
+        """
+        with self._lock:
+            items = list(self._series.items())
+        return {
+            " ".join(key): {
+                "latency": series["latency"].to_dict(),
+                "sql_statements": series["sql_statements"],
+                "db_seconds": series["db_seconds"],
+            }
+            for key, series in items
+        }
+
+    def flush(self):
+        """Write the aggregates of this worker to `METRICS_DIR`."""
+        self._last_flush = time.monotonic()
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        with open(f"{path}.tmp", "w") as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(f"{path}.tmp", path)
+
+    def collect(self) -> dict:
+        """
+        Get the aggregates of every running worker.
+
+        The files of the workers that exited are removed.
+
+        Returns:
+            dict: The summed series keyed by `route method status`.
+        """
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush()
+        totals = {}
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            if not _is_running(int(os.path.basename(path)[len("metrics-"):-len(".json")])):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                with open(path) as snapshot_file:
+                    snapshot = json.load(snapshot_file)
+            except (OSError, ValueError):
+                continue
+            for key, series in snapshot.items():
+                if total := totals.get(key):
+                    total["latency"] = merge_histograms(total["latency"], series["latency"])
+                    total["sql_statements"] += series["sql_statements"]
+                    total["db_seconds"] += series["db_seconds"]
+                else:
+                    totals[key] = series
+        return totals
+
+    def metrics_view(self):
+        """Serve the aggregates in the Prometheus text format."""
+        from .admin_utils import is_admin_request
+
+        if not is_admin_request():
+            return Response("Forbidden: send the ADMIN_TOKEN as a Bearer token\n", status=403, mimetype="text/plain")
+        lines = [
+            "# HELP api_request_duration_seconds Request latency.",
+            "# TYPE api_request_duration_seconds histogram",
+        ]
+        series = sorted(self.collect().items())
+        labels = {}
+        for key, _ in series:
+            route, method, status = key.split(" ")
+            labels[key] = f'route="{route}",method="{method}",status="{status}"'
+
+        for key, values in series:
+            for bound, count in values["latency"]["buckets"].items():
+                lines.append(f'api_request_duration_seconds_bucket{{{labels[key]},le="{bound}"}} {count}')
+            lines.append(f"api_request_duration_seconds_sum{{{labels[key]}}} {values['latency']['sum']}")
+            lines.append(f"api_request_duration_seconds_count{{{labels[key]}}} {values['latency']['count']}")
+
+        lines += [
+            "# HELP api_sql_statements_total SQL statements executed by requests.",
+            "# TYPE api_sql_statements_total counter",
+            *(f"api_sql_statements_total{{{labels[key]}}} {values['sql_statements']}" for key, values in series),
+            "# HELP api_db_seconds_total Time requests spent executing SQL statements.",
+            "# TYPE api_db_seconds_total counter",
+            *(f"api_db_seconds_total{{{labels[key]}}} {values['db_seconds']}" for key, values in series),
+        ]
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+request_metrics = RequestMetrics()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["statement_start"].pop()
+    if has_request_context() and "sql_statements" in g:
+        g.sql_count += 1
+        g.sql_time += duration
+        g.sql_statements[statement] += 1
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_statement(exception_context):
+    if connection := exception_context.connection:
+        if starts := connection.info.get("statement_start"):
+            starts.pop()
@@ -0,0 +1,147 @@
+from .. import db
+from ..model import User
+
+from sqlalchemy import func, inspect, or_
+from sqlalchemy.sql import text
+
+TRIGRAM_MIN_LENGTH = 3
+
+POSTGRESQL_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_name_trgm ON users USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_age_trgm ON users USING gin (age gin_trgm_ops)",
+]
+
+# `users` has no INTEGER PRIMARY KEY: its rowids, which the index refers to, may be
+# renumbered by VACUUM, so the database is vacuumed with `vacuum_database`.
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "name, age, content='users', content_rowid='rowid', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, name, age) VALUES (new.rowid, new.name, new.age); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, name, age) VALUES ('delete', old.rowid, old.name, old.age); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, name, age) VALUES ('delete', old.rowid, old.name, old.age); "
+    "INSERT INTO users_fts(rowid, name, age) VALUES (new.rowid, new.name, new.age); END",
+    "INSERT INTO users_fts(users_fts) VALUES ('rebuild')",
+]
+
+_fts_available = {}
+
+
+def create_search_indexes():
+    """
+    Create the user search indexes for the current database.
+
+    Mirrors the `user search indexes` migration, for databases set up with `db.create_all()`.
+    """
+    statements = {
+        "postgresql": POSTGRESQL_SEARCH_DDL,
+        "sqlite": SQLITE_SEARCH_DDL,
+    }.get(db.engine.dialect.name, [])
+
+    for statement in statements:
+        db.session.execute(text(statement))
+    db.session.commit()
+    _fts_available.clear()
+
+
+def vacuum_database():
+    """
+    Run `VACUUM` on a SQLite database, then rebuild the `users_fts` index.
+
+    `VACUUM` may renumber the rowids of `users`, leaving the index pointing at other
+    users: it is rebuilt from the table right after. Other databases are left as is.
+    """
+    engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM"))
+        if inspect(connection).has_table("users_fts"):
+            connection.execute(text("INSERT INTO users_fts(users_fts) VALUES ('rebuild')"))
+
+
+def has_sqlite_fts() -> bool:
+    """
+    Check whether the SQLite database has the `users_fts` shadow table.
+
+    Returns:
+        bool: Whether the FTS5 search backend can be used.
+    """
+    engine = db.engine
+    if engine.url not in _fts_available:
+        _fts_available[engine.url] = inspect(engine).has_table("users_fts")
+    return _fts_available[engine.url]
+
+
+async def detect_sqlite_fts(app, async_engine):
+    """
+    Resolve `has_sqlite_fts` through an asyncio engine, so the first search of an
+    ASGI worker doesn't inspect the database synchronously in the event loop.
+
+    Args:
+        app (Flask): The application whose `db.engine` the check is cached for.
+        async_engine (AsyncEngine): An asyncio engine of the same database.
+    """
+    if async_engine.dialect.name != "sqlite":
+        return
+    async with async_engine.connect() as connection:
+        available = await connection.run_sync(lambda sync_connection: inspect(sync_connection).has_table("users_fts"))
+    with app.app_context():
+        _fts_available[db.engine.url] = available
+
+
+def escape_like(value: str) -> str:
+    """
+    Escape the LIKE wildcards of a value so it is matched literally.
+
+    Args:
+        value (str): The searched value.
+
+    Returns:
+        str: The escaped value.
+    """
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def get_user_search(value: str):
+    """
+    Get the indexed filter and ranking for the user `search` argument.
+
+    PostgreSQL matches with ILIKE, which the pg_trgm GIN indexes serve, and ranks by
+    trigram word similarity. SQLite matches and ranks with the `users_fts` FTS5 table.
+
+    Args:
+        value (str): The searched value.
+
+    Returns:
+        tuple: The filter clause and the list of ranking clauses, or None when the
+        database has no search backend for the value.
+    """
+    dialect = db.engine.dialect.name
+
+    if dialect == "postgresql":
+        pattern = f"%{escape_like(value)}%"
+        return (
+            or_(User.name.ilike(pattern, escape="\\"), User.age.ilike(pattern, escape="\\")),
+            [func.word_similarity(value, User.name).desc()],
+        )
+
+    if dialect == "sqlite" and len(value) >= TRIGRAM_MIN_LENGTH and has_sqlite_fts():
+        phrase = '"{}"'.format(value.replace('"', '""'))
+        return (
+            text("users.rowid IN (SELECT rowid FROM users_fts WHERE users_fts MATCH :search_match)")
+            .bindparams(search_match=phrase),
+            [
+                # LIMIT -1 keeps SQLite from flattening the ranked matches into a MATCH
+                # per user row: they are computed once and looked up by rowid.
+                text(
+                    "(SELECT ranked.rank FROM (SELECT rowid, rank FROM users_fts WHERE users_fts MATCH :search_rank "
+                    "LIMIT -1) AS ranked WHERE ranked.rowid = users.rowid)"
+                ).bindparams(search_rank=phrase)
+            ],
+        )
+
+    return None
@@ -0,0 +1,167 @@
+from collections.abc import Mapping
+
+from flask import current_app
+from flask_restx import fields, marshal
+from flask_restx.mask import apply as apply_mask
+
+_FORMATTERS = {
+    fields.String: "str",
+    fields.Integer: "int",
+    fields.Float: "float",
+    fields.Boolean: "bool",
+    fields.Raw: "",
+}
+
+_encoders = {}
+
+
+def _is_plain(field) -> bool:
+    return (
+        type(field) in _FORMATTERS
+        and not field.mask
+        and not callable(field.default)
+        and (field.attribute is None or isinstance(field.attribute, str) and "." not in field.attribute)
+    )
+
+
+def _compile_nested(field):
+    encode = compile_encoder(field.nested, skip_none=field.skip_none)
+    allow_null, default = field.allow_null, field.default
+
+    def encode_nested(value):
+        if value is None:
+            if allow_null:
+                return None
+            if default is not None:
+                return default
+        if isinstance(value, Mapping):
+            return marshal(value, field.nested, skip_none=field.skip_none)
+        return encode(value)
+
+    return encode_nested
+
+
+def _compile_list(key: str, field):
+    if not isinstance(field.container, fields.Nested) or field.container.attribute is not None:
+        return None
+    encode_item = _compile_nested(field.container)
+
+    def encode_list(obj):
+        value = getattr(obj, key, None)
+        if value is None:
+            return field._v("default")
+        if isinstance(value, (Mapping, str)) or not hasattr(value, "__iter__"):
+            return field.output(key, obj)
+        return [encode_item(item) for item in value]
+
+    return encode_list
+
+
+def compile_encoder(model, skip_none: bool = False):
+    """
+    Generate a function serializing an object exactly as `marshal(obj, model)` does.
+
+    The function reads each field with one attribute lookup and formats it inline,
+    instead of walking the field objects of the model for every value. Fields with a
+    type it doesn't know are still serialized by their own `output` method.
+
+    Args:
+        model: The flask_restx model, or a dict of fields.
+        skip_none (bool, optional): Whether None and empty values are left out. Defaults to False.
+
+    Returns:
+        callable: The encoder, taking an object and returning a dict.
+    """
+    namespace = {}
+    lines = ["def encode(obj):"]
+    entries = []
+    for index, (key, field) in enumerate(model.items()):
+        field = field() if isinstance(field, type) else field
+        attribute = key if field.attribute is None else field.attribute
+
+        if _is_plain(field):
+            formatter = _FORMATTERS[type(field)]
+            namespace[f"none_{index}"] = field.format(field.default) if field.default else field.default
+            lines.append(f"    value_{index} = getattr(obj, {attribute!r}, None)")
+            entries.append(
+                f"{key!r}: none_{index} if value_{index} is None else {formatter}(value_{index})"
+            )
+            continue
+
+        if isinstance(field, fields.List) and field.attribute is None and (encode_list := _compile_list(key, field)):
+            namespace[f"field_{index}"] = encode_list
+            entries.append(f"{key!r}: field_{index}(obj)")
+            continue
+
+        if isinstance(field, fields.Nested) and field.attribute is None:
+            namespace[f"field_{index}"] = _compile_nested(field)
+            entries.append(f"{key!r}: field_{index}(getattr(obj, {key!r}, None))")
+            continue
+
+        namespace[f"field_{index}"] = field
+        entries.append(f"{key!r}: field_{index}.output({key!r}, obj)")
+
+    lines.append("    out = {" + ", ".join(entries) + "}")
+    if skip_none:
+        lines.append("    out = {key: value for key, value in out.items() if value is not None and value != {}}")
+    lines.append("    return out")
+
+    exec("\n".join(lines), namespace)
+    return namespace["encode"]
+
+
+def get_encoder(model, mask: str = None):
+    """
+    Get the cached encoder of a model and fields mask.
+
+    Args:
+        model: The flask_restx model.
+        mask (str, optional): The `X-Fields` mask. Defaults to None.
+
+    Returns:
+        callable: The encoder.
+
+    Raises:
+        MaskError: If the mask doesn't fit the model.
+    """
+    key = (id(model), mask)
+    if key not in _encoders:
+        _encoders[key] = compile_encoder(apply_mask(model, mask, skip=True) if mask else model)
+    return _encoders[key]
+
+
+def get_model_columns(table, model, *extra: str) -> list:
+    """
+    Get the columns of a table that a model serializes, for a query that skips ORM objects.
+
+    Args:
+        table: The mapped class.
+        model: The flask_restx model of the items.
+        *extra (str): Other attributes the caller reads from the rows, such as a version.
+
+    Returns:
+        list: The column attributes, in model order.
+    """
+    keys = [field.attribute if isinstance(getattr(field, "attribute", None), str) else key for key, field in model.items()]
+    columns = table.__table__.columns
+    return [getattr(table, key) for key in dict.fromkeys([*keys, *extra]) if key in columns]
+
+
+def serialize(data, model, mask: str = None):
+    """
+    Serialize data with a model, using the precompiled encoder when `FAST_SERIALIZATION` is on.
+
+    The output is identical to `marshal(data, model, mask=mask)`.
+
+    Args:
+        data: The object to serialize.
+        model: The flask_restx model.
+        mask (str, optional): The `X-Fields` mask. Defaults to None.
+
+    Returns:
+        dict: The serialized data.
+    """
+    if not current_app.config.get("FAST_SERIALIZATION") or hasattr(data, "__iter__"):
+        return marshal(data, model, mask=mask)
+    return get_encoder(model, mask)(data)
+
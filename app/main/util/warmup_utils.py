@@ -0,0 +1,43 @@
+import logging
+import time
+
+from .. import db
+from .error_catalog import error_catalog
+from .profiler import SKIP_PROFILE_ENVIRON_KEY
+from .rate_limit import SKIP_ENVIRON_KEY
+from .request_metrics import request_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(app):
+    """
+    Prepare a worker before it takes traffic.
+
+    The connection pools are filled up to their size and the error catalog is loaded,
+    then each `WARMUP_PATHS` request
+    is sent once through the test client, so the SQLAlchemy statements of the hot paths
+    are compiled and cached. The warm-up requests are left out of the request metrics,
+    the rate limits and the slow request profiles.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        float: The warm-up duration, in seconds.
+    """
+    start = time.perf_counter()
+    with app.app_context():
+        db.warm_up(app)
+    error_catalog.load()
+
+    client = app.test_client()
+    for path in app.config.get("WARMUP_PATHS") or []:
+        response = client.get(path, environ_overrides={SKIP_ENVIRON_KEY: True, SKIP_PROFILE_ENVIRON_KEY: True})
+        if response.status_code >= 500:
+            logger.warning("Warm-up request %s answered %d", path, response.status_code)
+    request_metrics.reset()
+
+    duration = time.perf_counter() - start
+    logger.info("Worker warmed up in %.3fs", duration)
+    return duration
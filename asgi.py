@@ -0,0 +1,7 @@
+import os
+
+from app import create_asgi_app
+
+env_name = os.environ.get("ENV_NAME", "dev")
+
+app = create_asgi_app(env_name)
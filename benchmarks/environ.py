@@ -0,0 +1,26 @@
+"""
+Configure the API the benchmarks run, in this process and the servers they start.
+"""
+import os
+
+# The load generator is one client: rate limited, it would only measure its bucket.
+BENCHMARK_OVERRIDES = {"RATE_LIMIT_ENABLED": "false"}
+
+
+def configure_api(database_uri: str) -> dict:
+    """
+    Set the environment of the API to benchmark: the production configuration unless
+    `ENV_NAME` is set, on the given database, with the `BENCHMARK_OVERRIDES`.
+
+    Must be called before the application is imported.
+
+    Args:
+        database_uri (str): The SQLAlchemy URI of the database.
+
+    Returns:
+        dict: The `env_name` and the `overrides` applied, for the results metadata.
+    """
+    os.environ["SQLALCHEMY_DATABASE_URI"] = database_uri
+    os.environ.setdefault("ENV_NAME", "prod")
+    os.environ.update(BENCHMARK_OVERRIDES)
+    return {"env_name": os.environ["ENV_NAME"], "overrides": dict(BENCHMARK_OVERRIDES)}
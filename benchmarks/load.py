@@ -0,0 +1,195 @@
+"""
+A keep-alive HTTP/1.1 load generator for the benchmarks that run the API in a server.
+
+Each client holds one connection and sends its next request as soon as the previous
+response is read, reconnecting when the server closes the connection (gunicorn's
+sync workers close it after every response). With a target rate the requests are
+scheduled at fixed intervals instead, and their latency is counted from the time they
+were due, so a server falling behind is not hidden by clients waiting on it.
+"""
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+from .run import summarize
+
+
+class Traffic:
+    """
+    A weighted mix of requests.
+
+    Attributes:
+        names (list[str]): The request names, in the order they were added.
+    """
+
+    def __init__(self, seed: int = 0):
+        self.names = []
+        self._weights = []
+        self._requests = []
+        self._random = random.Random(seed)
+
+    def add(self, name: str, weight: float, expected_status: int, request):
+        """
+        Add a request to the mix.
+
+        Args:
+            name (str): The request name used in the results.
+            weight (float): The share of the request in the mix, relative to the others.
+            expected_status (int): The status code the request must answer; any other is an error.
+            request (callable): Returns the method, the path and the JSON body, or None, of the next request.
+        """
+        self.names.append(name)
+        self._weights.append(weight)
+        self._requests.append((expected_status, request))
+
+    def next(self, host: str) -> tuple[str, int, bytes]:
+        """
+        Pick the next request.
+
+        Args:
+            host (str): The `Host` header.
+
+        Returns:
+            tuple[str, int, bytes]: The request name, its expected status and its bytes.
+        """
+        index = self._random.choices(range(len(self.names)), self._weights)[0]
+        expected_status, request = self._requests[index]
+        method, path, body = request()
+        head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+        payload = b""
+        if body is not None:
+            payload = json.dumps(body).encode()
+            head += f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+        return self.names[index], expected_status, (head + "\r\n").encode("latin-1") + payload
+
+
+def get_traffic(paths: list[str]) -> Traffic:
+    """
+    Build a mix of GET requests answering 200, in equal shares.
+
+    Args:
+        paths (list[str]): The request paths.
+
+    Returns:
+        Traffic: The mix.
+    """
+    traffic = Traffic()
+    for path in paths:
+        traffic.add(path, 1, 200, lambda path=path: ("GET", path, None))
+    return traffic
+
+
+class _Schedule:
+    def __init__(self, duration: float, rate: float = None):
+        self.start = time.perf_counter()
+        self.deadline = self.start + duration
+        self.rate = rate
+        self.sent = 0
+
+    def next(self):
+        if self.rate:
+            due = self.start + self.sent / self.rate
+        else:
+            due = time.perf_counter()
+        self.sent += 1
+        return due if due < self.deadline else None
+
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple[int, bool]:
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in header_lines:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    status = int(status_line.split(" ", 2)[1])
+    if length := int(headers.get("content-length", 0)):
+        await reader.readexactly(length)
+    return status, headers.get("connection", "").lower() == "close"
+
+
+async def _client(host: str, port: int, traffic: Traffic, schedule: _Schedule, results: dict):
+    connection = None
+    while (due := schedule.next()) is not None:
+        if (delay := due - time.perf_counter()) > 0:
+            await asyncio.sleep(delay)
+        name, expected_status, request = traffic.next(f"{host}:{port}")
+        while True:
+            reused = connection is not None
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection(host, port)
+                reader, writer = connection
+                writer.write(request)
+                await writer.drain()
+                status, close = await _read_response(reader)
+                break
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                status, close = 0, True
+                if connection is not None:
+                    connection[1].close()
+                    connection = None
+                # A kept-alive connection may have been closed by the server while idle.
+                if not reused:
+                    break
+        result = results.setdefault(name, {"durations": [], "statuses": {}, "errors": 0})
+        result["durations"].append(time.perf_counter() - due)
+        result["statuses"][str(status)] = result["statuses"].get(str(status), 0) + 1
+        result["errors"] += status != expected_status
+        if close and connection is not None:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+def _summarize(durations: list[float], statuses: dict, errors: int) -> dict:
+    summary = summarize(durations) if len(durations) > 1 else {"iterations": len(durations)}
+    return {**summary, "error_rate": errors / len(durations), "statuses": dict(sorted(statuses.items()))}
+
+
+async def _run(url: str, traffic: Traffic, concurrency: int, duration: float, rate: float) -> dict:
+    parts = urlsplit(url)
+    results = {}
+    schedule = _Schedule(duration, rate)
+    await asyncio.gather(*(
+        _client(parts.hostname, parts.port or 80, traffic, schedule, results) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - schedule.start
+
+    total = {"durations": [], "statuses": {}, "errors": 0}
+    for result in results.values():
+        total["durations"].extend(result["durations"])
+        total["errors"] += result["errors"]
+        for status, count in result["statuses"].items():
+            total["statuses"][status] = total["statuses"].get(status, 0) + count
+    return {
+        **_summarize(**total),
+        "requests_per_sec": len(total["durations"]) / elapsed,
+        "target_rate": rate,
+        "requests": {name: _summarize(**results[name]) for name in traffic.names if name in results},
+    }
+
+
+def run_load(url: str, traffic: Traffic, concurrency: int = 32, duration: float = 10.0, rate: float = None) -> dict:
+    """
+    Send the requests of a traffic mix to a server for `duration` seconds from `concurrency` clients.
+
+    Args:
+        url (str): The server's base URL, such as `http://127.0.0.1:5000`.
+        traffic (Traffic): The requests to send.
+        concurrency (int, optional): The concurrent connections. Defaults to 32.
+        duration (float, optional): The load duration, in seconds. Defaults to 10.0.
+        rate (float, optional): The requests per second to send; the latency of a request
+            counts from the time it was due. Defaults to None, sending as fast as the
+            server answers.
+
+    Returns:
+        dict: The latency percentiles, the throughput, the error rate and the count of
+            each status code, overall and per request name. Answers with another status
+            than the expected one are errors; connection errors are counted as status `0`.
+    """
+    return asyncio.run(_run(url, traffic, concurrency, duration, rate))
@@ -0,0 +1,149 @@
+"""
+Benchmark the API hot paths through Flask's test client.
+
+Run from the repository root:
+
+    python -m benchmarks.run --rows 100000 --output results.json
+    python -m benchmarks.run --rows 100000 --baseline results.json
+
+The database (SQLite by default, or any `--database-uri`) is seeded once with
+`--rows` users and reused by later runs with the same row count.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .environ import configure_api
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="Users in the database (10k to 5M)")
+    parser.add_argument("--database-uri", help="SQLAlchemy URI; defaults to a SQLite file per row count")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per scenario")
+    parser.add_argument("--scenario", action="append", help="Only run these scenarios (repeatable)")
+    parser.add_argument("--output", help="Write the results JSON to this file instead of stdout")
+    parser.add_argument("--baseline", help="Compare against this results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p50 slowdown over the baseline")
+    parser.add_argument("--reseed", action="store_true", help="Drop and seed the database again")
+    return parser.parse_args(argv)
+
+
+def summarize(durations: list[float]) -> dict:
+    """
+    Summarize request durations, in milliseconds.
+
+    Args:
+        durations (list[float]): The durations in seconds.
+
+    Returns:
+        dict: The percentiles, mean and throughput.
+    """
+    ordered = sorted(durations)
+    quantiles = statistics.quantiles(ordered, n=100, method="inclusive")
+    return {
+        "iterations": len(ordered),
+        "min_ms": ordered[0] * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "ops_per_sec": len(ordered) / sum(ordered),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Find the scenarios whose median got slower than the baseline allows.
+
+    Args:
+        results (dict): The current results.
+        baseline (dict): The baseline results.
+        tolerance (float): The allowed relative slowdown of the median.
+
+    Returns:
+        list[str]: One line per regression.
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        if previous := baseline["scenarios"].get(name):
+            ratio = current["p50_ms"] / previous["p50_ms"]
+            current["baseline_ratio"] = ratio
+            if ratio > 1 + tolerance:
+                regressions.append(f"{name}: p50 {previous['p50_ms']:.2f}ms -> {current['p50_ms']:.2f}ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    database_uri = args.database_uri or "sqlite:///" + os.path.join(
+        tempfile.gettempdir(), f"api-benchmark-{args.rows}.db"
+    )
+    environ = configure_api(database_uri)
+
+    from api import app
+    from app.main import db
+    from flask import __version__ as flask_version
+    from sqlalchemy import __version__ as sqlalchemy_version
+
+    from .scenarios import build_scenarios
+    from .seed import prepare_database
+
+    app.app_context().push()
+    prepare_database(args.rows, reseed=args.reseed)
+
+    client = app.test_client()
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "rows": args.rows,
+            "dialect": db.engine.dialect.name,
+            "python": platform.python_version(),
+            "flask": flask_version,
+            "sqlalchemy": sqlalchemy_version,
+            "iterations": args.iterations,
+            **environ,
+        },
+        "scenarios": {},
+    }
+
+    for scenario in build_scenarios(args.rows):
+        if args.scenario and scenario.name not in args.scenario:
+            continue
+        for _ in range(args.warmup):
+            scenario.run(client)
+        durations = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            scenario.run(client)
+            durations.append(time.perf_counter() - start)
+        results["scenarios"][scenario.name] = summarize(durations)
+        print(f"{scenario.name:>22}: p50 {results['scenarios'][scenario.name]['p50_ms']:.2f}ms", file=sys.stderr)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import itertools
+import random
+import uuid
+
+from app.main import db
+from app.main.model import User
+from app.main.util.pagination_utils import encode_cursor
+from sqlalchemy import func
+
+from .seed import make_cpf
+
+NEW_USER_NAME = "Benchmark New User"
+NEW_USERS_START = 500_000_000
+
+
+class Scenario:
+    """
+    A request replayed by the benchmark.
+
+    Attributes:
+        name (str): The scenario name used in the results.
+        expected_status (int): The status code every request must answer.
+    """
+
+    def __init__(self, name: str, expected_status: int, request):
+        self.name = name
+        self.expected_status = expected_status
+        self._request = request
+
+    def run(self, client):
+        """
+        Send one request of the scenario.
+
+        Args:
+            client (FlaskClient): The test client of the application.
+
+        Raises:
+            AssertionError: If the response status is not the expected one.
+        """
+        response = self._request(client)
+        assert response.status_code == self.expected_status, (
+            f"{self.name}: expected {self.expected_status}, got {response.status_code}: "
+            f"{response.get_data(as_text=True)[:200]}"
+        )
+
+
+def iter_new_cpfs():
+    """
+    Generate unused CPFs for the users created by a benchmark.
+
+    CPFs of the seeded users start at 1, the created ones at `NEW_USERS_START`, after
+    the users created by previous runs on the same database.
+
+    Returns:
+        Iterator[str]: The unused CPFs.
+    """
+    last_cpf = db.session.query(func.max(User.cpf)).filter(User.cpf >= make_cpf(NEW_USERS_START)).scalar()
+    first_number = int(last_cpf[:9]) + 1 if last_cpf else NEW_USERS_START
+    return (make_cpf(number) for number in itertools.count(first_number))
+
+
+def build_scenarios(rows: int, seed: int = 0) -> list[Scenario]:
+    """
+    Build the scenarios over a database seeded with `rows` users.
+
+    Args:
+        rows (int): The number of seeded users.
+        seed (int, optional): Seed of the random samples. Defaults to 0.
+
+    Returns:
+        list[Scenario]: The scenarios.
+    """
+    sampler = random.Random(seed)
+    users = db.session.query(User.id, User.cpf).order_by(User.id).limit(1000).all()
+    sampler.shuffle(users)
+    sample = itertools.cycle(users)
+
+    deep_page = max(rows // 10 - 1, 1)
+    deep_id = db.session.query(User.id).order_by(User.id).offset(max(rows - 20, 0)).limit(1).scalar()
+    deep_cursor = encode_cursor("", [deep_id])
+
+    new_cpfs = iter_new_cpfs()
+
+    def update(client):
+        id, cpf = next(sample)
+        return client.put(f"/api/user/{id}", json={"name": f"Updated {sampler.random()}", "cpf": cpf, "age": "30"})
+
+    return [
+        Scenario("paginate_shallow", 200, lambda client: client.get("/api/user/?page=1&per_page=10")),
+        Scenario("paginate_deep", 200, lambda client: client.get(f"/api/user/?page={deep_page}&per_page=10")),
+        Scenario("paginate_deep_cursor", 200, lambda client: client.get(f"/api/user/?per_page=10&cursor={deep_cursor}")),
+        Scenario("search", 200, lambda client: client.get("/api/user/?search=User 12&per_page=10")),
+        Scenario("find_user_by", 200, lambda client: client.get(f"/api/user/{next(sample)[0]}")),
+        Scenario("save_new_user", 201, lambda client: client.post(
+            "/api/user/", json={"name": NEW_USER_NAME, "cpf": next(new_cpfs), "age": "30"}
+        )),
+        Scenario("update_user", 200, update),
+        Scenario("api_error", 404, lambda client: client.get(f"/api/user/{uuid.uuid4()}")),
+    ]
@@ -0,0 +1,85 @@
+import sys
+import time
+import uuid
+
+from app.main import db
+from app.main.model import Error, User
+from app.main.util.api_error import APIError
+from app.main.util.error_catalog import error_catalog
+from app.main.util.search_utils import create_search_indexes
+
+
+def make_cpf(number: int) -> str:
+    """
+    Build a valid CPF whose first nine digits are `number`.
+
+    Args:
+        number (int): A number below 10^9, unique per generated CPF.
+
+    Returns:
+        str: The eleven digits CPF.
+    """
+    digits = [int(digit) for digit in f"{number:09d}"]
+    for length in (9, 10):
+        total = sum(digit * weight for digit, weight in zip(digits, range(length + 1, 1, -1)))
+        digits.append(total * 10 % 11 % 10)
+    return "".join(map(str, digits))
+
+
+def count_users() -> int:
+    """
+    Count the seeded users.
+
+    Returns:
+        int: The number of rows of `users`.
+    """
+    return db.session.query(User).count()
+
+
+def seed_users(rows: int, start: int = 0, batch_size: int = 10000):
+    """
+    Insert `rows` users with unique, valid CPFs using executemany batches.
+
+    Args:
+        rows (int): The number of users to insert.
+        start (int, optional): The first CPF number, to extend an existing seed. Defaults to 0.
+        batch_size (int, optional): Rows per INSERT. Defaults to 10000.
+    """
+    insert = User.__table__.insert()
+    for offset in range(start, start + rows, batch_size):
+        end = min(offset + batch_size, start + rows)
+        db.session.execute(insert, [
+            {
+                "id": uuid.uuid4(),
+                "name": f"Benchmark User {number}",
+                "cpf": make_cpf(number + 1),
+                "age": str(18 + number % 80),
+            }
+            for number in range(offset, end)
+        ])
+        db.session.commit()
+
+
+def prepare_database(rows: int, reseed: bool = False):
+    """
+    Create the tables, errors and search indexes if needed, and seed users up to `rows`.
+
+    Must run in an application context.
+
+    Args:
+        rows (int): The number of users the database must hold.
+        reseed (bool, optional): Drop everything and seed again. Defaults to False.
+    """
+    if reseed:
+        db.drop_all()
+    db.create_all()
+    if reseed or not Error.query.first():
+        APIError.add_errors_to_database()
+        create_search_indexes()
+        error_catalog.load()
+
+    if (seeded := count_users()) < rows:
+        print(f"Seeding {rows - seeded} users...", file=sys.stderr)
+        start = time.perf_counter()
+        seed_users(rows - seeded, start=seeded)
+        print(f"Seeded in {time.perf_counter() - start:.1f}s", file=sys.stderr)
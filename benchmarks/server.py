@@ -0,0 +1,109 @@
+"""
+Run the API in a server process for the benchmarks that load it over HTTP.
+"""
+import os
+import socket
+import subprocess
+import time
+import urllib.request
+from contextlib import contextmanager
+
+READY_PATH = "/api/user/?per_page=10"
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_process_tree(pid: int) -> list[int]:
+    """
+    Find a process and its descendants.
+
+    Args:
+        pid (int): The root process.
+
+    Returns:
+        list[int]: The process ids.
+    """
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as stat:
+                    ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    tree, pending = [], [pid]
+    while pending:
+        tree.append(current := pending.pop())
+        pending.extend(children.get(current, []))
+    return tree
+
+
+def get_memory_mb(pid: int) -> float:
+    """
+    Measure the memory of a process tree as the sum of its proportional set sizes.
+
+    Pages shared by forked workers are split between them, so a preloaded master
+    and its workers are not counted several times for the same pages.
+
+    Args:
+        pid (int): The root process.
+
+    Returns:
+        float: The memory, in MiB.
+    """
+    total_kb = 0
+    for process in get_process_tree(pid):
+        try:
+            with open(f"/proc/{process}/smaps_rollup") as smaps:
+                total_kb += next(int(line.split()[1]) for line in smaps if line.startswith("Pss:"))
+        except (OSError, StopIteration):
+            continue
+    return total_kb / 1024
+
+
+def wait_until_ready(url: str, server: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The server exited with {server.returncode}")
+        try:
+            with urllib.request.urlopen(url + READY_PATH, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} didn't answer in {timeout:.0f}s")
+
+
+@contextmanager
+def serve(command: list[str], env: dict, timeout: float = 60.0):
+    """
+    Start a server and stop it on exit, once it answers `READY_PATH`.
+
+    Args:
+        command (list[str]): The server command; `{port}` is replaced by a free port.
+        env (dict): The server environment.
+        timeout (float, optional): Seconds to wait for the server. Defaults to 60.0.
+
+    Yields:
+        tuple[str, subprocess.Popen]: The base URL and the server process.
+
+    Raises:
+        RuntimeError: If the server exits or doesn't answer in time.
+    """
+    port = get_free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [part.format(port=port) for part in command], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(url, server, timeout)
+        yield url, server
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,114 @@
+"""
+Compare the WSGI API under gunicorn with the asyncio API under uvicorn, at equal memory.
+
+Run from the repository root:
+
+    python -m benchmarks.stacks --sync-workers 4
+    python -m benchmarks.stacks --sync-workers 4 --database-uri postgresql://...
+
+The sync stack runs `gunicorn -c gunicorn.conf.py api:app` with `--sync-workers`.
+Its memory under load (the proportional set size of the master and its workers)
+sets the budget of the async stack: one uvicorn worker is measured under load, and
+`uvicorn asgi:app` then runs with as many workers as fit the budget, unless
+`--async-workers` is given. Both stacks serve the same GET mix (a listing page, a
+search and user lookups) from `--concurrency` keep-alive clients.
+The database must already exist (see `python -m benchmarks.run`).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import urllib.request
+
+from .environ import configure_api
+from .load import get_traffic, run_load
+from .server import READY_PATH, get_memory_mb, serve
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sync-workers", type=int, default=4, help="gunicorn workers of the sync stack")
+    parser.add_argument("--async-workers", type=int, help="uvicorn workers; defaults to the sync stack's memory")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent keep-alive clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per stack")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of untimed load per stack")
+    parser.add_argument("--database-uri", help="SQLAlchemy URI; defaults to the 10k rows benchmark database")
+    parser.add_argument("--output", help="Write the results JSON to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def get_paths(url: str) -> list[str]:
+    with urllib.request.urlopen(url + READY_PATH) as response:
+        users = json.load(response)["items"]
+    return [READY_PATH, "/api/user/?search=User&per_page=10", *(f"/api/user/{user['id']}" for user in users)]
+
+
+def run_stack(name: str, command: list[str], env: dict, args) -> dict:
+    """
+    Start a server, load it and measure its memory under load.
+
+    Args:
+        name (str): The stack name, for the progress output.
+        command (list[str]): The server command; `{port}` is replaced by a free port.
+        env (dict): The server environment.
+        args: The command line arguments.
+
+    Returns:
+        dict: The load results and the memory, in MiB.
+    """
+    with serve(command, env) as (url, server):
+        traffic = get_traffic(get_paths(url))
+        run_load(url, traffic, args.concurrency, args.warmup)
+        results = run_load(url, traffic, args.concurrency, args.duration)
+        results["memory_mb"] = get_memory_mb(server.pid)
+    print(
+        f"{name:>5}: {results['requests_per_sec']:.0f} req/s, p99 {results['p99_ms']:.1f}ms, "
+        f"{results['memory_mb']:.0f}MiB",
+        file=sys.stderr,
+    )
+    return results
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    environ = configure_api(args.database_uri or "sqlite:///" + os.path.join(
+        tempfile.gettempdir(), "api-benchmark-10000.db"
+    ))
+    env = dict(os.environ)
+
+    sync_command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", "127.0.0.1:{port}", "api:app"]
+    sync = run_stack("sync", sync_command, {**env, "GUNICORN_WORKERS": str(args.sync_workers)}, args)
+
+    async_command = [
+        sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", "{port}", "--no-access-log",
+    ]
+    async_workers = args.async_workers
+    probe = None
+    if async_workers is None:
+        probe = run_stack("probe", async_command, env, args)
+        async_workers = max(1, int(sync["memory_mb"] // probe["memory_mb"]))
+    results = {
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        **environ,
+        "sync": {"workers": args.sync_workers, **sync},
+        "async": {
+            "workers": async_workers,
+            **run_stack("async", [*async_command, "--workers", str(async_workers)], env, args),
+        },
+    }
+    if probe is not None:
+        results["async"]["probe_memory_mb"] = probe["memory_mb"]
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Measure how long a worker takes to serve its first request.
+
+Run from the repository root:
+
+    python -m benchmarks.startup --workers 4
+    python -m benchmarks.startup --workers 4 --database-uri postgresql://...
+
+`cold` starts each worker in a new interpreter, as gunicorn does without
+`--preload`: every worker imports the code and builds the application.
+`preload` builds the application once and forks the workers from it, as
+`gunicorn --preload` does: each worker only warms up its pools and statements.
+The database must already exist (see `python -m benchmarks.run`).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .environ import configure_api
+
+FIRST_REQUEST_PATH = "/api/user/?per_page=10"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Workers started in each mode")
+    parser.add_argument("--database-uri", help="SQLAlchemy URI; defaults to the 10k rows benchmark database")
+    parser.add_argument("--output", help="Write the results JSON to this file instead of stdout")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def start_worker(started: float, app=None) -> dict:
+    """
+    Build the application if needed, warm it up and serve a first request.
+
+    Args:
+        started (float): The `time.perf_counter()` value when the worker process started.
+        app (Flask, optional): The application built before the fork. Defaults to None.
+
+    Returns:
+        dict: The duration of each phase and the time to the first response, in milliseconds.
+    """
+    timings = {}
+    if app is None:
+        start = time.perf_counter()
+        import api
+
+        app = api.app
+        timings["import_ms"] = (time.perf_counter() - start) * 1000
+
+    from app.main.util.warmup_utils import warm_up
+
+    timings["warm_up_ms"] = warm_up(app) * 1000
+
+    start = time.perf_counter()
+    response = app.test_client().get(FIRST_REQUEST_PATH)
+    assert response.status_code == 200, response.get_data(as_text=True)[:200]
+    timings["first_request_ms"] = (time.perf_counter() - start) * 1000
+    timings["ready_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def run_cold(workers: int) -> list[dict]:
+    results = []
+    for _ in range(workers):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        timings = json.loads(output.splitlines()[-1])
+        timings["process_ms"] = (time.perf_counter() - started) * 1000
+        results.append(timings)
+    return results
+
+
+def run_preload(workers: int) -> dict:
+    start = time.perf_counter()
+    import api
+
+    import_ms = (time.perf_counter() - start) * 1000
+    results = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        started = time.perf_counter()
+        if (pid := os.fork()) == 0:
+            os.close(read_fd)
+            timings = start_worker(started, api.app)
+            os.write(write_fd, json.dumps(timings).encode())
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            results.append(json.loads(pipe.read()))
+        os.waitpid(pid, 0)
+    return {"import_ms": import_ms, "workers": results}
+
+
+def median(results: list[dict], key: str) -> float:
+    return statistics.median(result[key] for result in results)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(start_worker(time.perf_counter())))
+        return 0
+
+    environ = configure_api(args.database_uri or "sqlite:///" + os.path.join(
+        tempfile.gettempdir(), "api-benchmark-10000.db"
+    ))
+
+    cold = run_cold(args.workers)
+    preload = run_preload(args.workers)
+    results = {
+        "workers": args.workers,
+        **environ,
+        "cold": {
+            "ready_ms_p50": median(cold, "ready_ms"),
+            "process_ms_p50": median(cold, "process_ms"),
+            "workers": cold,
+        },
+        "preload": {
+            "ready_ms_p50": median(preload["workers"], "ready_ms"),
+            **preload,
+        },
+    }
+    print(
+        f"cold: {results['cold']['ready_ms_p50']:.0f}ms per worker, "
+        f"preload: {results['preload']['ready_ms_p50']:.0f}ms per worker "
+        f"after a {preload['import_ms']:.0f}ms import in the master",
+        file=sys.stderr,
+    )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Load-test `api:app` under gunicorn and sweep its worker class, workers and threads.
+
+Run from the repository root:
+
+    python -m benchmarks.sweep --worker-class sync gthread --workers 2 4 8 --threads 1 4 --rate 200
+    python -m benchmarks.sweep --rate 0 --mix list=50,get=50 --output sweep.json
+
+The database (SQLite by default, or any `--database-uri`) is seeded with `--rows`
+users like `python -m benchmarks.run`. Each configuration boots gunicorn with
+`gunicorn.conf.py`, so workers are preloaded and warmed up as in production, then
+replays the `--mix` of requests at `--rate` requests per second (0 sends them as fast
+as the server answers) from `--concurrency` keep-alive clients. `--threads` only
+applies to the `gthread` worker class; `gevent` configurations are skipped when
+gevent is not installed.
+"""
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from .environ import configure_api
+from .load import Traffic, run_load
+from .server import get_memory_mb, serve
+
+DEFAULT_MIX = "list=30,search=10,get=35,create=10,not_found=10,invalid=5"
+WORKER_CLASS_MODULES = {"gevent": "gevent", "eventlet": "eventlet", "tornado": "tornado"}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="Users in the database")
+    parser.add_argument("--database-uri", help="SQLAlchemy URI; defaults to a SQLite file per row count")
+    parser.add_argument("--worker-class", nargs="+", default=["sync", "gthread"], help="gunicorn worker classes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4], help="gunicorn worker counts")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4], help="Threads per gthread worker")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weight of each request: list, search, get, create, "
+                                                           "not_found and invalid")
+    parser.add_argument("--rate", type=float, default=100, help="Target requests per second; 0 for no limit")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent keep-alive clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per configuration")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of untimed load per configuration")
+    parser.add_argument("--output", help="Write the results JSON to this file instead of stdout")
+    parser.add_argument("--reseed", action="store_true", help="Drop and seed the database again")
+    return parser.parse_args(argv)
+
+
+def parse_mix(mix: str) -> dict:
+    """
+    Parse a traffic mix such as `list=30,get=70`.
+
+    Args:
+        mix (str): Comma separated `name=weight` pairs.
+
+    Returns:
+        dict: The weight of each request name.
+
+    Raises:
+        ValueError: If a pair is malformed.
+    """
+    weights = {}
+    for pair in mix.split(","):
+        name, _, weight = pair.partition("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def build_traffic(weights: dict, rows: int, seed: int = 0) -> Traffic:
+    """
+    Build the traffic mix over the seeded database. Must run in an application context.
+
+    Args:
+        weights (dict): The weight of each request name.
+        rows (int): The number of seeded users.
+        seed (int, optional): Seed of the random samples. Defaults to 0.
+
+    Returns:
+        Traffic: The mix.
+
+    Raises:
+        ValueError: If a request name is unknown.
+    """
+    from app.main import db
+    from app.main.model import User
+
+    from .scenarios import NEW_USER_NAME, iter_new_cpfs
+
+    sampler = random.Random(seed)
+    ids = [str(id) for id, in db.session.query(User.id).order_by(User.id).limit(1000)]
+    sampler.shuffle(ids)
+    sample = itertools.cycle(ids)
+    new_cpfs = iter_new_cpfs()
+    pages = max(min(rows // 10, 100), 1)
+
+    requests = {
+        "list": (200, lambda: ("GET", f"/api/user/?page={sampler.randint(1, pages)}&per_page=10", None)),
+        "search": (200, lambda: ("GET", f"/api/user/?search={quote(f'User {sampler.randint(1, 99)}')}&per_page=10", None)),
+        "get": (200, lambda: ("GET", f"/api/user/{next(sample)}", None)),
+        "create": (201, lambda: ("POST", "/api/user/", {"name": NEW_USER_NAME, "cpf": next(new_cpfs), "age": "30"})),
+        "not_found": (404, lambda: ("GET", f"/api/user/{uuid.uuid4()}", None)),
+        "invalid": (400, lambda: ("GET", "/api/user/not-a-uuid", None)),
+    }
+    if unknown := set(weights) - set(requests):
+        raise ValueError(f"Unknown requests in the mix: {', '.join(sorted(unknown))}")
+
+    traffic = Traffic(seed)
+    for name, weight in weights.items():
+        if weight > 0:
+            traffic.add(name, weight, *requests[name])
+    return traffic
+
+
+def get_configurations(args) -> list[dict]:
+    configurations = []
+    for worker_class in args.worker_class:
+        for workers in args.workers:
+            for threads in args.threads if worker_class == "gthread" else [1]:
+                configurations.append({"worker_class": worker_class, "workers": workers, "threads": threads})
+    return configurations
+
+
+def run_configuration(configuration: dict, traffic: Traffic, env: dict, args) -> dict:
+    """
+    Boot gunicorn with a configuration and replay the traffic mix on it.
+
+    Args:
+        configuration (dict): The `worker_class`, `workers` and `threads`.
+        traffic (Traffic): The requests to send.
+        env (dict): The server environment.
+        args: The command line arguments.
+
+    Returns:
+        dict: The configuration, its load results and its memory under load, in MiB,
+            or the reason it was skipped.
+    """
+    module = WORKER_CLASS_MODULES.get(configuration["worker_class"])
+    if module and importlib.util.find_spec(module) is None:
+        return {**configuration, "skipped": f"{module} is not installed"}
+
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", "127.0.0.1:{port}", "api:app"]
+    env = {
+        **env,
+        "GUNICORN_WORKER_CLASS": configuration["worker_class"],
+        "GUNICORN_WORKERS": str(configuration["workers"]),
+        "GUNICORN_THREADS": str(configuration["threads"]),
+    }
+    rate = args.rate or None
+    with serve(command, env) as (url, server):
+        run_load(url, traffic, args.concurrency, args.warmup, rate)
+        results = run_load(url, traffic, args.concurrency, args.duration, rate)
+        results["memory_mb"] = get_memory_mb(server.pid)
+    return {**configuration, **results}
+
+
+def describe(result: dict) -> str:
+    name = f"{result['worker_class']} w={result['workers']} t={result['threads']}"
+    if "skipped" in result:
+        return f"{name:>18}: skipped, {result['skipped']}"
+    return (
+        f"{name:>18}: {result['requests_per_sec']:.0f} req/s, p50 {result['p50_ms']:.1f}ms, "
+        f"p95 {result['p95_ms']:.1f}ms, p99 {result['p99_ms']:.1f}ms, "
+        f"errors {result['error_rate']:.2%}, {result['memory_mb']:.0f}MiB"
+    )
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    database_uri = args.database_uri or "sqlite:///" + os.path.join(
+        tempfile.gettempdir(), f"api-benchmark-{args.rows}.db"
+    )
+    environ = configure_api(database_uri)
+
+    from api import app
+
+    from .seed import prepare_database
+
+    app.app_context().push()
+    prepare_database(args.rows, reseed=args.reseed)
+    traffic = build_traffic(parse_mix(args.mix), args.rows)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "rows": args.rows,
+            "mix": args.mix,
+            "rate": args.rate,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            **environ,
+        },
+        "configurations": [],
+    }
+    for configuration in get_configurations(args):
+        result = run_configuration(configuration, traffic, dict(os.environ), args)
+        results["configurations"].append(result)
+        print(describe(result), file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
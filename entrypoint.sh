@@ -1,3 +1,3 @@
 #!/bin/bash
 set -e
-gunicorn -w $GUNICORN_WORKERS -b 0.0.0.0:5000 api:app;
\ No newline at end of file
+gunicorn -c gunicorn.conf.py api:app;
\ No newline at end of file
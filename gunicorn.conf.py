@@ -0,0 +1,25 @@
+"""
+Gunicorn settings of the API.
+
+The application is imported once in the master (`preload_app`) and forked into the
+workers: the database engines are disposed in each worker after the fork, and the
+worker fills its connection pool and compiles the hot statements before serving.
+The workers share their request metrics through `METRICS_DIR`, so `/metrics`
+returns the totals of all of them.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "api-metrics"))
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", 4))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+
+def post_worker_init(worker):
+    from app.main.util.warmup_utils import warm_up
+
+    warm_up(worker.wsgi)
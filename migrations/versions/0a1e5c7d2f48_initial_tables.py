@@ -0,0 +1,47 @@
+"""initial tables
+
+The `error` and `users` tables as `flask setup_api_database` created them before
+the first migration.
+
+Revision ID: 0a1e5c7d2f48
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.main.model.types import GUID
+
+
+# revision identifiers, used by Alembic.
+revision = '0a1e5c7d2f48'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'error',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('code', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=40), nullable=False),
+        sa.Column('api_code', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.String(length=80), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('api_code'),
+    )
+    op.create_table(
+        'users',
+        sa.Column('id', GUID(), nullable=False),
+        sa.Column('name', sa.String(length=80), nullable=False),
+        sa.Column('cpf', sa.String(length=11), nullable=False),
+        sa.Column('age', sa.String(length=3), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('users')
+    op.drop_table('error')
@@ -0,0 +1,34 @@
+"""drop user cpf trigram index
+
+CPF filters match the whole value, through the unique `ix_users_cpf` index: the
+trigram index only slowed writes down.
+
+Revision ID: 3d9b7e2f6a15
+Revises: c71f2e5a0b34
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d9b7e2f6a15'
+down_revision = 'c71f2e5a0b34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_cpf_trgm")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_cpf_trgm "
+                "ON users USING gin (cpf gin_trgm_ops)"
+            )
@@ -0,0 +1,70 @@
+"""user search indexes
+
+Trigram GIN indexes for the user filters on PostgreSQL, and an FTS5 trigram
+shadow table kept in sync by triggers on SQLite.
+
+Revision ID: 5b0d0f7a1c2e
+Revises: 0a1e5c7d2f48
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b0d0f7a1c2e'
+down_revision = '0a1e5c7d2f48'
+branch_labels = None
+depends_on = None
+
+TRIGRAM_COLUMNS = ("name", "age")
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        with op.get_context().autocommit_block():
+            for column in TRIGRAM_COLUMNS:
+                op.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_{column}_trgm "
+                    f"ON users USING gin ({column} gin_trgm_ops)"
+                )
+
+    elif dialect == "sqlite":
+        # The rowids of `users` may change on VACUUM: see `search_utils.vacuum_database`.
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+            "name, age, content='users', content_rowid='rowid', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN "
+            "INSERT INTO users_fts(rowid, name, age) VALUES (new.rowid, new.name, new.age); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+            "INSERT INTO users_fts(users_fts, rowid, name, age) VALUES ('delete', old.rowid, old.name, old.age); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE ON users BEGIN "
+            "INSERT INTO users_fts(users_fts, rowid, name, age) VALUES ('delete', old.rowid, old.name, old.age); "
+            "INSERT INTO users_fts(rowid, name, age) VALUES (new.rowid, new.name, new.age); END"
+        )
+        op.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            # The cpf index of the first deployments, recreated by the downgrade of 3d9b7e2f6a15.
+            for column in (*TRIGRAM_COLUMNS, "cpf"):
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_users_{column}_trgm")
+
+    elif dialect == "sqlite":
+        for trigger in ("users_fts_ai", "users_fts_ad", "users_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS users_fts")
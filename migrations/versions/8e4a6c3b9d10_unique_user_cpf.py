@@ -0,0 +1,56 @@
+"""unique user cpf
+
+Fails, listing them, when users share a CPF: they must be merged or fixed first.
+
+Revision ID: 8e4a6c3b9d10
+Revises: 5b0d0f7a1c2e
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4a6c3b9d10'
+down_revision = '5b0d0f7a1c2e'
+branch_labels = None
+depends_on = None
+
+MAX_LISTED_DUPLICATES = 20
+
+
+def check_duplicates():
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT cpf, COUNT(*) AS users FROM users GROUP BY cpf HAVING COUNT(*) > 1 ORDER BY cpf"
+    )).fetchall()
+    if duplicates:
+        listed = ", ".join(f"{cpf} ({users} users)" for cpf, users in duplicates[:MAX_LISTED_DUPLICATES])
+        more = f" and {len(duplicates) - MAX_LISTED_DUPLICATES} more" if len(duplicates) > MAX_LISTED_DUPLICATES else ""
+        raise RuntimeError(
+            f"Duplicated CPFs ({len(duplicates)}): {listed}{more}. "
+            "Merge or fix these users, then run the migration again."
+        )
+
+
+def upgrade():
+    check_duplicates()
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            # A failed CREATE INDEX CONCURRENTLY leaves an invalid index behind.
+            op.execute(
+                "DO $$ BEGIN "
+                "IF EXISTS (SELECT 1 FROM pg_index WHERE indexrelid = to_regclass('ix_users_cpf') "
+                "AND NOT indisvalid) THEN DROP INDEX ix_users_cpf; END IF; END $$"
+            )
+            op.create_index("ix_users_cpf", "users", ["cpf"], unique=True, postgresql_concurrently=True)
+    else:
+        op.create_index("ix_users_cpf", "users", ["cpf"], unique=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index("ix_users_cpf", table_name="users", postgresql_concurrently=True)
+    else:
+        op.drop_index("ix_users_cpf", table_name="users")
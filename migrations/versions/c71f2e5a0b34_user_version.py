@@ -0,0 +1,25 @@
+"""user version
+
+Revision ID: c71f2e5a0b34
+Revises: 8e4a6c3b9d10
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71f2e5a0b34'
+down_revision = '8e4a6c3b9d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('version')